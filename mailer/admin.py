@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import OutboundEmail
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ["id", "to", "subject", "status", "attempts", "created_at"]
+    list_filter = ["status"]
+    search_fields = ["to"]
+    readonly_fields = ["claim", "sent_at", "last_error"]
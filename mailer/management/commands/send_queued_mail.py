@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mailer.queue import mail_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the queued email that is due and delete finished messages past "
+        "MAIL_RETENTION_DAYS. Use with MAIL_QUEUE_WORKERS=0, from cron or with "
+        "--loop as a dedicated worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep sending, polling every MAIL_POLL_INTERVAL seconds",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent = mail_queue.drain()
+            if not options["loop"]:
+                purged = mail_queue.purge()
+                self.stdout.write(f"Emails sent: {sent}, purged: {purged}")
+                return
+            mail_queue.close_idle()
+            mail_queue.purge_if_due()
+            time.sleep(settings.MAIL_POLL_INTERVAL)
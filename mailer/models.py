@@ -0,0 +1,40 @@
+from django.db import models
+from django.utils import timezone
+
+from momento.core.models import BaseModel
+
+
+class OutboundEmail(BaseModel):
+    """An email waiting to be sent, or the record of one that was."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        SENT = "sent", "Sent"
+        FAILED = "failed", "Failed"
+
+    to = models.EmailField()
+    from_email = models.CharField(max_length=255)
+    subject = models.CharField(max_length=255)
+    # Can hold one-time passwords; cleared once sent or given up on
+    body = models.TextField()
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Pending messages are due from this time; claimed ones are leased until it
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set by the worker that claimed the message for its current attempt
+    claim = models.UUIDField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"], name="outboundemail_due_idx"
+            ),
+            models.Index(fields=["claim"], name="outboundemail_claim_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to} ({self.status})"
@@ -0,0 +1,297 @@
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from mailer.models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# Seconds between purges of finished messages, and rows deleted per query
+PURGE_INTERVAL = 3600
+PURGE_BATCH_SIZE = 5000
+
+
+@dataclass
+class MailMetrics:
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    connections_opened: int = 0
+    # Seconds from enqueue to delivery, over every sent message
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record_sent(self, latencies: List[float]):
+        with self._lock:
+            self.sent += len(latencies)
+            self.latency_total += sum(latencies)
+            self.latency_max = max([self.latency_max, *latencies])
+
+    def record(self, event: str):
+        with self._lock:
+            setattr(self, event, getattr(self, event) + 1)
+
+    def reset(self):
+        with self._lock:
+            self.sent = self.retried = self.failed = self.connections_opened = 0
+            self.latency_total = self.latency_max = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "connections_opened": self.connections_opened,
+            "latency_avg_seconds": self.latency_total / self.sent if self.sent else 0.0,
+            "latency_max_seconds": self.latency_max,
+        }
+
+
+class MailQueue:
+    """Outbound email persisted in ``OutboundEmail`` and sent in the background.
+
+    ``enqueue`` only inserts a row, so requests never wait on the mail
+    server. Worker threads claim due messages in batches of
+    ``MAIL_BATCH_SIZE`` and send them over one connection that stays open
+    between batches until idle for ``MAIL_CONNECTION_IDLE`` seconds. Bodies
+    are cleared once a message is sent or given up on, and finished messages
+    are deleted after ``MAIL_RETENTION_DAYS`` by ``purge``. Failed
+    messages are retried with exponential backoff up to ``MAIL_MAX_ATTEMPTS``
+    times. Claims are leases, renewed before each batch is sent, so
+    several processes can share the table and a crashed worker's messages
+    are picked up again once the lease ends. Updates only apply while the
+    worker still holds the claim.
+
+    Threads in one process take turns on the shared connection, so more
+    than one ``MAIL_QUEUE_WORKERS`` adds no throughput; run more processes
+    for that. With ``0`` nothing is sent in-process and the
+    ``send_queued_mail`` command delivers the queue instead.
+    """
+
+    def __init__(self):
+        self.metrics = MailMetrics()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        # Held while sending, since the connection is shared
+        self._send_lock = threading.Lock()
+        self._workers = []
+        self._connection = None
+        self._connection_used = 0.0
+        self._purged_at = float("-inf")
+
+    def enqueue(self, to: str, subject: str, body: str) -> OutboundEmail:
+        message = OutboundEmail.objects.create(
+            to=to, subject=subject, body=body, from_email=settings.DEFAULT_FROM_EMAIL
+        )
+        if settings.MAIL_QUEUE_WORKERS:
+            self._start()
+            transaction.on_commit(self._wake.set)
+        return message
+
+    def depth(self) -> Dict[str, Optional[float]]:
+        """Messages waiting to be sent, and how long the oldest has waited."""
+        pending = OutboundEmail.objects.filter(status=OutboundEmail.Status.PENDING)
+        oldest = pending.aggregate(oldest=Min("created_at"))["oldest"]
+        return {
+            "pending": pending.count(),
+            "oldest_pending_seconds": (
+                (timezone.now() - oldest).total_seconds() if oldest else None
+            ),
+            "failed": OutboundEmail.objects.filter(
+                status=OutboundEmail.Status.FAILED
+            ).count(),
+        }
+
+    def drain(self) -> int:
+        """Send every message that is due; returns how many were sent."""
+        sent = 0
+        with self._send_lock:
+            while True:
+                batch = self._claim()
+                if not batch:
+                    return sent
+                sent += self._send(batch)
+
+    def _claim(self) -> List[OutboundEmail]:
+        now = timezone.now()
+        claim = uuid.uuid4()
+        due = OutboundEmail.objects.filter(
+            status=OutboundEmail.Status.PENDING, next_attempt_at__lte=now
+        )
+        ids = list(
+            due.order_by("next_attempt_at").values_list("id", flat=True)[
+                : settings.MAIL_BATCH_SIZE
+            ]
+        )
+        if not ids:
+            return []
+        # Only the rows still due are taken, so concurrent workers never
+        # claim the same message
+        due.filter(id__in=ids).update(
+            claim=claim,
+            attempts=F("attempts") + 1,
+            next_attempt_at=now + timedelta(seconds=settings.MAIL_LEASE_SECONDS),
+        )
+        return list(OutboundEmail.objects.filter(claim=claim))
+
+    def _send(self, batch: List[OutboundEmail]) -> int:
+        """Send ``batch`` with one ``send_messages`` call; returns how many went.
+
+        Backends report only a count, so when the call fails the batch is sent
+        again one message at a time: each gets its own result and a refused
+        address fails alone, though messages delivered before the failure may
+        arrive twice.
+        """
+        batch = self._renew(batch)
+        if not batch:
+            return 0
+        emails = [
+            EmailMessage(
+                message.subject, message.body, message.from_email, [message.to]
+            )
+            for message in batch
+        ]
+        try:
+            self._open().send_messages(emails)
+        except Exception as e:
+            # The connection may be broken; reopen it for the next attempt
+            self._close()
+            if len(batch) == 1:
+                self._failed(batch[0], e)
+                return 0
+            logger.warning("Sending %d emails failed, retrying each: %s", len(batch), e)
+            return sum(self._send([message]) for message in batch)
+
+        now = timezone.now()
+        # Bodies can hold one-time passwords, so they are not kept once sent
+        OutboundEmail.objects.filter(
+            id__in=[message.id for message in batch], claim=batch[0].claim
+        ).update(
+            status=OutboundEmail.Status.SENT,
+            sent_at=now,
+            claim=None,
+            last_error="",
+            body="",
+        )
+        self.metrics.record_sent(
+            [(now - message.created_at).total_seconds() for message in batch]
+        )
+        return len(batch)
+
+    @staticmethod
+    def _renew(batch: List[OutboundEmail]) -> List[OutboundEmail]:
+        """Extend the lease right before sending, so it cannot run out while
+        earlier batches were being sent; returns the messages still held."""
+        held = OutboundEmail.objects.filter(
+            id__in=[message.id for message in batch], claim=batch[0].claim
+        )
+        renewed = held.update(
+            next_attempt_at=timezone.now()
+            + timedelta(seconds=settings.MAIL_LEASE_SECONDS)
+        )
+        if renewed < len(batch):
+            ids = set(held.values_list("id", flat=True))
+            batch = [message for message in batch if message.id in ids]
+        return batch
+
+    def _failed(self, message: OutboundEmail, error: Exception):
+        logger.warning("Sending email %s failed: %s", message.id, error)
+        fields = {"claim": None, "last_error": f"{type(error).__name__}: {error}"}
+        if message.attempts >= settings.MAIL_MAX_ATTEMPTS:
+            fields["status"] = OutboundEmail.Status.FAILED
+            fields["body"] = ""
+            self.metrics.record("failed")
+        else:
+            backoff = settings.MAIL_RETRY_BACKOFF * 2 ** (message.attempts - 1)
+            fields["next_attempt_at"] = timezone.now() + timedelta(seconds=backoff)
+            self.metrics.record("retried")
+        OutboundEmail.objects.filter(id=message.id, claim=message.claim).update(
+            **fields
+        )
+
+    def purge(self) -> int:
+        """Delete sent and failed messages older than ``MAIL_RETENTION_DAYS``;
+        returns how many were deleted."""
+        self._purged_at = time.monotonic()
+        cutoff = timezone.now() - timedelta(days=settings.MAIL_RETENTION_DAYS)
+        # A finished message's lease ended within minutes of its last attempt,
+        # so the due index finds them without a scan
+        done = OutboundEmail.objects.filter(
+            status__in=[OutboundEmail.Status.SENT, OutboundEmail.Status.FAILED],
+            next_attempt_at__lt=cutoff,
+        )
+        purged = 0
+        while True:
+            ids = list(done.values_list("id", flat=True)[:PURGE_BATCH_SIZE])
+            if not ids:
+                return purged
+            purged += OutboundEmail.objects.filter(id__in=ids).delete()[0]
+
+    def purge_if_due(self):
+        if time.monotonic() - self._purged_at >= PURGE_INTERVAL:
+            self.purge()
+
+    def _open(self):
+        if self._connection is None:
+            self._connection = get_connection(fail_silently=False)
+            self._connection.open()
+            self.metrics.record("connections_opened")
+        self._connection_used = time.monotonic()
+        return self._connection
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                logger.exception("Closing the mail connection failed")
+            self._connection = None
+
+    def close_idle(self):
+        with self._send_lock:
+            if (
+                self._connection is not None
+                and time.monotonic() - self._connection_used
+                > settings.MAIL_CONNECTION_IDLE
+            ):
+                self._close()
+
+    def _start(self):
+        with self._lock:
+            while len(self._workers) < settings.MAIL_QUEUE_WORKERS:
+                worker = threading.Thread(
+                    target=self._work,
+                    name=f"mail-worker-{len(self._workers)}",
+                    daemon=True,
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            # Woken by new mail; polling also picks up retries and other
+            # processes' messages
+            self._wake.wait(settings.MAIL_POLL_INTERVAL)
+            self._wake.clear()
+            try:
+                self.drain()
+                self.close_idle()
+                self.purge_if_due()
+            except Exception:
+                logger.exception("Mail worker failed")
+            finally:
+                connection.close()
+
+
+mail_queue = MailQueue()
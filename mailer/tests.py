@@ -0,0 +1,169 @@
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from mailer.models import OutboundEmail
+from mailer.queue import mail_queue
+
+
+class FailingBackend(EmailBackend):
+    """Refuses every message, like an unreachable mail server."""
+
+    def send_messages(self, messages):
+        raise ConnectionRefusedError("mail server unavailable")
+
+
+class RefusingBackend(EmailBackend):
+    """Refuses calls that include a message to ``refused@momento.com``."""
+
+    def send_messages(self, messages):
+        if any("refused@momento.com" in message.to for message in messages):
+            raise ValueError("recipient refused")
+        return super().send_messages(messages)
+
+
+@override_settings(MAIL_QUEUE_WORKERS=0, MAIL_BATCH_SIZE=2)
+class MailQueueTests(TestCase):
+    def setUp(self):
+        mail_queue._close()
+        mail_queue.metrics.reset()
+        self.addCleanup(mail_queue._close)
+
+    def test_registering_queues_the_otp_instead_of_sending_it(self):
+        response = APIClient().post(
+            "/api/user/register/",
+            {
+                "email": "new@momento.com",
+                "username": "newcomer",
+                "name": "New",
+                "password": "a-strong-password",
+                "date_of_birth": "2000-01-01",
+            },
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(mail_queue.depth()["pending"], 1)
+
+        self.assertEqual(mail_queue.drain(), 1)
+        self.assertEqual(mail.outbox[0].to, ["new@momento.com"])
+        self.assertIn("Your OTP is", mail.outbox[0].body)
+
+    def test_batches_share_one_connection(self):
+        for number in range(5):
+            mail_queue.enqueue(f"user{number}@momento.com", "Hello", "Body")
+
+        send_messages = EmailBackend.send_messages
+        with mock.patch.object(
+            EmailBackend, "send_messages", autospec=True, side_effect=send_messages
+        ) as sent:
+            self.assertEqual(mail_queue.drain(), 5)
+        # One call per batch of MAIL_BATCH_SIZE
+        self.assertEqual([len(call.args[1]) for call in sent.call_args_list], [2, 2, 1])
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(
+            OutboundEmail.objects.exclude(status=OutboundEmail.Status.SENT).exists()
+        )
+        # Sent bodies are not kept
+        self.assertFalse(OutboundEmail.objects.exclude(body="").exists())
+        metrics = mail_queue.metrics.as_dict()
+        self.assertEqual(metrics["sent"], 5)
+        self.assertEqual(metrics["connections_opened"], 1)
+        self.assertEqual(mail_queue.depth()["pending"], 0)
+
+    def test_messages_reclaimed_by_another_worker_are_skipped(self):
+        mail_queue.enqueue("user@momento.com", "Hello", "Body")
+        batch = mail_queue._claim()
+        # The lease ran out and another worker claimed the message
+        OutboundEmail.objects.update(claim=uuid.uuid4())
+
+        self.assertEqual(mail_queue._send(batch), 0)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(mail_queue.depth()["pending"], 1)
+
+    @override_settings(
+        EMAIL_BACKEND="mailer.tests.FailingBackend",
+        MAIL_MAX_ATTEMPTS=3,
+        MAIL_RETRY_BACKOFF=30,
+    )
+    def test_failures_back_off_then_give_up(self):
+        message = mail_queue.enqueue("user@momento.com", "Hello", "Body")
+        with self.assertLogs("mailer.queue", "WARNING"):
+            self.attempt_until_failed(message)
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboundEmail.Status.FAILED)
+        self.assertEqual(mail_queue.depth()["failed"], 1)
+        self.assertEqual(mail_queue.metrics.as_dict()["retried"], 2)
+
+    def attempt_until_failed(self, message):
+        for attempt, backoff in ((1, 30), (2, 60)):
+            before = timezone.now()
+            self.assertEqual(mail_queue.drain(), 0)
+            message.refresh_from_db()
+            self.assertEqual(message.status, OutboundEmail.Status.PENDING)
+            self.assertEqual(message.attempts, attempt)
+            self.assertIn("mail server unavailable", message.last_error)
+            self.assertGreaterEqual(
+                message.next_attempt_at, before + timedelta(seconds=backoff)
+            )
+            # Not due again until the backoff has passed
+            self.assertEqual(mail_queue.drain(), 0)
+            self.assertEqual(message.attempts, attempt)
+            OutboundEmail.objects.filter(id=message.id).update(
+                next_attempt_at=timezone.now()
+            )
+
+        mail_queue.drain()
+
+    @override_settings(EMAIL_BACKEND="mailer.tests.RefusingBackend")
+    def test_a_refused_message_fails_alone(self):
+        mail_queue.enqueue("refused@momento.com", "Hello", "Body")
+        mail_queue.enqueue("user@momento.com", "Hello", "Body")
+        with self.assertLogs("mailer.queue", "WARNING"):
+            self.assertEqual(mail_queue.drain(), 1)
+
+        self.assertEqual(
+            [message.to for message in mail.outbox], [["user@momento.com"]]
+        )
+        refused = OutboundEmail.objects.get(to="refused@momento.com")
+        self.assertEqual(refused.status, OutboundEmail.Status.PENDING)
+        self.assertIn("recipient refused", refused.last_error)
+
+    @override_settings(MAIL_RETENTION_DAYS=7)
+    def test_finished_messages_are_purged(self):
+        old = timezone.now() - timedelta(days=8)
+        for status in OutboundEmail.Status.values:
+            for attempted in (old, timezone.now()):
+                OutboundEmail.objects.create(
+                    to="user@momento.com",
+                    subject="Hello",
+                    body="",
+                    status=status,
+                    next_attempt_at=attempted,
+                )
+
+        self.assertEqual(mail_queue.purge(), 2)
+        self.assertEqual(
+            sorted(OutboundEmail.objects.values_list("status", flat=True)),
+            sorted([*OutboundEmail.Status.values, OutboundEmail.Status.PENDING]),
+        )
+
+    def test_expired_claims_are_taken_again(self):
+        message = mail_queue.enqueue("user@momento.com", "Hello", "Body")
+        # A worker that died after claiming the message
+        self.assertEqual(len(mail_queue._claim()), 1)
+        self.assertEqual(mail_queue.drain(), 0)
+
+        OutboundEmail.objects.filter(id=message.id).update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(mail_queue.drain(), 1)
+        message.refresh_from_db()
+        self.assertEqual(message.attempts, 2)
+        self.assertEqual(message.status, OutboundEmail.Status.SENT)
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from mailer.views import MailMetricsView
+
+urlpatterns = [
+    path("metrics/", MailMetricsView.as_view(), name="mail_metrics"),
+]
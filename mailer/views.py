@@ -0,0 +1,13 @@
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from mailer.queue import mail_queue
+
+
+class MailMetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    http_method_names = ["get"]
+
+    def get(self, request):
+        return Response({**mail_queue.depth(), **mail_queue.metrics.as_dict()})
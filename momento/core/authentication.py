@@ -1,20 +1,190 @@
-from django.contrib.auth.backends import BaseBackend
-from django.db.models import Q
+import threading
+import time
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, get_hasher, make_password
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.crypto import get_random_string
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
 
 from user.models import User
 
 
-class AuthenticationBackend(BaseBackend):
+@lru_cache(maxsize=None)
+def _dummy_hash(algorithm: str) -> str:
+    return make_password(get_random_string(32), hasher=algorithm)
+
+
+class AuthenticationBackend(ModelBackend):
+    """Sign in with an email address or a username.
+
+    Usernames cannot contain "@", so the identifier is resolved with one
+    lookup on whichever unique column it names. Unknown identifiers check
+    the password against a dummy hash, so they take as long as wrong
+    passwords.
+    """
+
     def authenticate(self, request, username=None, password=None, **kwargs):
+        identifier = kwargs.get(User.USERNAME_FIELD, username)
+        if identifier is None or password is None:
+            return None
+        field = "email" if "@" in identifier else "username"
         try:
-            user = User.objects.get(Q(email=username) | Q(username=username))
-            if user.check_password(password):
-                return user
+            user = User.objects.get(**{field: identifier})
         except User.DoesNotExist:
+            check_password(password, _dummy_hash(get_hasher().algorithm))
             return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
 
-    def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
+
+def record_login(user: User):
+    """Update ``last_login`` once the request commits, at most every
+    ``LAST_LOGIN_UPDATE_INTERVAL`` seconds per user.
+
+    The write is a plain UPDATE, so it does not invalidate caches or reindex
+    the user the way ``save()`` would.
+    """
+    now = timezone.now()
+    interval = timedelta(seconds=settings.LAST_LOGIN_UPDATE_INTERVAL)
+    if user.last_login is not None and now - user.last_login < interval:
+        return
+    user.last_login = now
+    transaction.on_commit(
+        lambda: User.objects.filter(pk=user.pk).update(last_login=now)
+    )
+
+
+# Claims copied into tokens so most requests never load the user row; only
+# fields that never change, the rest come from account_status
+USER_CLAIMS = ("username",)
+
+
+class RefreshToken(tokens.RefreshToken):
+    """A refresh token carrying ``USER_CLAIMS``; its access tokens inherit them."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class UserRowCache:
+    """Recently loaded user rows, per process, for ``USER_CACHE_TTL`` seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._rows.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
             return None
+        return entry[1]
+
+    def put(self, user: User):
+        row = {
+            field.attname: getattr(user, field.attname)
+            for field in User._meta.concrete_fields
+        }
+        with self._lock:
+            self._rows[user.pk] = (time.monotonic() + settings.USER_CACHE_TTL, row)
+            if len(self._rows) > settings.USER_CACHE_MAX_USERS:
+                self._rows.pop(next(iter(self._rows)))
+
+    def discard(self, user_id: int):
+        with self._lock:
+            self._rows.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+user_rows = UserRowCache()
+
+# Flags that can change while a token is valid
+STATUS_FIELDS = ("is_active", "is_staff", "is_superuser", "is_public")
+DELETED = "deleted"
+
+
+def status_key(user_id: int) -> str:
+    return f"user-status:{user_id}"
+
+
+def account_status(user_id: int) -> Optional[Dict[str, bool]]:
+    """The account's ``STATUS_FIELDS``, or ``None`` once it is deleted.
+
+    Shared through the cache for ``USER_STATUS_CACHE_TTL`` seconds and
+    dropped whenever the user is saved or deleted. A miss loads the whole
+    row into ``user_rows``, so the request needs no second query for it.
+    """
+    status = cache.get(status_key(user_id))
+    if status is None:
+        user = User.objects.filter(pk=user_id).first()
+        if user is None:
+            status = DELETED
+        else:
+            user_rows.put(user)
+            status = {field: getattr(user, field) for field in STATUS_FIELDS}
+        cache.set(status_key(user_id), status, settings.USER_STATUS_CACHE_TTL)
+    return None if status == DELETED else status
+
+
+def forget_account_status(user_id: int):
+    cache.delete(status_key(user_id))
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWT authentication that builds ``request.user`` from the token.
+
+    Each request reads ``account_status``, usually one cache read, so
+    deactivated and deleted accounts are refused as soon as the change
+    commits. The user is the row in ``user_rows`` when the process has one;
+    otherwise it has its id, ``USER_CLAIMS`` and ``STATUS_FIELDS`` set and
+    every other field deferred.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, ValueError):
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        status = account_status(user_id)
+        if status is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if not status["is_active"]:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        row = user_rows.get(user_id)
+        if row is not None:
+            return User.from_db(None, list(row), list(row.values()))
+        if not all(claim in validated_token for claim in USER_CLAIMS):
+            # Issued before the claims were added
+            user = super().get_user(validated_token)
+            user_rows.put(user)
+            return user
+
+        return User.from_db(
+            None,
+            ["id", *USER_CLAIMS, *STATUS_FIELDS],
+            [
+                user_id,
+                *(validated_token[claim] for claim in USER_CLAIMS),
+                *(status[field] for field in STATUS_FIELDS),
+            ],
+        )
@@ -0,0 +1,131 @@
+import gc
+import json
+import math
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+Result = Dict[str, float]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def count_rows(queries: List[Dict[str, Any]]) -> int:
+    """Rows returned by the captured SELECTs, obtained by re-counting them."""
+    rows = 0
+    with connection.cursor() as cursor:
+        for query in queries:
+            sql = query["sql"]
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            cursor.execute(f"SELECT COUNT(*) FROM ({sql})")
+            rows += cursor.fetchone()[0]
+    return rows
+
+
+def measure(run: Callable[[int], Any], iterations: int) -> Result:
+    """Profile ``run(i)`` for ``iterations`` calls after one warm-up call.
+
+    Query and row counts come from the first measured call, latency from all
+    of them and peak memory from a separate traced call.
+    """
+    run(0)
+    with CaptureQueriesContext(connection) as context:
+        run(1)
+    queries = context.captured_queries
+
+    # Collector pauses would otherwise dominate the tail of fast endpoints
+    samples = []
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(2, iterations + 2):
+            started = time.perf_counter()
+            run(i)
+            samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        gc.enable()
+
+    return {
+        "queries": len(queries),
+        "rows": count_rows(queries),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "peak_kb": peak_memory(lambda: run(iterations + 2)),
+    }
+
+
+def peak_memory(run: Callable[[], Any]) -> float:
+    """Peak Python heap allocated while ``run()`` executes, in KB."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def write_results(path: Path, results: Dict[str, Any]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+
+def find_regressions(
+    baseline: Dict[str, Result],
+    results: Dict[str, Result],
+    latency_tolerance: float,
+    memory_tolerance: float,
+    latency_slack_ms: float = 5.0,
+    memory_slack_kb: float = 64.0,
+) -> Tuple[List[str], List[str]]:
+    """Compare ``results`` against ``baseline`` metric by metric.
+
+    Returns ``(regressions, warnings)``. Query counts must not grow at all
+    and row counts may grow by at most 10%; these are deterministic, so they
+    are the regressions. Memory gets a relative tolerance plus a small
+    absolute slack. Latency over a few dozen iterations is too noisy to fail
+    a run on, so slower timings are only warnings.
+    """
+    regressions, warnings = [], []
+    for name, result in sorted(results.items()):
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        checks = [
+            ("queries", expected["queries"], regressions),
+            ("rows", expected["rows"] * 1.1, regressions),
+            (
+                "peak_kb",
+                expected["peak_kb"] * (1 + memory_tolerance) + memory_slack_kb,
+                regressions,
+            ),
+            (
+                "p95_ms",
+                expected["p95_ms"] * (1 + latency_tolerance) + latency_slack_ms,
+                warnings,
+            ),
+        ]
+        for metric, limit, found in checks:
+            if result[metric] > limit:
+                found.append(
+                    f"{name}: {metric} {result[metric]} exceeds baseline "
+                    f"{expected[metric]} (limit {round(limit, 3)})"
+                )
+    return regressions, warnings
@@ -0,0 +1,139 @@
+import hashlib
+import threading
+from collections import defaultdict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework.response import Response
+
+
+class CacheMetrics:
+    """In-process hit/miss/eviction counters, broken down by namespace."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters: Dict[str, Dict[str, int]] = defaultdict(
+                lambda: defaultdict(int)
+            )
+
+    def record(self, namespace: str, event: str, count: int = 1):
+        with self._lock:
+            self._counters[namespace][event] += count
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            data = {name: dict(events) for name, events in self._counters.items()}
+        for events in data.values():
+            lookups = events.get("hits", 0) + events.get("misses", 0)
+            events["hit_ratio"] = events.get("hits", 0) / lookups if lookups else 0.0
+        return data
+
+
+cache_metrics = CacheMetrics()
+
+
+class InstrumentedLocMemCache(LocMemCache):
+    """Local-memory LRU cache that reports the entries it evicts."""
+
+    def _cull(self):
+        size = len(self._cache)
+        super()._cull()
+        cache_metrics.record("backend", "evictions", size - len(self._cache))
+
+
+def _version_key(kind: str, name: Hashable) -> str:
+    return f"response-version:{kind}:{name}"
+
+
+def invalidate(namespace: str, scope: Hashable):
+    """Expire every cached response of ``namespace`` for ``scope``."""
+    _bump_now_and_on_commit(_version_key(namespace, scope))
+    cache_metrics.record(namespace, "invalidations")
+
+
+def invalidate_viewer(user_id: int):
+    """Expire every cached response rendered for ``user_id``."""
+    _bump_now_and_on_commit(_version_key("viewer", user_id))
+    cache_metrics.record("viewer", "invalidations")
+
+
+def _bump_now_and_on_commit(key: str):
+    # A request that reads before the write commits can cache the old data
+    # under the new version; bumping again once committed expires it
+    _bump(key)
+    transaction.on_commit(lambda: _bump(key))
+
+
+def _bump(key: str):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def response_key(namespace: str, scope: Hashable, viewer_id: Optional[int], path: str):
+    scope_key = _version_key(namespace, scope)
+    viewer_key = _version_key("viewer", viewer_id)
+    versions = cache.get_many([scope_key, viewer_key])
+    digest = hashlib.md5(path.encode()).hexdigest()
+    return (
+        f"response:{namespace}:{scope}:{versions.get(scope_key, 1)}:"
+        f"{viewer_id}:{versions.get(viewer_key, 1)}:{digest}"
+    )
+
+
+def cache_response(
+    namespace: str,
+    scope: Callable[..., Hashable] = lambda view, request, *args, **kwargs: "all",
+    timeout: Optional[int] = None,
+):
+    """Cache a DRF handler's successful responses per viewer.
+
+    ``scope`` picks the object the response depends on (e.g. a post id), so
+    writes to that object can expire its responses with :func:`invalidate`.
+    """
+
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = response_key(
+                namespace,
+                scope(view, request, *args, **kwargs),
+                request.user.id,
+                request.get_full_path(),
+            )
+            data = cache.get(key)
+            if data is not None:
+                cache_metrics.record(namespace, "hits")
+                return Response(data)
+
+            cache_metrics.record(namespace, "misses")
+            response = handler(view, request, *args, **kwargs)
+            # Streaming responses have no data to keep
+            if response.status_code == 200 and isinstance(response, Response):
+                cache.set(
+                    key,
+                    response.data,
+                    settings.RESPONSE_CACHE_TTL if timeout is None else timeout,
+                )
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def by_pk(view, request, *args, **kwargs) -> Hashable:
+    return kwargs["pk"]
+
+
+def by_viewer(view, request, *args, **kwargs) -> Hashable:
+    return request.user.id
@@ -1,37 +1,82 @@
-from typing import List, Any, Optional
-
-from django.db.models import QuerySet
-from ninja import Schema
-from ninja.errors import ValidationError
-from ninja.pagination import PaginationBase
-from pydantic import Field
-
-
-class PageNumberPagination(PaginationBase):
-    class Input(Schema):
-        page: int = Field(1, ge=1)
-        page_size: Optional[int] = Field(None, ge=1)
-
-    class Output(Schema):
-        page: int
-        page_size: int
-        total: int
-        items: List[Any]
-
-    def paginate_queryset(
-        self,
-        queryset: QuerySet,
-        pagination: Any,
-        **params: Any,
-    ) -> Any:
-        page = pagination.page if pagination.page else 1
-        page_size = pagination.page_size if pagination.page_size else 10
-
-        offset = (page - 1) * page_size
-        items = queryset[offset : offset + page_size]
-        total = queryset.count()
-        if page > 1 and items.count() == 0:
-            raise ValidationError([{"page": "Invalid page"}])
-        return self.Output(
-            page=page, page_size=page_size, total=total, items=items
-        ).model_dump()
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+# (timestamp, id) of a row in a keyset-paginated feed
+Key = Tuple[datetime, int]
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Keyset pagination on ``(created_at, id)``, newest first.
+
+    Pages are addressed by an opaque cursor instead of a page number, so no
+    ``COUNT(*)`` is issued and deep pages cost the same as the first one.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class OldestFirstCursorPagination(CreatedAtCursorPagination):
+    ordering = ("created_at", "id")
+
+
+class SuggestionCursorPagination(CreatedAtCursorPagination):
+    """Best ``suggestion_score`` first, or newest first when there is none.
+
+    The cursor only seeks on the first ordering field, so an unscored list
+    ordered by a constant score would page by ever larger offsets.
+    """
+
+    ordering = ("-suggestion_score", "-id")
+
+    def get_ordering(self, request, queryset, view):
+        if "suggestion_score" not in queryset.query.annotations:
+            return ("-id",)
+        return super().get_ordering(request, queryset, view)
+
+
+class PostedAtCursorPagination(CreatedAtCursorPagination):
+    ordering = ("-posted_at", "-id")
+
+
+class KeysetPagination(CreatedAtCursorPagination):
+    """Newest-first pages of ``(timestamp, id)`` keys, for feeds merged from
+    several sources that no single queryset can order.
+
+    ``paginate_keys(fetch, request)`` calls ``fetch(before, limit)``, which
+    returns up to ``limit`` keys below ``before`` (``None`` on the first
+    page), newest first. Only next links are offered.
+    """
+
+    def paginate_keys(
+        self, fetch: Callable[[Optional[Key], int], List[Key]], request
+    ) -> List[Key]:
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        keys = fetch(self.decode_key(request), page_size + 1)
+        self.next_key = keys[page_size - 1] if len(keys) > page_size else None
+        return keys[:page_size]
+
+    def decode_key(self, request) -> Optional[Key]:
+        cursor = self.decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return None
+        try:
+            moment, pk = cursor.position.rsplit(",", 1)
+            return datetime.fromisoformat(moment), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_key is None:
+            return None
+        moment, pk = self.next_key
+        position = f"{moment.isoformat()},{pk}"
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        return None
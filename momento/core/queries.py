@@ -0,0 +1,15 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, field: str) -> Coalesce:
+    """Correlated ``COUNT(*)`` of ``queryset`` rows whose ``field`` points at
+    the outer row, 0 when there are none."""
+    counts = (
+        queryset.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
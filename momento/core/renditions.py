@@ -0,0 +1,124 @@
+import hashlib
+import io
+import re
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage, default_storage
+from django.db import transaction
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+EXTENSIONS = {"WEBP": "webp", "AVIF": "avif", "JPEG": "jpg"}
+BLOB_NAME_RE = re.compile(r"^blobs/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.\w+)?$")
+RENDITION_NAME_RE = re.compile(r"^renditions/[0-9a-f]{2}/([0-9a-f]{64})/\d+\.\w+$")
+
+
+def source_key(name: str) -> str:
+    """Cache key remembering that ``name`` may be scaled."""
+    return f"rendition-source:{name}"
+
+
+def forget_sources(*names: str):
+    """Stop treating ``names`` as scalable once a row lets go of them."""
+    keys = [source_key(name) for name in names if name]
+    cache.delete_many(keys)
+    # Again after commit, in case a request re-cached them meanwhile
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def source_digest(storage: Storage, name: str) -> str:
+    """SHA-256 of a stored file, remembered in the cache by file name."""
+    match = BLOB_NAME_RE.match(name)
+    if match:
+        # Content-addressed names already carry their digest
+        return match.group(1)
+    key = f"rendition-digest:{name}"
+    digest = cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with storage.open(name, "rb") as file:
+            for chunk in iter(lambda: file.read(64 * 1024), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        cache.set(key, digest, None)
+    return digest
+
+
+def rendition_name(digest: str, width: int) -> str:
+    """Storage name of a rendition; identical sources share their renditions."""
+    extension = EXTENSIONS[settings.MEDIA_RENDITION_FORMAT]
+    return f"renditions/{digest[:2]}/{digest}/{width}.{extension}"
+
+
+def open_image(file) -> Image.Image:
+    image = ImageOps.exif_transpose(Image.open(file))
+    return image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+
+def render(image: Image.Image, width: int) -> bytes:
+    """Encode ``image`` scaled down to ``width``; narrower images keep their size."""
+    resized = image.copy()
+    resized.thumbnail((width, image.height))
+    if settings.MEDIA_RENDITION_FORMAT == "JPEG":
+        resized = resized.convert("RGB")
+    buffer = io.BytesIO()
+    resized.save(
+        buffer,
+        format=settings.MEDIA_RENDITION_FORMAT,
+        quality=settings.MEDIA_RENDITION_QUALITY,
+    )
+    return buffer.getvalue()
+
+
+def ensure(
+    storage: Storage, name: str, width: int, image: Optional[Image.Image] = None
+) -> str:
+    """Return the name of ``name``'s rendition at ``width`` in default storage.
+
+    The rendition is generated and stored on first use. Pass ``image`` when
+    the source in ``storage`` is already decoded to skip reading it again.
+    """
+    target = rendition_name(source_digest(storage, name), width)
+    if default_storage.exists(target):
+        return target
+    if image is None:
+        with storage.open(name, "rb") as file:
+            image = open_image(file)
+    saved = default_storage.save(target, ContentFile(render(image, width)))
+    if saved != target:
+        # Another worker stored the same rendition first
+        default_storage.delete(saved)
+    return target
+
+
+def widths_for(source_width: Optional[int]) -> Iterable[int]:
+    """Configured widths worth generating for a source of ``source_width``."""
+    widths = settings.MEDIA_RENDITION_WIDTHS
+    if not source_width:
+        return widths
+    return [w for w in widths if w < source_width] or widths[:1]
+
+
+def srcset(
+    name: str,
+    source_width: Optional[int] = None,
+    stored: Optional[Dict[str, str]] = None,
+) -> Dict[str, str]:
+    """Map of width to URL for each rendition of the stored file ``name``.
+
+    Renditions already in ``stored`` link straight to storage; the rest point
+    at the rendition view, which generates them on first request.
+    """
+    stored = stored or {}
+    urls = {}
+    for width in widths_for(source_width):
+        if str(width) in stored:
+            urls[str(width)] = default_storage.url(stored[str(width)])
+        else:
+            urls[str(width)] = reverse(
+                "rendition", kwargs={"width": width, "name": name}
+            )
+    return urls
@@ -0,0 +1,150 @@
+import mimetypes
+import os
+import re
+from typing import Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.storage import Storage, default_storage
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotModified,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.utils.http import http_date, parse_http_date_safe
+
+READ_SIZE = 64 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive ``(start, end)`` of a single ``Range`` header, or ``None``.
+
+    Multiple ranges are not supported and fall back to the whole file, which
+    RFC 9110 allows. Raises ``ValueError`` for ranges outside the file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the final ``last`` bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def _read_range(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as file:
+        file.seek(start)
+        while length > 0:
+            data = file.read(min(READ_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def cache_control(name: str) -> str:
+    if name.startswith(tuple(settings.MEDIA_IMMUTABLE_PREFIXES)):
+        # Content-addressed names always refer to the same bytes
+        return "public, max-age=31536000, immutable"
+    return f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+
+
+def _not_modified(request: HttpRequest, etag: str, mtime: int) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in [
+            tag.strip() for tag in if_none_match.split(",")
+        ]
+    since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return since is not None and mtime <= since
+
+
+def _range_applies(request: HttpRequest, etag: str, mtime: int) -> bool:
+    if_range = request.headers.get("If-Range")
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == mtime
+
+
+def serve(
+    request: HttpRequest, name: str, storage: Storage = default_storage
+) -> HttpResponse:
+    """Serve a stored file with validators, byte ranges and caching headers.
+
+    With ``MEDIA_SERVE_OFFLOAD`` set the body is left to the front-end server
+    via ``X-Accel-Redirect`` (nginx) or ``X-Sendfile`` (Apache, lighttpd),
+    which then also answer range requests themselves.
+    """
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        # Remote storage serves its own files
+        return HttpResponseRedirect(storage.url(name))
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("File not found")
+    if not os.path.isfile(path):
+        raise Http404("File not found")
+
+    size, mtime = stat.st_size, int(stat.st_mtime)
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(mtime),
+        "Cache-Control": cache_control(name),
+        "Accept-Ranges": "bytes",
+    }
+    if _not_modified(request, etag, mtime):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    offload = settings.MEDIA_SERVE_OFFLOAD
+    if offload:
+        response = HttpResponse(content_type=content_type)
+        if offload == "x-accel-redirect":
+            response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + name
+        else:
+            response["X-Sendfile"] = path
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    byte_range = None
+    range_header = request.headers.get("Range")
+    if range_header and _range_applies(request, etag, mtime):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if byte_range is None:
+        # FileResponse lets the WSGI server use sendfile for whole files
+        response = FileResponse(open(path, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        body = [] if request.method == "HEAD" else _read_range(path, start, length)
+        response = StreamingHttpResponse(body, status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(length)
+    for header, value in headers.items():
+        response[header] = value
+    return response
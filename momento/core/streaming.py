@@ -0,0 +1,52 @@
+import json
+from typing import Any, Dict, Iterator, Optional, Type
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.fields import BooleanField
+from rest_framework.serializers import BaseSerializer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def iter_json(
+    queryset: QuerySet,
+    serializer_class: Type[BaseSerializer],
+    context: Optional[Dict[str, Any]] = None,
+    chunk_size: Optional[int] = None,
+) -> Iterator[bytes]:
+    """Encode ``queryset`` as ``{"results": [...]}`` one chunk of rows at a time.
+
+    Rows are fetched with ``QuerySet.iterator`` and each chunk is serialized,
+    encoded and released before the next one is read, so memory depends on
+    the chunk size rather than on the number of rows.
+    """
+    chunk_size = chunk_size or settings.STREAM_CHUNK_SIZE
+    serializer = serializer_class(context=context or {})
+    encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    yield b'{"results":['
+    separator, buffer = "", []
+    for index, obj in enumerate(queryset.iterator(chunk_size=chunk_size), 1):
+        buffer.append(separator + encoder.encode(serializer.to_representation(obj)))
+        separator = ","
+        if index % chunk_size == 0:
+            yield "".join(buffer).encode()
+            buffer = []
+    yield ("".join(buffer) + "]}").encode()
+
+
+def wants_stream(request) -> bool:
+    """Whether ``?stream`` is set to a true value such as ``1`` or ``true``."""
+    return request.query_params.get("stream") in BooleanField.TRUE_VALUES
+
+
+def stream_json(
+    queryset: QuerySet,
+    serializer_class: Type[BaseSerializer],
+    context: Optional[Dict[str, Any]] = None,
+) -> StreamingHttpResponse:
+    """Respond with every row of ``queryset`` without holding them in memory."""
+    return StreamingHttpResponse(
+        iter_json(queryset, serializer_class, context),
+        content_type="application/json",
+    )
@@ -0,0 +1,258 @@
+import abc
+import hashlib
+import math
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """``"10/min"`` -> ``(10, 60)``: requests allowed per period of seconds."""
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    limit: int
+    remaining: int
+    # Seconds until the limit is fully available again
+    reset: float
+    # Seconds until the next request would be allowed, when denied
+    retry_after: Optional[float] = None
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+
+
+class RateLimitStore(abc.ABC):
+    """Counts requests per key against a ``(limit, period)`` rate."""
+
+    @abc.abstractmethod
+    def peek(self, key: str, limit: int, period: int) -> Decision:
+        """The decision ``consume`` would make, without counting the request."""
+
+    @abc.abstractmethod
+    def consume(self, key: str, limit: int, period: int) -> Decision:
+        """Count a request against ``key`` when its limit allows it."""
+
+    def clear(self):
+        pass
+
+
+class LocalTokenBucketStore(RateLimitStore):
+    """Token buckets in process memory.
+
+    A bucket holds up to ``limit`` tokens and refills at ``limit / period``
+    tokens a second, so bursts up to the limit are allowed and the long-run
+    rate is exact. Checks take a lock and a dict lookup. Each process counts
+    on its own, so the effective limit is per process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> [tokens, monotonic time of the last update]
+        self._buckets: Dict[str, List[float]] = {}
+
+    def peek(self, key: str, limit: int, period: int) -> Decision:
+        return self._take(key, limit, period, count=False)
+
+    def consume(self, key: str, limit: int, period: int) -> Decision:
+        return self._take(key, limit, period, count=True)
+
+    def _take(self, key: str, limit: int, period: int, count: bool) -> Decision:
+        now = time.monotonic()
+        rate = limit / period
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [float(limit), now]
+                if count:
+                    self._buckets[key] = bucket
+                    if len(self._buckets) > settings.THROTTLE_LOCAL_MAX_KEYS:
+                        self._buckets.pop(next(iter(self._buckets)))
+            tokens = min(limit, bucket[0] + (now - bucket[1]) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            if count:
+                bucket[0], bucket[1] = tokens, now
+        return Decision(
+            allowed=allowed,
+            limit=limit,
+            remaining=int(tokens),
+            reset=(limit - tokens) / rate,
+            retry_after=None if allowed else (1 - tokens) / rate,
+        )
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheSlidingWindowStore(RateLimitStore):
+    """Sliding-window counters in the shared cache, for limits across processes.
+
+    Requests are counted in fixed windows of ``period`` seconds. The
+    previous window's count is weighted by how much of it still overlaps the
+    sliding window. Each check counts itself with ``add`` or ``incr`` before
+    deciding, so concurrent requests see one another; a denied request takes
+    its count back with ``decr``. That holds across processes when the
+    backend increments atomically, as Redis and Memcached do.
+    """
+
+    @staticmethod
+    def _windows(key: str, period: int) -> Tuple[str, str, float]:
+        window, elapsed = divmod(time.time(), period)
+        current = f"throttle:{key}:{int(window)}"
+        previous = f"throttle:{key}:{int(window) - 1}"
+        return current, previous, elapsed
+
+    def peek(self, key: str, limit: int, period: int) -> Decision:
+        current, previous, elapsed = self._windows(key, period)
+        counts = cache.get_many([current, previous])
+        used = counts.get(current, 0) + 1
+        return self._decide(limit, period, elapsed, used, counts.get(previous, 0))
+
+    def consume(self, key: str, limit: int, period: int) -> Decision:
+        current, previous, elapsed = self._windows(key, period)
+        # Outlives the next window, which still weighs this one
+        used = 1 if cache.add(current, 1, period * 2) else cache.incr(current)
+        decision = self._decide(limit, period, elapsed, used, cache.get(previous, 0))
+        if not decision.allowed:
+            cache.decr(current)
+        return decision
+
+    @staticmethod
+    def _decide(
+        limit: int, period: int, elapsed: float, used: int, earlier: int
+    ) -> Decision:
+        """Decide on a request that is one of ``used`` in the current window."""
+        weighted = earlier * (1 - elapsed / period) + used
+        allowed = weighted <= limit
+        retry_after = None
+        if not allowed:
+            used -= 1
+            weighted -= 1
+            if used + 1 > limit:
+                retry_after = period - elapsed
+            else:
+                # Wait for the previous window's share to shrink enough
+                retry_after = period * (1 - (limit - 1 - used) / earlier) - elapsed
+        if used:
+            reset = 2 * period - elapsed
+        else:
+            reset = period - elapsed if earlier else 0
+        return Decision(
+            allowed=allowed,
+            limit=limit,
+            remaining=max(int(limit - weighted), 0),
+            reset=reset,
+            retry_after=retry_after,
+        )
+
+
+@lru_cache(maxsize=None)
+def _get_store(path: str) -> RateLimitStore:
+    return import_string(path)()
+
+
+def get_store() -> RateLimitStore:
+    return _get_store(settings.THROTTLE_STORE)
+
+
+def client_ip(request) -> str:
+    """The client address, taking ``THROTTLE_PROXY_COUNT`` proxies into account."""
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+    proxies = settings.THROTTLE_PROXY_COUNT
+    if forwarded and proxies:
+        addresses = [address.strip() for address in forwarded.split(",")]
+        return addresses[-min(proxies, len(addresses))]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+class ScopedBucketThrottle(BaseThrottle):
+    """Limit a view by its ``throttle_scope`` with the rate in ``THROTTLE_RATES``.
+
+    Authenticated requests are counted per user and anonymous ones per
+    client IP. Views naming a ``throttle_account_field`` are also limited
+    per value of that field in the request body, so one account cannot be
+    guessed at from many addresses. That limit only counts the failures the
+    view reports with ``count_failed_attempt``, so the owner's own requests
+    never use it up. Every limit is checked before anything is counted, so
+    a request one limit denies costs nothing against the others.
+
+    Views without a scope, or whose scope has no rate, are not limited. The
+    most restrictive decision is kept on the request so
+    ``RateLimitHeadersMiddleware`` can report it.
+    """
+
+    def allow_request(self, request, view):
+        self.decision = None
+        scope = getattr(view, "throttle_scope", None)
+        rate = settings.THROTTLE_RATES.get(scope) if scope else None
+        if rate is None:
+            return True
+        user_id = request.user.id if request.user.is_authenticated else None
+        ident = f"user:{user_id}" if user_id else f"ip:{client_ip(request)}"
+        key = f"{scope}:{ident}"
+        store, (limit, period) = get_store(), parse_rate(rate)
+        decisions = [store.peek(key, limit, period)]
+
+        field = getattr(view, "throttle_account_field", None)
+        account = request.data.get(field) if field else None
+        if isinstance(account, str) and account.strip():
+            digest = hashlib.md5(account.strip().lower().encode()).hexdigest()
+            failures = f"{scope}:account:{digest}"
+            decisions.append(store.peek(failures, limit, period))
+            request._request.rate_limit_failures = (failures, limit, period)
+
+        if all(decision.allowed for decision in decisions):
+            decisions[0] = store.consume(key, limit, period)
+        self.decision = min(decisions, key=lambda d: (d.allowed, d.remaining))
+        request._request.rate_limit = self.decision
+        return self.decision.allowed
+
+    def wait(self):
+        return self.decision.retry_after if self.decision else None
+
+
+def count_failed_attempt(request):
+    """Count a failed attempt against the account named in ``request``.
+
+    Views with a ``throttle_account_field`` call this when the credentials
+    or code they were sent are wrong.
+    """
+    failures = getattr(request._request, "rate_limit_failures", None)
+    if failures is not None:
+        get_store().consume(*failures)
+
+
+class RateLimitHeadersMiddleware:
+    """Add ``X-RateLimit-*`` headers to responses of rate-limited views."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        decision = getattr(request, "rate_limit", None)
+        if decision is not None:
+            for header, value in decision.headers().items():
+                response[header] = value
+        return response
@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.http import Http404
+from django.views import View
+from PIL import Image
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from momento.core import renditions
+from momento.core.cache import cache_metrics
+from momento.core.serving import serve
+from post.models import Blob, Media
+from user.models import Profile
+
+
+class CacheMetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    http_method_names = ["get"]
+
+    def get(self, request):
+        return Response(
+            {
+                "backend": settings.CACHES["default"]["BACKEND"],
+                "namespaces": cache_metrics.snapshot(),
+            }
+        )
+
+
+def is_rendition_source(name: str) -> bool:
+    """Whether ``name`` is a post image or profile picture, remembered per name.
+
+    Only files some row points at can be scaled, so clients cannot make
+    renditions of renditions or of arbitrary stored files. Rows dropping a
+    file forget it through ``renditions.forget_sources``; the TTL bounds
+    what a missed invalidation can serve.
+    """
+    if name.startswith("renditions/"):
+        return False
+    key = renditions.source_key(name)
+    if cache.get(key):
+        return True
+    referenced = (
+        Media.objects.filter(Q(file=name) | Q(poster=name)).exists()
+        or Profile.objects.filter(
+            Q(profile_picture=name) | Q(cover_picture=name)
+        ).exists()
+    )
+    if referenced:
+        cache.set(key, True, settings.RENDITION_SOURCE_CACHE_TTL)
+    return referenced
+
+
+class RenditionView(View):
+    """Serve a scaled-down copy of an uploaded image, generating it on demand."""
+
+    http_method_names = ["get", "head"]
+
+    def get(self, request, width: int, name: str):
+        if width not in settings.MEDIA_RENDITION_WIDTHS:
+            raise Http404("Unknown rendition width")
+        if not is_rendition_source(name):
+            raise Http404("Unknown file")
+        try:
+            if not default_storage.exists(name):
+                raise Http404("Unknown file")
+            target = renditions.ensure(default_storage, name, width)
+        except (SuspiciousFileOperation, Image.DecompressionBombError, OSError):
+            # UnidentifiedImageError and truncated files are OSErrors
+            raise Http404("Not an image")
+        return serve(request, target)
+
+
+def is_served_media(name: str) -> bool:
+    """Whether the media route may serve the stored file ``name``.
+
+    Blobs are served while a ``Blob`` row holds them, renditions while their
+    source blob does, and files stored before content addressing while a
+    row still points at them. Staging directories are never served.
+    """
+    if "tmp" in name.split("/"):
+        return False
+    if name.startswith("renditions/"):
+        match = renditions.RENDITION_NAME_RE.match(name)
+        if not match:
+            return False
+        digest = match.group(1)
+        prefix = f"blobs/{digest[:2]}/{digest[2:4]}/{digest}"
+        return Blob.objects.filter(name__startswith=prefix).exists()
+    if name.startswith("blobs/"):
+        return Blob.objects.filter(name=name).exists()
+    return (
+        Media.objects.filter(Q(file=name) | Q(poster=name)).exists()
+        or Profile.objects.filter(
+            Q(profile_picture=name) | Q(cover_picture=name)
+        ).exists()
+    )
+
+
+class MediaFileView(View):
+    """Serve uploaded media with byte ranges when ``SERVE_MEDIA`` is set.
+
+    Only files a ``Media``, ``Profile`` or ``Blob`` row accounts for are
+    served, so chunked uploads and orphaned files stay private.
+    """
+
+    http_method_names = ["get", "head"]
+
+    def get(self, request, path: str):
+        if not is_served_media(path):
+            raise Http404("File not found")
+        try:
+            return serve(request, path)
+        except SuspiciousFileOperation:
+            raise Http404("File not found")
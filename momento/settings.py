@@ -28,7 +28,7 @@ class Base(Configuration):
         "drf_standardized_errors",
     ]
 
-    LOCAL_APPS = ["user", "post"]
+    LOCAL_APPS = ["user", "post", "search", "mailer"]
 
     INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
@@ -41,6 +41,7 @@ class Base(Configuration):
         "django.contrib.auth.middleware.AuthenticationMiddleware",
         "django.contrib.messages.middleware.MessageMiddleware",
         "django.middleware.clickjacking.XFrameOptionsMiddleware",
+        "momento.core.throttling.RateLimitHeadersMiddleware",
     ]
 
     ROOT_URLCONF = "momento.urls"
@@ -74,21 +75,84 @@ class Base(Configuration):
 
     STATIC_URL = "static/"
 
+    # Also serves permissions, so ModelBackend is not needed after it
     AUTHENTICATION_BACKENDS = [
         "momento.core.authentication.AuthenticationBackend",
-        "django.contrib.auth.backends.ModelBackend",
     ]
 
+    # New passwords use PASSWORD_HASHER; hashes made by any other hasher
+    # below are upgraded when their owner next logs in. Argon2 needs
+    # argon2-cffi and bcrypt needs bcrypt installed
+    PASSWORD_HASHER = config(
+        "password_hasher", "django.contrib.auth.hashers.PBKDF2PasswordHasher"
+    )
+    PASSWORD_HASHERS = list(
+        dict.fromkeys(
+            [
+                PASSWORD_HASHER,
+                "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+                "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+                "django.contrib.auth.hashers.Argon2PasswordHasher",
+                "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+                "django.contrib.auth.hashers.ScryptPasswordHasher",
+            ]
+        )
+    )
+    # Seconds a process reuses a user row loaded for an authenticated request
+    USER_CACHE_TTL = config("user_cache_ttl", 30, cast=int)
+    USER_CACHE_MAX_USERS = config("user_cache_max_users", 10000, cast=int)
+    # Seconds the shared cache remembers whether a token's user is still active
+    USER_STATUS_CACHE_TTL = config("user_status_cache_ttl", 60, cast=int)
+    # last_login is written at most once per user in this many seconds
+    LAST_LOGIN_UPDATE_INTERVAL = config("last_login_update_interval", 3600, cast=int)
+
+    # Cache; point cache_backend/cache_location at e.g. FileBasedCache or Redis
+    CACHES = {
+        "default": {
+            "BACKEND": config(
+                "cache_backend", "momento.core.cache.InstrumentedLocMemCache"
+            ),
+            "LOCATION": config("cache_location", "momento"),
+            "TIMEOUT": config("cache_timeout", 300, cast=int),
+            "OPTIONS": {"MAX_ENTRIES": config("cache_max_entries", 10000, cast=int)},
+        }
+    }
+    # Seconds a cached API response is served before being rebuilt
+    RESPONSE_CACHE_TTL = config("response_cache_ttl", 60, cast=int)
+
     # Rest framework
     REST_FRAMEWORK = {
         "DEFAULT_AUTHENTICATION_CLASSES": [
-            "rest_framework_simplejwt.authentication.JWTAuthentication",
+            "momento.core.authentication.StatelessJWTAuthentication",
         ],
         "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
         "EXCEPTION_HANDLER": "drf_standardized_errors.handler.exception_handler",
-        "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+        "DEFAULT_PAGINATION_CLASS": "momento.core.pagination.CreatedAtCursorPagination",
         "PAGE_SIZE": 10,
+        "DEFAULT_THROTTLE_CLASSES": [
+            "momento.core.throttling.ScopedBucketThrottle",
+        ],
+    }
+
+    # Rate limits per view throttle_scope, counted per user or, for
+    # anonymous requests, per client IP; login and verify_otp also limit the
+    # failed attempts per email address. "<count>/<sec|min|hour|day>"
+    THROTTLE_RATES = {
+        "login": config("throttle_login", "10/min"),
+        "register": config("throttle_register", "5/hour"),
+        "verify_otp": config("throttle_verify_otp", "10/min"),
+        "like": config("throttle_like", "120/min"),
+        "comment": config("throttle_comment", "30/min"),
     }
+    # Counters live in each process, so every limit above is effectively
+    # multiplied by the number of worker processes; momento.core.throttling
+    # .CacheSlidingWindowStore shares them through the cache instead
+    THROTTLE_STORE = config(
+        "throttle_store", "momento.core.throttling.LocalTokenBucketStore"
+    )
+    THROTTLE_LOCAL_MAX_KEYS = config("throttle_local_max_keys", 100000, cast=int)
+    # Trusted proxies in front of the app that append to X-Forwarded-For
+    THROTTLE_PROXY_COUNT = config("throttle_proxy_count", 0, cast=int)
 
     # DRF Spectacular
     SPECTACULAR_SETTINGS = {
@@ -106,20 +170,133 @@ class Base(Configuration):
     EMAIL_HOST_USER = config("email_user", "iamnasir345@gmail.com")
     EMAIL_HOST_PASSWORD = config("email_password", "pzhdowuzvtwjifvj")
     EMAIL_PORT = config("email_port", 587)
+    # Seconds before a stalled SMTP call gives up; it must stay well under
+    # MAIL_LEASE_SECONDS, which is renewed before each batch is sent
+    EMAIL_TIMEOUT = config("email_timeout", 30, cast=int)
 
     DEFAULT_FROM_EMAIL = config("default_from_email", "nasir@momento.com")
 
+    # Outgoing email is queued in the database and sent by a background
+    # worker; with 0 run the send_queued_mail command instead. Workers in one
+    # process share a connection and send one at a time, so values above 1
+    # add no throughput; run more processes instead
+    MAIL_QUEUE_WORKERS = config("mail_queue_workers", 1, cast=int)
+    MAIL_BATCH_SIZE = config("mail_batch_size", 50, cast=int)
+    # Seconds between polls for retries and other processes' messages
+    MAIL_POLL_INTERVAL = config("mail_poll_interval", 5.0, cast=float)
+    # Failed messages are retried after 30s, 60s, 120s, ... then given up on
+    MAIL_MAX_ATTEMPTS = config("mail_max_attempts", 5, cast=int)
+    MAIL_RETRY_BACKOFF = config("mail_retry_backoff", 30, cast=int)
+    # Seconds a worker owns the messages it claimed; enough to send a batch
+    MAIL_LEASE_SECONDS = config("mail_lease_seconds", 300, cast=int)
+    # Seconds an unused SMTP connection is kept open
+    MAIL_CONNECTION_IDLE = config("mail_connection_idle", 60, cast=int)
+    # Days sent and failed messages are kept, without their bodies
+    MAIL_RETENTION_DAYS = config("mail_retention_days", 7, cast=int)
+
+    # One-time passwords sent at registration expire after OTP_TTL seconds.
+    # user.otp.CacheOTPStore keeps them in the cache instead of the database
+    OTP_STORE = config("otp_store", "user.otp.DatabaseOTPStore")
+    OTP_TTL = config("otp_ttl", 300, cast=int)
+    OTP_PURGE_BATCH_SIZE = config("otp_purge_batch_size", 5000, cast=int)
+
     SIMPLE_JWT = {
         "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
         "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
         "ROTATE_REFRESH_TOKENS": False,
         "BLACKLIST_AFTER_ROTATION": False,
-        "UPDATE_LAST_LOGIN": True,
+        # LoginView records logins itself, see LAST_LOGIN_UPDATE_INTERVAL
+        "UPDATE_LAST_LOGIN": False,
     }
 
+    # Home feed
+    # Authors with a larger accepted audience are merged into feeds on read
+    FEED_FANOUT_MAX_AUDIENCE = config("feed_fanout_max_audience", 5000, cast=int)
+    # Recent posts copied into a timeline when a follow is accepted
+    FEED_BACKFILL_LIMIT = config("feed_backfill_limit", 500, cast=int)
+    # Seconds the list of authors merged on read stays in the shared cache
+    FEED_PULL_AUTHORS_CACHE_TTL = config("feed_pull_authors_cache_ttl", 300, cast=int)
+
+    # Seconds a user's follow graph stays in the shared cache
+    FOLLOW_GRAPH_CACHE_TTL = config("follow_graph_cache_ttl", 3600, cast=int)
+    # Users whose follow graph a process keeps, checked against a version in
+    # the shared cache before each use; needs a shared backend to see other
+    # processes' changes
+    FOLLOW_GRAPH_LOCAL_MAX_USERS = config(
+        "follow_graph_local_max_users", 10000, cast=int
+    )
+
+    # Username typeahead is served from an in-process index. Each process
+    # replays other processes' changes every TYPEAHEAD_SYNC_INTERVAL seconds
+    # and reloads in full every TYPEAHEAD_REBUILD_INTERVAL seconds
+    TYPEAHEAD_SYNC_INTERVAL = config("typeahead_sync_interval", 2.0, cast=float)
+    TYPEAHEAD_REBUILD_INTERVAL = config("typeahead_rebuild_interval", 3600, cast=int)
+    # Names and connections examined per lookup
+    TYPEAHEAD_SCAN = config("typeahead_scan", 200, cast=int)
+    TYPEAHEAD_LIMIT = 10
+
+    # Suggested users kept per user by the refresh_suggestions job
+    SUGGESTIONS_PER_USER = config("suggestions_per_user", 100, cast=int)
+
+    # Seconds profile post/follower/following counts stay cached
+    PROFILE_STATS_CACHE_TTL = config("profile_stats_cache_ttl", 300, cast=int)
+
+    # Likes and views are buffered in memory and written in bulk. The buffer
+    # is per process: the acting user sees their own like at once only from
+    # the process that took it, so with several worker processes other ones
+    # may show the previous count for up to ENGAGEMENT_FLUSH_INTERVAL seconds.
+    # Set it to 0 to write every event immediately where that matters
+    ENGAGEMENT_FLUSH_INTERVAL = config("engagement_flush_interval", 1.0, cast=float)
+    ENGAGEMENT_MAX_PENDING = config("engagement_max_pending", 5000, cast=int)
+
+    # Trending hashtags are ranked by posts over this many recent hours
+    TRENDING_WINDOW_HOURS = config("trending_window_hours", 24, cast=int)
+    TRENDING_CACHE_TTL = config("trending_cache_ttl", 60, cast=int)
+    TRENDING_LIMIT = 20
+
+    # Full-text search: FTS5 tables on SQLite, search.backends.database
+    # .InvertedIndexBackend on any other database
+    SEARCH_BACKEND = config("search_backend", "search.backends.fts5.FTS5Backend")
+    SEARCH_LIMIT = 20
+    # Only the newest matches of a query are ranked, bounding common terms
+    SEARCH_CANDIDATES = config("search_candidates", 1000, cast=int)
+    SEARCH_MAX_LIMIT = 50
+
+    # Comment threads: levels loaded per request and replies shown per branch
+    COMMENT_THREAD_DEPTH = config("comment_thread_depth", 3, cast=int)
+    COMMENT_THREAD_MAX_DEPTH = config("comment_thread_max_depth", 10, cast=int)
+    COMMENT_THREAD_REPLIES = config("comment_thread_replies", 3, cast=int)
+
+    # Rows fetched and encoded per step by streamed list responses
+    STREAM_CHUNK_SIZE = config("stream_chunk_size", 2000, cast=int)
+
     # Media files
     MEDIA_URL = "/media/"
     MEDIA_ROOT = BASE_DIR / "media"
+    # Serve MEDIA_URL from Django; leave off where the web server serves it
+    SERVE_MEDIA = config("serve_media", False, cast=bool)
+    # Uploaded media is validated and resized by background workers
+    MEDIA_PROCESSING_WORKERS = config("media_processing_workers", 2, cast=int)
+    MEDIA_PROCESSING_EAGER = config("media_processing_eager", False, cast=bool)
+    # Media responses are cached by clients; names under these prefixes are
+    # content-addressed and never change
+    MEDIA_CACHE_MAX_AGE = config("media_cache_max_age", 86400, cast=int)
+    MEDIA_IMMUTABLE_PREFIXES = ["blobs/", "renditions/"]
+    # Hand file bodies to the web server: "", "x-accel-redirect" or "x-sendfile"
+    MEDIA_SERVE_OFFLOAD = config("media_serve_offload", "")
+    MEDIA_ACCEL_REDIRECT_PREFIX = config(
+        "media_accel_redirect_prefix", "/protected-media/"
+    )
+    # Chunked uploads are staged here until a post claims them
+    UPLOAD_ROOT = config("upload_root", str(BASE_DIR / "uploads"))
+    UPLOAD_CHUNK_SIZE = config("upload_chunk_size", 8 * 1024 * 1024, cast=int)
+    UPLOAD_MAX_SIZE = config("upload_max_size", 1024 * 1024 * 1024, cast=int)
+    # Scaled-down copies served to clients; one of WEBP, AVIF or JPEG
+    MEDIA_RENDITION_WIDTHS = [320, 640, 1080]
+    MEDIA_RENDITION_FORMAT = config("media_rendition_format", "WEBP")
+    MEDIA_RENDITION_QUALITY = 80
+    # How long a file is remembered as a valid rendition source
+    RENDITION_SOURCE_CACHE_TTL = config("rendition_source_cache_ttl", 3600, cast=int)
 
     # Static files
     STATIC_ROOT = BASE_DIR / "static"
@@ -127,6 +304,7 @@ class Base(Configuration):
 
 class Dev(Base):
     DEBUG = True
+    SERVE_MEDIA = True
     ALLOWED_HOSTS = ["*"]
     CORS_ORIGIN_ALLOW_ALL = True
     DRF_STANDARDIZED_ERRORS = {"ENABLE_IN_DEBUG_FOR_UNHANDLED_EXCEPTIONS": True}
@@ -147,3 +325,5 @@ class Prod(Base):
             "PORT": "3306",
         }
     }
+
+    SEARCH_BACKEND = "search.backends.database.InvertedIndexBackend"
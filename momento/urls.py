@@ -14,10 +14,13 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+from momento.core.views import CacheMetricsView, MediaFileView, RenditionView
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularSwaggerView,
@@ -34,10 +37,26 @@ urlpatterns = [
     ),
     path("api/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
     path("admin/", admin.site.urls),
+    path("api/cache/metrics/", CacheMetricsView.as_view(), name="cache_metrics"),
+    path(
+        "api/renditions/<int:width>/<path:name>",
+        RenditionView.as_view(),
+        name="rendition",
+    ),
     path("api/user/", include("user.urls")),
     path("api/post/", include("post.urls")),
+    path("api/search/", include("search.urls")),
+    path("api/mail/", include("mailer.urls")),
 ]
 
+if settings.DEBUG or settings.SERVE_MEDIA:
+    urlpatterns += [
+        re_path(
+            rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<path>.+)$",
+            MediaFileView.as_view(),
+            name="media",
+        ),
+    ]
+
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -15,3 +15,8 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "momento.settings")
 from configurations.wsgi import get_wsgi_application
 
 application = get_wsgi_application()
+
+# Build the in-process username index before the first request needs it
+from user.typeahead import username_index  # noqa: E402
+
+username_index.load()
@@ -1,7 +1,11 @@
 from django.contrib import admin
 
+from search.backends import get_backend
+from search.documents import DOCUMENTS, query_terms
 from .models import Post, Comment, PostLike, CommentLike, Media
 
+ADMIN_SEARCH_LIMIT = 1000
+
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
@@ -16,6 +20,14 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ["user", "type", "allow_comments", "hide_likes_views_count"]
     search_fields = ["caption"]
 
+    def get_search_results(self, request, queryset, search_term):
+        # Served from the search index instead of a LIKE scan over captions
+        terms = query_terms(search_term)
+        if not terms:
+            return super().get_search_results(request, queryset, search_term)
+        ids = get_backend().search(DOCUMENTS["posts"], terms, ADMIN_SEARCH_LIMIT)
+        return queryset.filter(id__in=ids), False
+
 
 @admin.register(Media)
 class MediaAdmin(admin.ModelAdmin):
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PostConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "post"
+
+    def ready(self):
+        from post import signals  # noqa: F401
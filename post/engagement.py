@@ -0,0 +1,329 @@
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+
+from momento.core.cache import invalidate
+from post.models import Post, PostLike, View
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# Pairs looked up per query, at two parameters each
+PAIRS_PER_QUERY = 400
+
+Key = Tuple[int, int]  # (user_id, post_id)
+
+
+class RowsChanged(Exception):
+    """Rows read for a flush changed before it wrote them."""
+
+
+@dataclass
+class PendingLike:
+    liked: bool  # state requested by the user
+    # Whether a PostLike row exists; looked up only when the delta is read
+    stored: Optional[bool] = None
+
+    @property
+    def delta(self) -> int:
+        return int(self.liked) - int(self.stored)
+
+
+@dataclass
+class FlushStats:
+    flushes: int = 0
+    events: int = 0
+    seconds: float = 0.0
+    last_events: int = 0
+    last_seconds: float = 0.0
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "flushes": self.flushes,
+            "events": self.events,
+            "seconds": self.seconds,
+            "last_events": self.last_events,
+            "last_seconds": self.last_seconds,
+            "events_per_second": self.events_per_second,
+        }
+
+
+@dataclass
+class EngagementBuffer:
+    """Write-behind buffer for post likes, unlikes and views.
+
+    Events are coalesced per ``(user, post)`` in memory and written in bulk by
+    a background thread every ``ENGAGEMENT_FLUSH_INTERVAL`` seconds, or
+    inline once ``ENGAGEMENT_MAX_PENDING`` events are waiting. An interval of
+    ``0`` flushes every event immediately.
+
+    A batch being flushed stays readable until its transaction commits, so
+    the acting user always sees their own likes. The buffer lives in the
+    process that took the event; with several worker processes another one
+    may show the previous count until the flush, see
+    ``ENGAGEMENT_FLUSH_INTERVAL``.
+    """
+
+    stats: FlushStats = field(default_factory=FlushStats)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        # One flush at a time, so at most one batch is in flight
+        self._flush_lock = threading.Lock()
+        self._likes: Dict[Key, PendingLike] = {}
+        # Likes taken by the running flush, until its transaction commits
+        self._flushing: Dict[Key, PendingLike] = {}
+        self._views: Set[Key] = set()
+        self._thread = None
+
+    def like(self, user_id: int, post_id: int):
+        self._add_like(user_id, post_id, True)
+
+    def unlike(self, user_id: int, post_id: int):
+        self._add_like(user_id, post_id, False)
+
+    def view(self, user_id: int, post_id: int):
+        with self._lock:
+            self._views.add((user_id, post_id))
+        self._after_add()
+
+    def pending_like_delta(self, user_id: int, post_id: int) -> int:
+        """Change to ``Post.likes_count`` not yet committed for this user."""
+        key = (user_id, post_id)
+        with self._lock:
+            pending = self._likes.get(key)
+            flushing = self._flushing.get(key)
+            if pending is None and flushing is None:
+                return 0
+            liked = (pending or flushing).liked
+            # Until the flush commits, counts predate its batch
+            base = flushing or pending
+            stored = base.stored
+        if stored is None:
+            stored = PostLike.objects.filter(user_id=user_id, post_id=post_id).exists()
+            with self._lock:
+                if base.stored is None:
+                    base.stored = stored
+        return int(liked) - int(stored)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._likes) + len(self._views)
+
+    def _add_like(self, user_id: int, post_id: int, liked: bool):
+        key = (user_id, post_id)
+        with self._lock:
+            pending = self._likes.get(key)
+            if pending:
+                # Keep the stored state, which predates the first event
+                pending.liked = liked
+            else:
+                self._likes[key] = PendingLike(liked=liked)
+        self._after_add()
+
+    def _after_add(self):
+        interval = settings.ENGAGEMENT_FLUSH_INTERVAL
+        if not interval or self.pending >= settings.ENGAGEMENT_MAX_PENDING:
+            self.flush()
+        elif self._thread is None:
+            self._start(interval)
+
+    def _start(self, interval: float):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, args=(interval,), name="engagement-flush", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, interval: float):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Engagement flush failed")
+            finally:
+                connection.close()
+
+    def flush(self) -> int:
+        """Write every buffered event to the database; returns the event count."""
+        with self._flush_lock:
+            with self._lock:
+                likes, self._likes = self._likes, {}
+                views, self._views = self._views, set()
+                self._flushing.update(likes)
+            try:
+                events = self._flush(likes, views)
+            except Exception:
+                self._landed(likes)
+                raise
+            transaction.on_commit(lambda: self._landed(likes))
+        return events
+
+    def _landed(self, likes: Dict[Key, PendingLike]):
+        with self._lock:
+            for key, pending in likes.items():
+                if self._flushing.get(key) is pending:
+                    del self._flushing[key]
+
+    def _flush(self, likes: Dict[Key, PendingLike], views: Set[Key]) -> int:
+        events = len(likes) + len(views)
+        if not events:
+            return 0
+
+        started = time.perf_counter()
+        # Drop events for posts deleted while they were buffered
+        live = set(
+            Post.objects.filter(
+                pk__in={post_id for _, post_id in [*likes, *views]}
+            ).values_list("pk", flat=True)
+        )
+        likes = {key: pending for key, pending in likes.items() if key[1] in live}
+        views = {key for key in views if key[1] in live}
+        try:
+            likes_delta, views_delta = self._write(likes, views, one_by_one=False)
+        except (IntegrityError, RowsChanged):
+            # Another process flushed some of the same rows since they were
+            # read; redo the flush a row at a time so each counts once
+            likes_delta, views_delta = self._write(likes, views, one_by_one=True)
+        for post_id in likes_delta:
+            invalidate("post", post_id)
+            invalidate("post-likes", post_id)
+        for post_id in views_delta:
+            invalidate("post", post_id)
+        elapsed = time.perf_counter() - started
+
+        self.stats.flushes += 1
+        self.stats.events += events
+        self.stats.seconds += elapsed
+        self.stats.last_events = events
+        self.stats.last_seconds = elapsed
+        logger.debug("Flushed %d engagement events in %.4fs", events, elapsed)
+        return events
+
+    def _write(
+        self, likes: Dict[Key, PendingLike], views: Set[Key], one_by_one: bool
+    ) -> Tuple[Dict[int, int], Dict[int, int]]:
+        with transaction.atomic():
+            likes_delta = self._flush_likes(likes, one_by_one)
+            views_delta = self._flush_views(views, one_by_one)
+            self._apply_deltas("likes_count", likes_delta)
+            self._apply_deltas("views_count", views_delta)
+        return likes_delta, views_delta
+
+    @staticmethod
+    def _existing(model, keys: Iterable[Key]) -> Dict[Key, int]:
+        keys, existing = list(keys), {}
+        for start in range(0, len(keys), PAIRS_PER_QUERY):
+            pairs = Q()
+            for user_id, post_id in keys[start : start + PAIRS_PER_QUERY]:
+                pairs |= Q(user_id=user_id, post_id=post_id)
+            rows = model.objects.filter(pairs).values_list("user_id", "post_id", "id")
+            existing.update({(u, p): pk for u, p, pk in rows})
+        return existing
+
+    def _flush_likes(
+        self, likes: Dict[Key, PendingLike], one_by_one: bool
+    ) -> Dict[int, int]:
+        deltas = defaultdict(int)
+        liked = [key for key, pending in likes.items() if pending.liked]
+        unliked = [key for key, pending in likes.items() if not pending.liked]
+
+        existing = self._existing(PostLike, likes)
+        with self._lock:
+            # Counts read before this flush commits do not include it
+            for key, pending in likes.items():
+                pending.stored = key in existing
+
+        if liked:
+            new = [key for key in liked if key not in existing]
+            for _, post_id in self._insert(PostLike, new, one_by_one):
+                deltas[post_id] += 1
+
+        if unliked:
+            rows = {key: existing[key] for key in unliked if key in existing}
+            for _, post_id in self._delete(PostLike, rows, one_by_one):
+                deltas[post_id] -= 1
+        return deltas
+
+    def _flush_views(self, views: Set[Key], one_by_one: bool) -> Dict[int, int]:
+        deltas = defaultdict(int)
+        if views:
+            existing = self._existing(View, views)
+            new = [key for key in views if key not in existing]
+            for _, post_id in self._insert(View, new, one_by_one):
+                deltas[post_id] += 1
+        return deltas
+
+    @staticmethod
+    def _insert(model, keys: List[Key], one_by_one: bool) -> List[Key]:
+        """Create a row per key; returns the keys whose row this call created.
+
+        In batches a row that already exists raises ``IntegrityError``. Row
+        by row each insert gets a savepoint and existing rows are skipped.
+        """
+        if not one_by_one:
+            model.objects.bulk_create(
+                [model(user_id=u, post_id=p) for u, p in keys], batch_size=BATCH_SIZE
+            )
+            return keys
+        created = []
+        for user_id, post_id in keys:
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create([model(user_id=user_id, post_id=post_id)])
+            except IntegrityError:
+                continue
+            created.append((user_id, post_id))
+        return created
+
+    @staticmethod
+    def _delete(model, rows: Dict[Key, int], one_by_one: bool) -> List[Key]:
+        """Delete rows by id; returns the keys whose row this call deleted.
+
+        In batches a row that is already gone raises ``RowsChanged``. Row by
+        row missing rows are skipped.
+        """
+        keys = list(rows)
+        if one_by_one:
+            return [
+                key for key in keys if model.objects.filter(id=rows[key]).delete()[0]
+            ]
+        for start in range(0, len(keys), BATCH_SIZE):
+            ids = [rows[key] for key in keys[start : start + BATCH_SIZE]]
+            count, _ = model.objects.filter(id__in=ids).delete()
+            if count != len(ids):
+                raise RowsChanged
+        return keys
+
+    @staticmethod
+    def _apply_deltas(counter: str, deltas: Dict[int, int]):
+        # One UPDATE per distinct delta rather than one per post
+        by_delta = defaultdict(list)
+        for post_id, delta in deltas.items():
+            if delta:
+                by_delta[delta].append(post_id)
+        for delta, post_ids in by_delta.items():
+            for start in range(0, len(post_ids), BATCH_SIZE):
+                Post.objects.filter(pk__in=post_ids[start : start + BATCH_SIZE]).update(
+                    **{counter: F(counter) + delta}
+                )
+
+
+engagement_buffer = EngagementBuffer()
+atexit.register(engagement_buffer.flush)
@@ -0,0 +1,150 @@
+from typing import Iterable, List, Optional, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from momento.core.pagination import Key
+from post.models import Post, FeedEntry
+from user.graph import follow_graph
+
+BATCH_SIZE = 1000
+
+PULL_AUTHORS_CACHE_KEY = "feed:pull-authors"
+
+
+def get_audience_ids(user_id: int) -> Set[int]:
+    """Users who can see ``user_id``'s posts (you follow OR who follow you)."""
+    return follow_graph.visible_user_ids(user_id)
+
+
+def _bulk_insert(entries: Iterable[FeedEntry]):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out_post(post: Post):
+    """Push a freshly created post into the timelines of its author's audience.
+
+    Authors whose audience exceeds ``FEED_FANOUT_MAX_AUDIENCE`` are not fanned
+    out; their posts are flagged and merged into timelines at read time by
+    ``home_feed``.
+    """
+    max_audience = settings.FEED_FANOUT_MAX_AUDIENCE
+    if follow_graph.audience_size(post.user_id) > max_audience:
+        post.fanned_out = False
+        post.save(update_fields=["fanned_out"])
+        if post.user_id not in pull_author_ids():
+            _forget_pull_authors()
+            transaction.on_commit(_forget_pull_authors)
+        audience = {post.user_id}
+    else:
+        audience = get_audience_ids(post.user_id)
+    _bulk_insert(
+        FeedEntry(
+            user_id=user_id,
+            post=post,
+            author_id=post.user_id,
+            posted_at=post.created_at,
+        )
+        for user_id in audience
+    )
+
+
+def _backfill(user_id: int, author_id: int):
+    posts = Post.objects.filter(user_id=author_id, fanned_out=True).values_list(
+        "id", "created_at"
+    )[: settings.FEED_BACKFILL_LIMIT]
+    _bulk_insert(
+        FeedEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            posted_at=created_at,
+        )
+        for post_id, created_at in posts
+    )
+
+
+def connect(follower_id: int, followed_id: int):
+    """Backfill both timelines once a follow between two users is accepted."""
+    _backfill(follower_id, followed_id)
+    _backfill(followed_id, follower_id)
+
+
+def disconnect(follower_id: int, followed_id: int):
+    """Drop each user's posts from the other's timeline once a follow between
+    them is removed, unless a follow the other way still connects them."""
+    if follow_graph.can_see(follower_id, followed_id):
+        return
+    FeedEntry.objects.filter(
+        Q(user_id=follower_id, author_id=followed_id)
+        | Q(user_id=followed_id, author_id=follower_id)
+    ).delete()
+
+
+def pull_author_ids() -> Set[int]:
+    """Authors whose posts are merged into timelines on read.
+
+    Shared through the cache for ``FEED_PULL_AUTHORS_CACHE_TTL`` seconds and
+    dropped when ``fan_out_post`` flags a new author's post.
+    """
+    author_ids = cache.get(PULL_AUTHORS_CACHE_KEY)
+    if author_ids is None:
+        author_ids = set(
+            Post.objects.filter(fanned_out=False)
+            .order_by()
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+        cache.set(
+            PULL_AUTHORS_CACHE_KEY, author_ids, settings.FEED_PULL_AUTHORS_CACHE_TTL
+        )
+    return author_ids
+
+
+def _forget_pull_authors():
+    cache.delete(PULL_AUTHORS_CACHE_KEY)
+
+
+def followed_pull_author_ids(user_id: int) -> Set[int]:
+    """Pull authors ``user_id`` is connected to, from the follow graph."""
+    return {
+        author_id
+        for author_id in pull_author_ids()
+        if author_id != user_id and follow_graph.can_see(user_id, author_id)
+    }
+
+
+def home_feed(user_id: int, before: Optional[Key], limit: int) -> List[Key]:
+    """``(posted_at, post_id)`` keys of ``user_id``'s home timeline below
+    ``before``, newest first.
+
+    Fanned-out posts are read from the user's ``FeedEntry`` range in index
+    order; posts by pull authors the user is connected to are merged in from
+    those authors' own ranges.
+    """
+    entries = FeedEntry.objects.filter(user_id=user_id)
+    if before is not None:
+        entries = entries.filter(
+            Q(posted_at__lt=before[0]) | Q(posted_at=before[0], post_id__lt=before[1])
+        )
+    entries = entries.order_by("-posted_at", "-post_id")
+    keys = list(entries.values_list("posted_at", "post_id")[:limit])
+
+    author_ids = followed_pull_author_ids(user_id)
+    if author_ids:
+        posts = Post.objects.filter(user_id__in=author_ids, fanned_out=False)
+        if before is not None:
+            posts = posts.filter(
+                Q(created_at__lt=before[0]) | Q(created_at=before[0], id__lt=before[1])
+            )
+        if len(keys) == limit:
+            # Older posts would not make it into this page
+            posts = posts.filter(created_at__gte=keys[-1][0])
+        posts = posts.order_by("-created_at", "-id")
+        keys += posts.values_list("created_at", "id")[:limit]
+        keys = sorted(keys, reverse=True)[:limit]
+    return keys
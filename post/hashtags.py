@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q, QuerySet, Sum
+from django.utils import timezone
+
+from post.models import Hashtag, HashtagBucket, Post, PostHashtag
+from user.models import Follow
+
+TRENDING_CACHE_KEY = "trending-hashtags:{limit}"
+
+
+def bucket_start(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def window_start(now: Optional[datetime] = None) -> datetime:
+    """Start of the oldest hourly bucket inside the trending window."""
+    now = now or timezone.now()
+    return bucket_start(now) - timedelta(hours=settings.TRENDING_WINDOW_HOURS - 1)
+
+
+def record_post(post: Post, hashtags: Iterable[Hashtag]):
+    """Link a newly created ``post`` to ``hashtags`` and count it towards trending.
+
+    The hour's counter rows are created if missing and then incremented in a
+    single ``UPDATE``, so concurrent posts never lose a count. Counters are
+    not decremented when posts are deleted; they expire with the window.
+    """
+    hashtag_ids = {hashtag.id for hashtag in hashtags}
+    if not hashtag_ids:
+        return
+    PostHashtag.objects.bulk_create(
+        PostHashtag(
+            post=post,
+            hashtag_id=hashtag_id,
+            author_id=post.user_id,
+            posted_at=post.created_at,
+        )
+        for hashtag_id in hashtag_ids
+    )
+    starts_at = bucket_start(post.created_at)
+    HashtagBucket.objects.bulk_create(
+        (
+            HashtagBucket(hashtag_id=hashtag_id, starts_at=starts_at)
+            for hashtag_id in hashtag_ids
+        ),
+        ignore_conflicts=True,
+    )
+    HashtagBucket.objects.filter(
+        hashtag_id__in=hashtag_ids, starts_at=starts_at
+    ).update(count=F("count") + 1)
+
+
+def trending(limit: Optional[int] = None) -> List[Dict]:
+    """Hashtags with the most posts in the last ``TRENDING_WINDOW_HOURS``.
+
+    Sums at most one counter row per hashtag and hour rather than scanning
+    posts, and the ranking is shared through the cache for
+    ``TRENDING_CACHE_TTL`` seconds, so most calls are a single cache read.
+    """
+    limit = limit or settings.TRENDING_LIMIT
+    key = TRENDING_CACHE_KEY.format(limit=limit)
+    ranking = cache.get(key)
+    if ranking is None:
+        ranking = [
+            {"name": name, "posts": total}
+            for name, total in HashtagBucket.objects.filter(
+                starts_at__gte=window_start()
+            )
+            .values("hashtag__name")
+            .annotate(total=Sum("count"))
+            .order_by("-total", "hashtag__name")
+            .values_list("hashtag__name", "total")[:limit]
+        ]
+        cache.set(key, ranking, settings.TRENDING_CACHE_TTL)
+    return ranking
+
+
+def hashtag_feed(hashtag: Hashtag, viewer_id: int) -> QuerySet:
+    """Links to the posts tagged ``hashtag`` that ``viewer_id`` can see.
+
+    Visibility is matched on the link's ``author`` against subqueries on
+    ``Follow``, so the query binds a fixed number of parameters however many
+    connections the viewer has, and posts are only joined for the rows that
+    pass. SQLite walks ``posthashtag_feed_idx`` newest first, or for viewers
+    with few connections ``posthashtag_author_idx`` per author.
+    """
+    accepted = Follow.objects.filter(status=Follow.Status.ACCEPTED)
+    following = accepted.filter(follower_id=viewer_id).values("followed_id")
+    followers = accepted.filter(followed_id=viewer_id).values("follower_id")
+    return (
+        PostHashtag.objects.filter(
+            Q(author_id=viewer_id)
+            | Q(author_id__in=following)
+            | Q(author_id__in=followers),
+            hashtag=hashtag,
+        )
+        .select_related("post__user__profile")
+        .prefetch_related("post__media")
+    )
+
+
+def prune_buckets(now: Optional[datetime] = None) -> int:
+    """Delete counters that have left the trending window."""
+    deleted, _ = HashtagBucket.objects.filter(starts_at__lt=window_start(now)).delete()
+    return deleted
@@ -0,0 +1,471 @@
+import io
+import random
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from PIL import Image
+from rest_framework.test import APIClient
+
+from momento.core.authentication import RefreshToken
+from momento.core.benchmark import (
+    find_regressions,
+    load_baseline,
+    measure,
+    write_results,
+)
+from momento.core.cache import invalidate_viewer
+from post.feed import get_audience_ids
+from post.media_processing import process_media
+from post.hashtags import bucket_start
+from post.models import (
+    Post,
+    Media,
+    PostLike,
+    Comment,
+    Hashtag,
+    HashtagBucket,
+    PostHashtag,
+    FeedEntry,
+)
+from user import suggestions
+from user.models import User, Profile, Follow
+from user.otp import get_otp_store
+
+PASSWORD = "benchmark-password"
+# Endpoints behind cache_response; measured on misses, which is the work
+# the response cache saves
+CACHED = {
+    "me",
+    "users",
+    "post_retrieve",
+    "post_comments",
+    "post_thread",
+    "post_likes",
+}
+
+
+def png_file(name: str = "photo.png") -> SimpleUploadedFile:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), color=(200, 120, 40)).save(buffer, format="PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a synthetic social graph into a throwaway database, profile every "
+        "API endpoint and compare query counts, rows, latency and memory "
+        "against a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=2000)
+        parser.add_argument("--following", type=int, default=20)
+        parser.add_argument("--posts-per-user", type=int, default=2)
+        parser.add_argument("--likes-per-post", type=int, default=10)
+        parser.add_argument("--comments-per-post", type=int, default=4)
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--baseline",
+            default=str(settings.BASE_DIR / "benchmarks" / "api_baseline.json"),
+        )
+        parser.add_argument("--output", help="Also write the results to this file")
+        parser.add_argument("--update-baseline", action="store_true")
+        parser.add_argument("--latency-tolerance", type=float, default=1.0)
+        parser.add_argument("--memory-tolerance", type=float, default=0.25)
+        parser.add_argument(
+            "--only", nargs="*", help="Restrict the run to these endpoint names"
+        )
+
+    def handle(self, *args, **options):
+        config = {
+            key: options[key]
+            for key in (
+                "users",
+                "following",
+                "posts_per_user",
+                "likes_per_post",
+                "comments_per_post",
+                "iterations",
+                "seed",
+            )
+        }
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root,
+                ENGAGEMENT_FLUSH_INTERVAL=0,
+                # Uploads stay queued; processing is measured on its own below
+                MEDIA_PROCESSING_WORKERS=0,
+                MAIL_QUEUE_WORKERS=0,
+                # Limits are still checked but never reached
+                THROTTLE_RATES={
+                    scope: "1000000/min" for scope in settings.THROTTLE_RATES
+                },
+            ):
+                self.rng = random.Random(options["seed"])
+                self.build_graph(config)
+                results = self.run_scenarios(config["iterations"], options["only"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, result in sorted(results.items()):
+            self.stdout.write(
+                f"{name:<24} queries={result['queries']:<4} rows={result['rows']:<6} "
+                f"p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms "
+                f"peak={result['peak_kb']:.1f}KB"
+            )
+
+        report = {"config": config, "endpoints": results}
+        if options["output"]:
+            write_results(Path(options["output"]), report)
+
+        baseline_path = Path(options["baseline"])
+        baseline = load_baseline(baseline_path)
+        if options["update_baseline"]:
+            if options["only"] and baseline and baseline["config"] == config:
+                # Partial runs only refresh the endpoints they measured
+                report["endpoints"] = {**baseline["endpoints"], **results}
+            write_results(baseline_path, report)
+            self.stdout.write(
+                self.style.SUCCESS(f"Baseline written to {baseline_path}")
+            )
+            return
+
+        if baseline is None:
+            raise CommandError(
+                f"No baseline at {baseline_path}; run with --update-baseline first"
+            )
+        if baseline["config"] != config:
+            raise CommandError(
+                "Baseline was recorded with a different configuration: "
+                f"{baseline['config']}"
+            )
+        regressions, warnings = find_regressions(
+            baseline["endpoints"],
+            results,
+            latency_tolerance=options["latency_tolerance"],
+            memory_tolerance=options["memory_tolerance"],
+        )
+        for warning in warnings:
+            self.stderr.write(self.style.WARNING(f"Slower than baseline: {warning}"))
+        if regressions:
+            raise CommandError("Regressions found:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
+
+    def build_graph(self, config):
+        rng = self.rng
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create(
+            User(
+                email=f"user{i}@momento.com",
+                username=f"user{i}",
+                name=f"User {i}",
+                password=password,
+                is_public=i % 10 != 0,
+            )
+            for i in range(config["users"])
+        )
+        Profile.objects.bulk_create(
+            Profile(user=user, bio="Synthetic profile") for user in users[::2]
+        )
+
+        pairs = set()
+        for user in users:
+            for other in rng.sample(users, min(config["following"], len(users) - 1)):
+                if other.id != user.id:
+                    pairs.add((user.id, other.id))
+        Follow.objects.bulk_create(
+            Follow(
+                follower_id=follower_id,
+                followed_id=followed_id,
+                status=(
+                    Follow.Status.PENDING
+                    if rng.random() < 0.05
+                    else Follow.Status.ACCEPTED
+                ),
+            )
+            for follower_id, followed_id in pairs
+        )
+
+        hashtags = Hashtag.objects.bulk_create(
+            Hashtag(name=f"tag{i}") for i in range(50)
+        )
+        posts = Post.objects.bulk_create(
+            Post(user=user, caption=f"Post by {user.username}")
+            for user in users
+            for _ in range(config["posts_per_user"])
+        )
+        Media.objects.bulk_create(
+            Media(post=post, file=f"{post.id}/photo.jpg") for post in posts
+        )
+        links = PostHashtag.objects.bulk_create(
+            PostHashtag(
+                post=post,
+                hashtag=hashtag,
+                author_id=post.user_id,
+                posted_at=post.created_at,
+            )
+            for post in posts
+            for hashtag in rng.sample(hashtags, 2)
+        )
+        buckets = Counter(
+            (link.hashtag_id, bucket_start(link.posted_at)) for link in links
+        )
+        HashtagBucket.objects.bulk_create(
+            HashtagBucket(hashtag_id=hashtag_id, starts_at=starts_at, count=count)
+            for (hashtag_id, starts_at), count in buckets.items()
+        )
+        PostLike.objects.bulk_create(
+            PostLike(user=user, post=post)
+            for post in posts
+            for user in rng.sample(users, config["likes_per_post"])
+        )
+        comments = Comment.objects.bulk_create(
+            Comment(user=rng.choice(users), post=post, content="Synthetic comment")
+            for post in posts
+            for _ in range(config["comments_per_post"])
+        )
+        # One level of replies, then replies to those replies
+        for _ in range(2):
+            comments = Comment.objects.bulk_create(
+                Comment.reply_to(
+                    parent, user=rng.choice(users), content="Synthetic reply"
+                )
+                for parent in comments[::2]
+            )
+        call_command("reconcile_counters", stdout=io.StringIO())
+        call_command("rebuild_search_index", stdout=io.StringIO())
+
+        audiences = {}
+        for followed_id, follower_id in Follow.objects.filter(
+            status=Follow.Status.ACCEPTED
+        ).values_list("followed_id", "follower_id"):
+            audiences.setdefault(followed_id, {followed_id}).add(follower_id)
+            audiences.setdefault(follower_id, {follower_id}).add(followed_id)
+        FeedEntry.objects.bulk_create(
+            (
+                FeedEntry(
+                    user_id=user_id,
+                    post_id=post.id,
+                    author_id=post.user_id,
+                    posted_at=post.created_at,
+                )
+                for post in posts
+                for user_id in audiences.get(post.user_id, {post.user_id})
+            ),
+            batch_size=1000,
+        )
+
+        self.viewer = users[1]
+        self.users = users
+
+    def run_scenarios(self, iterations, only):
+        viewer = self.viewer
+        client = APIClient()
+        # A real token, so authentication is part of what is measured
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(viewer).access_token}"
+        )
+        anonymous = APIClient()
+        count = iterations + 3
+
+        visible_ids = get_audience_ids(viewer.id)
+        visible_posts = list(
+            Post.objects.filter(user_id__in=visible_ids).values_list("id", flat=True)
+        )
+        busy_post = (
+            Post.objects.filter(user_id__in=visible_ids)
+            .order_by("-comments_count")
+            .first()
+        )
+        comment_ids = list(
+            Comment.objects.filter(parent__isnull=True).values_list("id", flat=True)[
+                :count
+            ]
+        )
+        visible_comment_ids = list(
+            Comment.objects.filter(
+                parent__isnull=True, post__user_id__in=visible_ids
+            ).values_list("id", flat=True)[:count]
+        )
+        connected = Follow.objects.filter(follower=viewer).values_list(
+            "followed_id", flat=True
+        )
+        strangers = list(
+            User.objects.exclude(id__in=visible_ids)
+            .exclude(id__in=connected)
+            .values_list("id", flat=True)[:count]
+        )
+        requesters = User.objects.exclude(id__in=visible_ids).exclude(
+            id__in=Follow.objects.filter(followed=viewer).values("follower_id")
+        )[:count]
+        pending = Follow.objects.bulk_create(
+            Follow(follower=user, followed=viewer, status=Follow.Status.PENDING)
+            for user in requesters
+        )
+        inactive = [
+            User.objects.create(
+                email=f"inactive{i}@momento.com",
+                username=f"inactive{i}",
+                name="Inactive",
+                is_active=False,
+            )
+            for i in range(count)
+        ]
+        store = get_otp_store()
+        codes = [store.issue(user.id) for user in inactive]
+        own_posts = Post.objects.bulk_create(
+            Post(user=viewer, caption="To be deleted") for _ in range(count)
+        )
+        uploads = [
+            Media.objects.create(
+                post=post, file=png_file(), status=Media.Status.PENDING
+            )
+            for post in Post.objects.bulk_create(
+                Post(user=viewer, caption="Processing") for _ in range(count)
+            )
+        ]
+        refresh = str(RefreshToken.for_user(viewer))
+        suggestions.compute_for_user(viewer.id)
+
+        scenarios = {
+            # user/urls.py
+            "login": lambda i: anonymous.post(
+                "/api/user/token/", {"email": viewer.email, "password": PASSWORD}
+            ),
+            "token_refresh": lambda i: anonymous.post(
+                "/api/user/token/refresh/", {"refresh": refresh}
+            ),
+            "register": lambda i: anonymous.post(
+                "/api/user/register/",
+                {
+                    "email": f"new{i}@momento.com",
+                    "username": f"new{i}",
+                    "name": "New",
+                    "password": PASSWORD,
+                    "date_of_birth": "2000-01-01",
+                },
+            ),
+            "verify_otp": lambda i: anonymous.post(
+                "/api/user/verify-otp/",
+                {"email": inactive[i].email, "code": codes[i]},
+            ),
+            "me": lambda i: client.get("/api/user/me/"),
+            "overview": lambda i: client.get(
+                f"/api/user/overview/?user_id={self.users[i].id}"
+            ),
+            "suggested_users": lambda i: client.get("/api/user/suggested-users/"),
+            "users": lambda i: client.get("/api/user/users/"),
+            "typeahead": lambda i: client.get(
+                "/api/user/typeahead/", {"q": f"user{i % 10}"}
+            ),
+            "follow_request": lambda i: client.post(
+                "/api/user/follow-request/", {"followed_id": strangers[i]}
+            ),
+            "follow_request_action": lambda i: client.post(
+                f"/api/user/follow-request-action/{pending[i].id}/",
+                {"action": "accept"},
+            ),
+            # post/urls.py
+            "post_list": lambda i: client.get("/api/post/"),
+            "post_list_me": lambda i: client.get("/api/post/?me=1"),
+            "post_retrieve": lambda i: client.get(f"/api/post/{busy_post.id}/"),
+            "post_create": lambda i: client.post(
+                "/api/post/",
+                {
+                    "caption": "Benchmark",
+                    "hashtags": "tag1,tag2",
+                    "media": [png_file()],
+                },
+                format="multipart",
+            ),
+            "post_destroy": lambda i: client.delete(f"/api/post/{own_posts[i].id}/"),
+            "post_like": lambda i: client.post(f"/api/post/{visible_posts[i]}/like/"),
+            "post_unlike": lambda i: client.post(
+                f"/api/post/{visible_posts[i]}/unlike/"
+            ),
+            "post_view": lambda i: client.post(f"/api/post/{visible_posts[i]}/view/"),
+            "post_comment": lambda i: client.post(
+                f"/api/post/{busy_post.id}/comment/", {"content": "Benchmark"}
+            ),
+            "post_comments": lambda i: client.get(
+                f"/api/post/{busy_post.id}/comments/"
+            ),
+            "post_thread": lambda i: client.get(f"/api/post/{busy_post.id}/thread/"),
+            "post_likes": lambda i: client.get(f"/api/post/{busy_post.id}/likes/"),
+            "hashtag_posts": lambda i: client.get(
+                f"/api/post/hashtags/tag{i % 50}/posts/"
+            ),
+            "hashtag_trending": lambda i: client.get("/api/post/hashtags/trending/"),
+            "comment_retrieve": lambda i: client.get(
+                f"/api/post/comments/{comment_ids[i]}/"
+            ),
+            "comment_replies": lambda i: client.post(
+                f"/api/post/comments/{comment_ids[i]}/replies/"
+            ),
+            "comment_thread": lambda i: client.get(
+                f"/api/post/comments/{visible_comment_ids[i]}/thread/"
+            ),
+            "comment_like": lambda i: client.post(
+                f"/api/post/comments/{comment_ids[i]}/like/"
+            ),
+            # search/urls.py
+            "search": lambda i: client.get("/api/search/", {"q": f"user{i % 10}"}),
+            "search_posts": lambda i: client.get(
+                "/api/search/", {"q": "post by", "type": "posts"}
+            ),
+            # Not covered: PATCH on posts and POST on comments have no serializer,
+            # GET /comments/ is shadowed by the post detail route and the comment
+            # likes action serializes likes as comments.
+        }
+
+        results = {}
+        for name, scenario in scenarios.items():
+            if only and name not in only:
+                continue
+            if name in CACHED:
+                scenario = self.uncached(viewer, scenario)
+            results[name] = measure(self.checked(name, scenario), iterations)
+        if not only or "media_process" in only:
+            results["media_process"] = measure(
+                lambda i: process_media(uploads[i].id), iterations
+            )
+        return results
+
+    @staticmethod
+    def uncached(viewer, scenario):
+        """Expire the viewer's cached responses before each request, so the
+        handler runs every time; other caches stay warm."""
+
+        def run(i):
+            invalidate_viewer(viewer.id)
+            return scenario(i)
+
+        return run
+
+    @staticmethod
+    def checked(name, scenario):
+        def run(i):
+            response = scenario(i)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f"{name} returned {response.status_code}: {response.content[:200]}"
+                )
+            return response
+
+        return run
@@ -0,0 +1,91 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from momento.core.benchmark import peak_memory, write_results
+from post.models import Post, Comment
+from post.serializers import CommentListSerializer
+from user.models import User, Profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare peak memory of rendering every comment on a post in one "
+        "buffered response against the streamed ?stream=1 response, for a "
+        "range of result sizes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", nargs="*", type=int, default=[1000, 5000, 20000, 50000]
+        )
+        parser.add_argument("--output", help="Also write the results to this file")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.run(sorted(options["sizes"]))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'rows':>8} {'buffered':>14} {'streamed':>14}")
+        for size, result in results.items():
+            self.stdout.write(
+                f"{size:>8} {result['buffered_kb']:>12.1f}KB "
+                f"{result['streamed_kb']:>12.1f}KB"
+            )
+        if options["output"]:
+            write_results(Path(options["output"]), {"sizes": results})
+
+    def run(self, sizes):
+        author = User.objects.create(
+            email="author@momento.com", username="author", name="Author"
+        )
+        commenters = User.objects.bulk_create(
+            User(email=f"fan{i}@momento.com", username=f"fan{i}", name=f"Fan {i}")
+            for i in range(50)
+        )
+        Profile.objects.bulk_create(Profile(user=user) for user in commenters)
+        post = Post.objects.create(user=author, caption="Busy post")
+        client = APIClient()
+        client.force_authenticate(author)
+
+        results, created = {}, 0
+        for size in sizes:
+            Comment.objects.bulk_create(
+                (
+                    Comment(
+                        user=commenters[i % len(commenters)],
+                        post=post,
+                        content=f"Comment number {i} on a very busy post",
+                    )
+                    for i in range(created, size)
+                ),
+                batch_size=2000,
+            )
+            created = size
+            comments = post.comments.select_related("user__profile").order_by(
+                "created_at", "id"
+            )
+
+            def buffered():
+                data = CommentListSerializer(comments.all(), many=True).data
+                JSONRenderer().render({"results": data})
+
+            def streamed():
+                response = client.get(f"/api/post/{post.id}/comments/?stream=1")
+                for _ in response.streaming_content:
+                    pass
+                response.close()
+
+            results[size] = {
+                "buffered_kb": peak_memory(buffered),
+                "streamed_kb": peak_memory(streamed),
+            }
+        return results
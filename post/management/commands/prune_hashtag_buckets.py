@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from post.hashtags import prune_buckets
+
+
+class Command(BaseCommand):
+    help = "Delete hourly hashtag counters that have left the trending window."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Hashtag buckets pruned: {prune_buckets()}")
@@ -0,0 +1,50 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from post.models import Blob
+from post.storage import content_addressed_storage
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete blob files that no Blob row counts, such as files stored by "
+        "a transaction that rolled back, and stale staging files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=24,
+            help="Hours since the file was written, so saves in flight are kept",
+        )
+
+    def handle(self, *args, **options):
+        storage = content_addressed_storage()
+        root = storage.path(storage.prefix)
+        cutoff = time.time() - options["hours"] * 3600
+        candidates = []
+        for directory, _, files in os.walk(root):
+            for file in files:
+                path = os.path.join(directory, file)
+                if os.path.getmtime(path) < cutoff:
+                    candidates.append(path)
+
+        purged = 0
+        for start in range(0, len(candidates), BATCH_SIZE):
+            batch = {
+                os.path.relpath(path, storage.location).replace(os.sep, "/"): path
+                for path in candidates[start : start + BATCH_SIZE]
+            }
+            known = set(
+                Blob.objects.filter(name__in=list(batch)).values_list("name", flat=True)
+            )
+            for name, path in batch.items():
+                if name not in known:
+                    os.remove(path)
+                    purged += 1
+        self.stdout.write(f"Orphaned blobs purged: {purged}")
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from post import uploads
+from post.models import Upload
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads that were never attached to a post."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours", type=int, default=24, help="Hours since the upload last received a chunk"
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["hours"])
+        stale = list(Upload.objects.filter(updated_at__lt=cutoff))
+        for upload in stale:
+            uploads.discard(upload)
+        Upload.objects.filter(id__in=[upload.id for upload in stale]).delete()
+        self.stdout.write(f"Uploads purged: {len(stale)}")
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from momento.core.queries import count_of
+from post.models import Post, Comment, PostLike, CommentLike, View
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized like/comment/view counters and fix any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        fixed = self.reconcile(
+            Post,
+            {
+                "likes_count": count_of(PostLike.objects, "post"),
+                "comments_count": count_of(Comment.objects, "post"),
+                "views_count": count_of(View.objects, "post"),
+            },
+            batch_size,
+        )
+        self.stdout.write(f"Posts fixed: {fixed}")
+        fixed = self.reconcile(
+            Comment,
+            {
+                "replies_count": count_of(Comment.objects, "parent"),
+                "likes_count": count_of(CommentLike.objects, "comment"),
+            },
+            batch_size,
+        )
+        self.stdout.write(f"Comments fixed: {fixed}")
+
+    @staticmethod
+    def reconcile(model, counters, batch_size: int) -> int:
+        fields = list(counters)
+        annotations = {f"actual_{name}": expr for name, expr in counters.items()}
+        fixed = 0
+        last_id = 0
+        while True:
+            batch = list(
+                model.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .only("pk", *fields)
+                .annotate(**annotations)[:batch_size]
+            )
+            if not batch:
+                return fixed
+            last_id = batch[-1].pk
+            drifted = []
+            for obj in batch:
+                changed = False
+                for name in fields:
+                    actual = getattr(obj, f"actual_{name}")
+                    if getattr(obj, name) != actual:
+                        setattr(obj, name, actual)
+                        changed = True
+                if changed:
+                    drifted.append(obj)
+            if drifted:
+                model.objects.bulk_update(drifted, fields)
+                fixed += len(drifted)
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from post.media_processing import media_pipeline
+from post.models import Media
+
+
+class Command(BaseCommand):
+    help = (
+        "Process media left pending or processing by a worker that stopped, "
+        "and wait for it to finish."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--minutes",
+            type=int,
+            default=15,
+            help="Minutes since the media was uploaded or claimed",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options["minutes"])
+        stale = Media.objects.filter(
+            status__in=[Media.Status.PENDING, Media.Status.PROCESSING],
+            updated_at__lt=cutoff,
+        )
+        ids = list(stale.values_list("id", flat=True))
+        # Rows a worker finished in the meantime are left alone
+        stale.filter(id__in=ids).update(
+            status=Media.Status.PENDING, updated_at=timezone.now()
+        )
+        media_pipeline.submit(ids)
+        media_pipeline.join()
+        self.stdout.write(f"Media requeued: {len(ids)}")
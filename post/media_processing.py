@@ -0,0 +1,146 @@
+import io
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.utils import timezone
+from PIL import Image
+
+from momento.core import renditions
+from post.models import Media
+from utils.helpers import sniff_media_type
+
+logger = logging.getLogger(__name__)
+
+
+def save_renditions(media: Media, source: str, image: Image.Image) -> Dict[str, str]:
+    """Pre-generate the renditions the API will advertise for ``media``."""
+    storage = media.file.storage
+    return {
+        str(width): renditions.ensure(storage, source, width, image)
+        for width in renditions.widths_for(image.width)
+    }
+
+
+def extract_poster(media: Media) -> Optional[bytes]:
+    """First frame after one second of a video as PNG, if ffmpeg is available."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+    try:
+        source = media.file.path
+    except NotImplementedError:
+        return None
+    with tempfile.TemporaryDirectory() as directory:
+        target = os.path.join(directory, "poster.png")
+        command = [ffmpeg, "-y", "-ss", "1", "-i", source, "-frames:v", "1", target]
+        subprocess.run(command, capture_output=True, timeout=60, check=False)
+        if not os.path.exists(target):
+            return None
+        with open(target, "rb") as poster:
+            return poster.read()
+
+
+def process_media(media_id: int):
+    """Validate an uploaded file and fill in its type, size and renditions."""
+    # update() skips auto_now, so stamp the claim for requeue_media
+    claimed = Media.objects.filter(pk=media_id, status=Media.Status.PENDING).update(
+        status=Media.Status.PROCESSING, updated_at=timezone.now()
+    )
+    if not claimed:
+        return
+    media = Media.objects.get(pk=media_id)
+    fields = ["status", "type", "content_type", "width", "height", "renditions"]
+    image = None
+    try:
+        with media.file.open("rb") as file:
+            media_type, content_type = sniff_media_type(file)
+            if media_type == Media.Type.IMAGE:
+                file.seek(0)
+                image = renditions.open_image(file)
+        if media_type is None:
+            raise ValueError(f"Unsupported content in {media.file.name}")
+
+        media.type = media_type
+        media.content_type = content_type
+        source = media.file.name
+        if media_type == Media.Type.VIDEO:
+            poster = extract_poster(media)
+            image = renditions.open_image(io.BytesIO(poster)) if poster else None
+            if poster:
+                media.poster.save(f"{media.id}.png", ContentFile(poster), save=False)
+                source = media.poster.name
+                fields.append("poster")
+        if image is not None:
+            media.width, media.height = image.size
+            media.renditions = save_renditions(media, source, image)
+        media.status = Media.Status.READY
+    except Exception:
+        logger.exception("Processing media %s failed", media_id)
+        media.status = Media.Status.FAILED
+    media.save(update_fields=fields)
+
+
+class MediaPipeline:
+    """Processes uploaded media on a pool of background worker threads.
+
+    Jobs are media ids on an in-process queue. With
+    ``MEDIA_PROCESSING_EAGER`` set they run inline instead, which is what
+    tests use. Jobs lost with their process are picked up again by the
+    ``requeue_media`` command.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[int]" = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def submit(self, media_ids: Iterable[int]):
+        if settings.MEDIA_PROCESSING_EAGER:
+            for media_id in media_ids:
+                process_media(media_id)
+            return
+        self._start()
+        for media_id in media_ids:
+            self._queue.put(media_id)
+
+    def join(self):
+        """Block until every submitted job has finished."""
+        self._queue.join()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _start(self):
+        with self._lock:
+            while len(self._workers) < settings.MEDIA_PROCESSING_WORKERS:
+                worker = threading.Thread(
+                    target=self._work,
+                    name=f"media-worker-{len(self._workers)}",
+                    daemon=True,
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            media_id = self._queue.get()
+            try:
+                process_media(media_id)
+            except Exception:
+                logger.exception("Media worker failed on %s", media_id)
+            finally:
+                connection.close()
+                self._queue.task_done()
+
+
+media_pipeline = MediaPipeline()
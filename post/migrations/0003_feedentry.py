@@ -0,0 +1,122 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_feed_entries(apps, schema_editor):
+    Post = apps.get_model("post", "Post")
+    FeedEntry = apps.get_model("post", "FeedEntry")
+    Follow = apps.get_model("user", "Follow")
+
+    audiences = {}
+    for followed_id, follower_id in Follow.objects.filter(
+        status="accepted"
+    ).values_list("followed_id", "follower_id"):
+        audiences.setdefault(followed_id, set()).add(follower_id)
+        audiences.setdefault(follower_id, set()).add(followed_id)
+
+    entries = []
+    for post_id, author_id, created_at in Post.objects.values_list(
+        "id", "user_id", "created_at"
+    ).iterator():
+        for user_id in audiences.get(author_id, set()) | {author_id}:
+            entries.append(
+                FeedEntry(
+                    user_id=user_id,
+                    post_id=post_id,
+                    author_id=author_id,
+                    posted_at=created_at,
+                )
+            )
+    FeedEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0002_rename_like_postlike_post_allow_comments_and_more"),
+        ("user", "0002_alter_profile_user"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FeedEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("posted_at", models.DateTimeField()),
+            ],
+            options={
+                "ordering": ["-posted_at"],
+            },
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="fanned_out",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("fanned_out", False)),
+                fields=["user", "-created_at"],
+                name="post_pull_author_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="feedentry",
+            name="author",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="feedentry",
+            name="post",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="feed_entries",
+                to="post.post",
+            ),
+        ),
+        migrations.AddField(
+            model_name="feedentry",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="feed_entries",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="feedentry",
+            index=models.Index(
+                fields=["user", "-posted_at"], name="feed_user_posted_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="feedentry",
+            index=models.Index(fields=["user", "author"], name="feed_user_author_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="feedentry",
+            constraint=models.UniqueConstraint(
+                fields=("user", "post"), name="unique_feed_entry"
+            ),
+        ),
+        migrations.RunPython(backfill_feed_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0003_feedentry"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["post", "created_at", "id"], name="comment_post_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["-created_at", "-id"], name="post_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"], name="post_user_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="postlike",
+            index=models.Index(
+                fields=["post", "-created_at", "-id"], name="postlike_post_created_idx"
+            ),
+        ),
+    ]
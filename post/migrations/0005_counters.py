@@ -0,0 +1,65 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:10
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    def count_of(model, field):
+        counts = (
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    Post = apps.get_model("post", "Post")
+    Comment = apps.get_model("post", "Comment")
+    Post.objects.update(
+        likes_count=count_of(apps.get_model("post", "PostLike"), "post"),
+        comments_count=count_of(Comment, "post"),
+        views_count=count_of(apps.get_model("post", "View"), "post"),
+    )
+    Comment.objects.update(
+        replies_count=count_of(Comment, "parent"),
+        likes_count=count_of(apps.get_model("post", "CommentLike"), "comment"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0004_cursor_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="replies_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="comments_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="views_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
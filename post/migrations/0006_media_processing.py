@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:31
+
+import post.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0005_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="media",
+            name="content_type",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="media",
+            name="height",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="media",
+            name="poster",
+            field=models.ImageField(
+                blank=True, null=True, upload_to=post.models.media_poster_upload_to
+            ),
+        ),
+        migrations.AddField(
+            model_name="media",
+            name="renditions",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="media",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("processing", "Processing"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                ],
+                default="ready",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="media",
+            name="width",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
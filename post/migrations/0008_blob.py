@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:43
+
+import post.models
+import post.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0007_upload"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Blob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("size", models.PositiveBigIntegerField()),
+                ("refcount", models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.AlterField(
+            model_name="media",
+            name="file",
+            field=models.FileField(
+                storage=post.storage.content_addressed_storage,
+                upload_to=post.models.media_upload_to,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="media",
+            name="poster",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=post.storage.content_addressed_storage,
+                upload_to=post.models.media_poster_upload_to,
+            ),
+        ),
+    ]
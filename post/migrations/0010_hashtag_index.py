@@ -0,0 +1,147 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:53
+
+from collections import Counter
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+
+def fill_posted_at(apps, schema_editor):
+    PostHashtag = apps.get_model("post", "PostHashtag")
+    Post = apps.get_model("post", "Post")
+    PostHashtag.objects.update(
+        posted_at=Subquery(
+            Post.objects.filter(pk=OuterRef("post_id")).values("created_at")[:1]
+        )
+    )
+
+
+def fill_buckets(apps, schema_editor):
+    PostHashtag = apps.get_model("post", "PostHashtag")
+    HashtagBucket = apps.get_model("post", "HashtagBucket")
+    cutoff = timezone.now() - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+    counts = Counter(
+        (hashtag_id, posted_at.replace(minute=0, second=0, microsecond=0))
+        for hashtag_id, posted_at in PostHashtag.objects.filter(
+            posted_at__gte=cutoff
+        ).values_list("hashtag_id", "posted_at")
+    )
+    HashtagBucket.objects.bulk_create(
+        (
+            HashtagBucket(hashtag_id=hashtag_id, starts_at=starts_at, count=count)
+            for (hashtag_id, starts_at), count in counts.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0009_comment_thread_index"),
+    ]
+
+    operations = [
+        # The implicit many-to-many table already has these columns; only
+        # Django's view of it changes
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="PostHashtag",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        (
+                            "hashtag",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="post_links",
+                                to="post.hashtag",
+                            ),
+                        ),
+                        (
+                            "post",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="+",
+                                to="post.post",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "post_post_hashtags",
+                        "unique_together": {("post", "hashtag")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="post",
+                    name="hashtags",
+                    field=models.ManyToManyField(
+                        blank=True,
+                        related_name="posts",
+                        through="post.PostHashtag",
+                        to="post.hashtag",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="posthashtag",
+            name="posted_at",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(fill_posted_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="posthashtag",
+            name="posted_at",
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name="posthashtag",
+            index=models.Index(
+                fields=["hashtag", "-posted_at", "-id"], name="posthashtag_feed_idx"
+            ),
+        ),
+        migrations.CreateModel(
+            name="HashtagBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("starts_at", models.DateTimeField()),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "hashtag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="buckets",
+                        to="post.hashtag",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["starts_at"], name="hashtagbucket_starts_idx")
+                ],
+                "unique_together": {("hashtag", "starts_at")},
+            },
+        ),
+        migrations.RunPython(fill_buckets, migrations.RunPython.noop),
+    ]
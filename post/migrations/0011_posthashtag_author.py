@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_author(apps, schema_editor):
+    PostHashtag = apps.get_model("post", "PostHashtag")
+    Post = apps.get_model("post", "Post")
+    PostHashtag.objects.update(
+        author_id=Subquery(
+            Post.objects.filter(pk=OuterRef("post_id")).values("user_id")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0010_hashtag_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="posthashtag",
+            name="author",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(fill_author, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="posthashtag",
+            name="author",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="posthashtag",
+            index=models.Index(
+                fields=["hashtag", "author", "-posted_at"],
+                name="posthashtag_author_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0011_posthashtag_author"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="feedentry",
+            name="feed_user_posted_idx",
+        ),
+        migrations.AddIndex(
+            model_name="feedentry",
+            index=models.Index(
+                fields=["user", "-posted_at", "-post"], name="feed_user_posted_idx"
+            ),
+        ),
+    ]
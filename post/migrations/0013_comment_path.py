@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import CharField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Concat
+
+
+def fill_path(apps, schema_editor):
+    Comment = apps.get_model("post", "Comment")
+    # One UPDATE per level of nesting: each level's paths extend the parents'
+    # filled in by the previous pass
+    level = Comment.objects.filter(parent__isnull=False, parent__parent__isnull=True)
+    depth = 1
+    while True:
+        updated = level.update(
+            depth=depth,
+            path=Concat(
+                Subquery(
+                    Comment.objects.filter(pk=OuterRef("parent_id")).values("path")[:1]
+                ),
+                Cast("parent_id", CharField()),
+                Value("/"),
+                output_field=CharField(),
+            ),
+        )
+        if not updated:
+            break
+        level = Comment.objects.filter(parent__depth=depth)
+        depth += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0012_feed_entry_post_order"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="path",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=640
+            ),
+        ),
+        migrations.RunPython(fill_path, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(fields=["path", "depth"], name="comment_path_idx"),
+        ),
+    ]
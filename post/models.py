@@ -1,6 +1,9 @@
+import uuid
+
 from django.db import models
 
 from momento.core.models import BaseModel
+from post.storage import content_addressed_storage
 
 
 class Post(BaseModel):
@@ -13,12 +16,31 @@ class Post(BaseModel):
     )
     type = models.CharField(max_length=20, choices=Type.choices, default=Type.POST)
     caption = models.TextField(blank=True, null=True)
-    hashtags = models.ManyToManyField("Hashtag", related_name="posts", blank=True)
+    hashtags = models.ManyToManyField(
+        "Hashtag", related_name="posts", blank=True, through="PostHashtag"
+    )
     allow_comments = models.BooleanField(default=True)
     hide_likes_views_count = models.BooleanField(default=False)
+    # False when the author's audience was too large to fan out on write; such
+    # posts are merged into home feeds at read time instead.
+    fanned_out = models.BooleanField(default=True)
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    views_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="post_created_idx"),
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="post_user_created_idx"
+            ),
+            models.Index(
+                fields=["user", "-created_at"],
+                condition=models.Q(fanned_out=False),
+                name="post_pull_author_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.type}"
@@ -28,20 +50,88 @@ def media_upload_to(instance, filename):
     return f"{instance.post.id}/{filename}"
 
 
+def media_poster_upload_to(instance, filename):
+    return f"{instance.post_id}/posters/{filename}"
+
+
 class Media(BaseModel):
     class Type(models.TextChoices):
         IMAGE = "image", "Image"
         VIDEO = "video", "Video"
 
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        PROCESSING = "processing", "Processing"
+        READY = "ready", "Ready"
+        FAILED = "failed", "Failed"
+
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="media")
     type = models.CharField(max_length=20, choices=Type.choices, default=Type.IMAGE)
-    file = models.FileField(upload_to=media_upload_to)
+    file = models.FileField(
+        upload_to=media_upload_to, storage=content_addressed_storage
+    )
     position = models.PositiveIntegerField(default=0)  # order in the carousel
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.READY
+    )
+    content_type = models.CharField(max_length=100, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    poster = models.ImageField(
+        upload_to=media_poster_upload_to,
+        storage=content_addressed_storage,
+        null=True,
+        blank=True,
+    )
+    renditions = models.JSONField(default=dict, blank=True)  # width -> file name
 
     class Meta:
         ordering = ["position"]
 
 
+class Blob(BaseModel):
+    """A file in content-addressed storage and how many fields point at it."""
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return self.name
+
+
+class Upload(BaseModel):
+    """A file sent in chunks ahead of the post that will use it."""
+
+    class Status(models.TextChoices):
+        UPLOADING = "uploading", "Uploading"
+        COMPLETE = "complete", "Complete"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        "user.User", on_delete=models.CASCADE, related_name="uploads"
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64, blank=True)  # SHA-256, hex
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.UPLOADING
+    )
+
+    @property
+    def chunk_count(self) -> int:
+        return -(-self.size // self.chunk_size)
+
+    def chunk_length(self, index: int) -> int:
+        if index == self.chunk_count - 1:
+            return self.size - index * self.chunk_size
+        return self.chunk_size
+
+    def __str__(self):
+        return f"{self.user.username} - {self.filename}"
+
+
 class PostLike(BaseModel):
     user = models.ForeignKey(
         "user.User", on_delete=models.CASCADE, related_name="likes"
@@ -50,6 +140,11 @@ class PostLike(BaseModel):
 
     class Meta:
         unique_together = ("user", "post")
+        indexes = [
+            models.Index(
+                fields=["post", "-created_at", "-id"], name="postlike_post_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.post}"
@@ -64,13 +159,54 @@ class Comment(BaseModel):
     parent = models.ForeignKey(
         "self", on_delete=models.CASCADE, null=True, blank=True, related_name="replies"
     )
+    # Ids of the ancestors, top-level first, each followed by "/"; empty for
+    # top-level comments. A comment's replies at any depth share one range of
+    # the index, see subtree(). Bounded so MySQL can index it; replies below
+    # the deepest comments that fit are refused
+    path = models.CharField(max_length=640, default="", blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    replies_count = models.PositiveIntegerField(default=0)
+    likes_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            models.Index(
+                fields=["post", "created_at", "id"], name="comment_post_created_idx"
+            ),
+            models.Index(
+                fields=["parent", "created_at", "id"],
+                name="comment_parent_created_idx",
+            ),
+            models.Index(fields=["path", "depth"], name="comment_path_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.post}"
 
+    @classmethod
+    def reply_to(cls, parent: "Comment", **fields) -> "Comment":
+        """An unsaved reply to ``parent``, placed in its thread."""
+        return cls(
+            parent=parent,
+            post_id=parent.post_id,
+            path=f"{parent.path}{parent.pk}/",
+            depth=parent.depth + 1,
+            **fields,
+        )
+
+    def subtree(self) -> models.Q:
+        """Matches every reply below this comment, however deep."""
+        prefix = f"{self.path}{self.pk}/"
+        # "0" sorts right after "/", so this is every path starting with prefix
+        return models.Q(path__gte=prefix, path__lt=f"{prefix[:-1]}0")
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.parent_id and not self.path:
+            self.path = f"{self.parent.path}{self.parent_id}/"
+            self.depth = self.parent.depth + 1
+        super().save(*args, **kwargs)
+
 
 class CommentLike(BaseModel):
     user = models.ForeignKey(
@@ -94,6 +230,57 @@ class Hashtag(BaseModel):
         return f"#{self.name}"
 
 
+class PostHashtag(models.Model):
+    """Link between a post and a hashtag, ordered by the post's creation time.
+
+    Uses the table Django created for the original implicit many-to-many.
+    ``author`` copies the post's user so visibility is checked without
+    joining posts.
+    """
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="+")
+    hashtag = models.ForeignKey(
+        Hashtag, on_delete=models.CASCADE, related_name="post_links"
+    )
+    author = models.ForeignKey("user.User", on_delete=models.CASCADE, related_name="+")
+    posted_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "post_post_hashtags"
+        unique_together = ("post", "hashtag")
+        indexes = [
+            models.Index(
+                fields=["hashtag", "-posted_at", "-id"], name="posthashtag_feed_idx"
+            ),
+            models.Index(
+                fields=["hashtag", "author", "-posted_at"],
+                name="posthashtag_author_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.hashtag} - {self.post_id}"
+
+
+class HashtagBucket(models.Model):
+    """Posts tagged with a hashtag during one hour, for trending."""
+
+    hashtag = models.ForeignKey(
+        Hashtag, on_delete=models.CASCADE, related_name="buckets"
+    )
+    starts_at = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("hashtag", "starts_at")
+        indexes = [
+            models.Index(fields=["starts_at"], name="hashtagbucket_starts_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.hashtag} @ {self.starts_at}: {self.count}"
+
+
 class Mention(BaseModel):
     user = models.ForeignKey(
         "user.User", on_delete=models.CASCADE, related_name="mentions"
@@ -129,3 +316,31 @@ class View(BaseModel):
 
     def __str__(self):
         return f"{self.user.username} - {self.post}"
+
+
+class FeedEntry(BaseModel):
+    """A post materialized into a user's home timeline."""
+
+    user = models.ForeignKey(
+        "user.User", on_delete=models.CASCADE, related_name="feed_entries"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="feed_entries"
+    )
+    author = models.ForeignKey("user.User", on_delete=models.CASCADE, related_name="+")
+    posted_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-posted_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="unique_feed_entry")
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-posted_at", "-post"], name="feed_user_posted_idx"
+            ),
+            models.Index(fields=["user", "author"], name="feed_user_author_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.post}"
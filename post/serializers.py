@@ -1,27 +1,51 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 import arrow
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
 from rest_framework import serializers
 
-from post.models import Post, Media, Comment, PostLike, Hashtag
+from momento.core.renditions import srcset
+from post.engagement import engagement_buffer
+from post.feed import fan_out_post
+from post.hashtags import record_post
+from post.media_processing import media_pipeline
+from post.models import Post, Media, Comment, PostLike, Hashtag, Upload
+from post.threads import more_replies_url
+from post.uploads import discard, open_assembled, received_chunks
+from search.indexing import index_later
 from user.models import User
 from user.serializers import UserSerializer
-from utils.helpers import get_media_type
+from utils.helpers import get_media_type, sniff_media_type
 
 
 class MediaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Media
-        fields = ["id", "file", "type", "position"]
+        fields = ["id", "file", "type", "position", "status", "width", "height"]
 
-    def to_representation(self, instance: "Media") -> Dict[str, Any]:
-        data = super().to_representation(instance)
-        url: str = self.context["request"].build_absolute_uri(instance.file.url)
+    def build_url(self, file) -> str:
+        url: str = self.context["request"].build_absolute_uri(file.url)
         if "media/media" in url:
             url = url.replace("/media", "", 1)
-        data["file"] = url
+        return url
+
+    def to_representation(self, instance: "Media") -> Dict[str, Any]:
+        data = super().to_representation(instance)
+        data["file"] = self.build_url(instance.file)
+        data["poster"] = self.build_url(instance.poster) if instance.poster else None
+        data["srcset"] = self.get_srcset(instance)
         return data
 
+    def get_srcset(self, instance: "Media") -> Dict[str, str]:
+        source = instance.poster if instance.type == Media.Type.VIDEO else instance.file
+        if not source or instance.status == Media.Status.FAILED:
+            return {}
+        urls = srcset(source.name, instance.width, instance.renditions)
+        request = self.context["request"]
+        return {width: request.build_absolute_uri(url) for width, url in urls.items()}
+
 
 class PostListSerializer(serializers.ModelSerializer):
     user = serializers.SerializerMethodField()
@@ -34,26 +58,32 @@ class PostListSerializer(serializers.ModelSerializer):
         model = Post
         fields = ["id", "user", "created_ago", "caption", "media", "likes", "comments"]
 
-    @staticmethod
-    def get_user(obj: "Post") -> UserSerializer:
-        return UserSerializer(obj.user).data
+    def get_user(self, obj: "Post") -> UserSerializer:
+        return UserSerializer(obj.user, context=self.context).data
 
     @staticmethod
     def get_created_ago(obj: "Post") -> str:
         return arrow.get(obj.created_at).humanize()
 
     def get_media(self, obj: "Post") -> List[MediaSerializer]:
+        # Filtered here so the prefetched media is reused
+        media = [m for m in obj.media.all() if m.status != Media.Status.FAILED]
         return MediaSerializer(
-            obj.media.all(), many=True, context=self.context
+            media, many=True, context=self.context
         ).data
 
-    @staticmethod
-    def get_likes(obj: "Post") -> int:
-        return getattr(obj, "likes_count", 0)
+    def get_likes(self, obj: "Post") -> int:
+        # Include the viewer's own likes that are still buffered
+        request = self.context.get("request")
+        if not request:
+            return obj.likes_count
+        return obj.likes_count + engagement_buffer.pending_like_delta(
+            request.user.id, obj.id
+        )
 
     @staticmethod
     def get_comments(obj: "Post") -> int:
-        return getattr(obj, "comments_count", 0)
+        return obj.comments_count
 
 
 class CSVField(serializers.Field):
@@ -66,7 +96,12 @@ class CSVField(serializers.Field):
 
 class PostCreateSerializer(serializers.Serializer):
     caption = serializers.CharField(max_length=255, allow_blank=True, allow_null=True, required=False)
-    media = serializers.ListField(child=serializers.FileField(), write_only=True)
+    media = serializers.ListField(
+        child=serializers.FileField(), write_only=True, required=False
+    )
+    upload_ids = serializers.ListField(
+        child=serializers.UUIDField(), write_only=True, required=False
+    )
     hashtags = CSVField(
         required=False,
         allow_null=True,
@@ -76,18 +111,49 @@ class PostCreateSerializer(serializers.Serializer):
     allow_comments = serializers.BooleanField(default=True)
     hide_likes_views_count = serializers.BooleanField(default=False)
 
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        upload_ids = attrs.get("upload_ids", [])
+        if not attrs.get("media") and not upload_ids:
+            raise serializers.ValidationError("Provide media or upload_ids")
+        uploads = Upload.objects.in_bulk(upload_ids)
+        for upload_id in upload_ids:
+            upload = uploads.get(upload_id)
+            if (
+                upload is None
+                or upload.user_id != self.context["request"].user.id
+                or upload.status != Upload.Status.COMPLETE
+            ):
+                raise serializers.ValidationError(
+                    {"upload_ids": f"Upload {upload_id} is not complete"}
+                )
+        attrs["uploads"] = [uploads[upload_id] for upload_id in upload_ids]
+        return attrs
+
     def create(self, validated_data: Dict[str, Any]) -> Post:
         caption = validated_data.get("caption", "")
         media = validated_data.get("media", [])
+        uploads = validated_data.get("uploads", [])
         hashtags = validated_data.get("hashtags", [])
         post_type = validated_data.get("type", Post.Type.POST)
         allow_comments = validated_data.get("allow_comments", True)
         hide_likes_views_count = validated_data.get("hide_likes_views_count", False)
+        if uploads:
+            # Claim the uploads so two posts cannot both take the same file
+            claimed, _ = Upload.objects.filter(
+                id__in=[upload.id for upload in uploads],
+                status=Upload.Status.COMPLETE,
+            ).delete()
+            if claimed != len(uploads):
+                raise serializers.ValidationError(
+                    {"upload_ids": "Uploads were already used"}
+                )
         if hashtags:
             names = [h.strip() for h in hashtags]
             hashtags = [Hashtag(name=name) for name in names]
             Hashtag.objects.bulk_create(hashtags, ignore_conflicts=True)
             hashtags = Hashtag.objects.filter(name__in=names)
+            # bulk_create sends no post_save, so index the names here
+            index_later("hashtags", hashtags)
         post = Post.objects.create(
             user=self.context["request"].user,
             caption=caption,
@@ -95,14 +161,53 @@ class PostCreateSerializer(serializers.Serializer):
             allow_comments=allow_comments,
             hide_likes_views_count=hide_likes_views_count,
         )
-        post.hashtags.set(hashtags)
+        record_post(post, hashtags)
         media_objs = []
         for index, file in enumerate(media):
-            media_type = get_media_type(file)
-            media_obj = Media(post=post, file=file, type=media_type, position=index)
+            # Processing sniffs the content and corrects or rejects the guess
+            media_type = get_media_type(file) or Media.Type.IMAGE
+            media_obj = Media(
+                post=post,
+                file=file,
+                type=media_type,
+                position=index,
+                status=Media.Status.PENDING,
+            )
             media_objs.append(media_obj)
+        files = []
+        try:
+            for index, upload in enumerate(uploads, start=len(media_objs)):
+                file = open_assembled(upload)
+                files.append(file)
+                # The client names the file, so go by what it contains
+                media_type, _ = sniff_media_type(file)
+                file.seek(0)
+                media_objs.append(
+                    Media(
+                        post=post,
+                        file=file,
+                        type=media_type or Media.Type.IMAGE,
+                        position=index,
+                        status=Media.Status.PENDING,
+                    )
+                )
+            if media_objs:
+                Media.objects.bulk_create(media_objs)
+        finally:
+            for file in files:
+                file.close()
         if media_objs:
-            Media.objects.bulk_create(media_objs)
+            # Validation and renditions happen off the request path
+            transaction.on_commit(
+                lambda: media_pipeline.submit(
+                    post.media.filter(status=Media.Status.PENDING).values_list(
+                        "id", flat=True
+                    )
+                )
+            )
+        if uploads:
+            transaction.on_commit(lambda: [discard(upload) for upload in uploads])
+        fan_out_post(post)
         return post
 
 
@@ -113,9 +218,8 @@ class CommentListSerializer(serializers.Serializer):
     replies = serializers.SerializerMethodField()
     likes = serializers.SerializerMethodField()
 
-    @staticmethod
-    def get_user(obj: "Comment") -> UserSerializer:
-        return UserSerializer(obj.user).data
+    def get_user(self, obj: "Comment") -> UserSerializer:
+        return UserSerializer(obj.user, context=self.context).data
 
     @staticmethod
     def get_created_ago(obj: "Comment") -> str:
@@ -123,11 +227,35 @@ class CommentListSerializer(serializers.Serializer):
 
     @staticmethod
     def get_replies(obj: "Comment") -> int:
-        return getattr(obj, "replies_count", 0)
+        return obj.replies_count
 
     @staticmethod
     def get_likes(obj: "Comment") -> int:
-        return getattr(obj, "comment_likes_count", 0)
+        return obj.likes_count
+
+
+class ThreadCommentSerializer(CommentListSerializer):
+    """A comment with the replies loaded below it by ``load_replies``.
+
+    ``next_replies`` links to the rest of a branch: replies beyond the ones
+    shown, or all of them once the depth limit is reached.
+    """
+
+    id = serializers.IntegerField()
+    children = serializers.SerializerMethodField()
+    next_replies = serializers.SerializerMethodField()
+
+    def get_children(self, obj: "Comment") -> List[Dict[str, Any]]:
+        children = self.context["replies"].get(obj.id, [])
+        return ThreadCommentSerializer(children, many=True, context=self.context).data
+
+    def get_next_replies(self, obj: "Comment") -> Optional[str]:
+        shown = self.context["replies"].get(obj.id, [])
+        if obj.id not in self.context["expanded"]:
+            shown = []
+        if obj.replies_count <= len(shown):
+            return None
+        return more_replies_url(self.context["request"], obj, shown)
 
 
 class CommentCreateSerializer(serializers.Serializer):
@@ -136,27 +264,75 @@ class CommentCreateSerializer(serializers.Serializer):
         queryset=Comment.objects.all(), required=False, allow_null=True
     )
 
+    @staticmethod
+    def validate_reply_to(value: Optional[Comment]) -> Optional[Comment]:
+        limit = Comment._meta.get_field("path").max_length
+        if value and len(f"{value.path}{value.pk}/") > limit:
+            raise serializers.ValidationError("This thread is nested too deeply")
+        return value
+
     def create(self, validated_data: Dict[str, Any]) -> Comment:
         user = self.context.get("user")
         post = self.context.get("post")
         content = validated_data.get("content", "")
         reply_to = validated_data.get("reply_to", None)
-        return Comment.objects.create(
-            user=user,
-            content=content,
-            parent=reply_to,
-            post=post,
-        )
+        with transaction.atomic():
+            comment = Comment.objects.create(
+                user=user,
+                content=content,
+                parent=reply_to,
+                post=post,
+            )
+            Post.objects.filter(pk=post.pk).update(
+                comments_count=F("comments_count") + 1
+            )
+            if reply_to:
+                Comment.objects.filter(pk=reply_to.pk).update(
+                    replies_count=F("replies_count") + 1
+                )
+        return comment
 
 
 class PostLikeListSerializer(serializers.Serializer):
     user = serializers.SerializerMethodField()
     created_ago = serializers.SerializerMethodField()
 
-    @staticmethod
-    def get_user(obj: "PostLike") -> UserSerializer:
-        return UserSerializer(obj.user).data
+    def get_user(self, obj: "PostLike") -> UserSerializer:
+        return UserSerializer(obj.user, context=self.context).data
 
     @staticmethod
     def get_created_ago(obj: "PostLike") -> str:
         return arrow.get(obj.created_at).humanize()
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    received = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Upload
+        fields = [
+            "id",
+            "filename",
+            "size",
+            "checksum",
+            "chunk_size",
+            "status",
+            "received",
+            "created_at",
+        ]
+        read_only_fields = ["chunk_size", "status"]
+
+    @staticmethod
+    def validate_size(value: int) -> int:
+        if not 0 < value <= settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Size must be between 1 and {settings.UPLOAD_MAX_SIZE} bytes"
+            )
+        return value
+
+    @staticmethod
+    def get_received(obj: "Upload") -> List[int]:
+        # Chunks on disk are the source of truth, so clients can resume
+        if obj.status == Upload.Status.COMPLETE:
+            return list(range(obj.chunk_count))
+        return received_chunks(obj)
@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from momento.core import renditions
+from momento.core.cache import invalidate
+from post.models import Post, Media, PostLike, Comment, CommentLike
+from post.storage import release
+
+
+@receiver([post_save, post_delete], sender=Post)
+def post_changed(sender, instance, **kwargs):
+    invalidate("post", instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Media)
+def media_changed(sender, instance, **kwargs):
+    invalidate("post", instance.post_id)
+
+
+@receiver(post_delete, sender=Media)
+def media_deleted(sender, instance, **kwargs):
+    release(instance.file.storage, instance.file.name)
+    release(instance.poster.storage, instance.poster.name)
+    renditions.forget_sources(instance.file.name, instance.poster.name)
+
+
+@receiver([post_save, post_delete], sender=PostLike)
+def post_like_changed(sender, instance, **kwargs):
+    invalidate("post", instance.post_id)
+    invalidate("post-likes", instance.post_id)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    invalidate("post", instance.post_id)
+    invalidate("post-comments", instance.post_id)
+
+
+@receiver([post_save, post_delete], sender=CommentLike)
+def comment_like_changed(sender, instance, **kwargs):
+    invalidate("post-comments", instance.comment.post_id)
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.fields.files import ImageFieldFile
+
+READ_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Stores each distinct file once, under a path derived from its SHA-256.
+
+    Content is hashed while it is streamed to a staging file, so the name is
+    known without a second pass. Saving bytes that already exist only adds a
+    reference to the existing blob, and ``delete`` drops a reference, removing
+    the file once nothing points at it. Files saved before this storage was
+    introduced keep their names and are deleted outright. Files stored by a
+    transaction that rolled back are removed by ``purge_orphan_blobs``.
+    """
+
+    prefix = "blobs"
+
+    def blob_name(self, digest: str, extension: str) -> str:
+        return f"{self.prefix}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+    def get_available_name(self, name, max_length=None):
+        # Names are chosen from the content in _save, so never suffix them
+        return name
+
+    def _stage(self, content):
+        """Hash ``content`` and return ``(digest, size, staged_path, owned)``.
+
+        Files that already sit on local disk (large temporary uploads and
+        assembled chunked uploads) are hashed in place and later moved rather
+        than copied; ``owned`` is False for those.
+        """
+        sha = hashlib.sha256()
+        size = 0
+        if hasattr(content, "temporary_file_path"):
+            path = content.temporary_file_path()
+            with open(path, "rb") as file:
+                for piece in iter(lambda: file.read(READ_SIZE), b""):
+                    sha.update(piece)
+                    size += len(piece)
+            return sha.hexdigest(), size, path, False
+
+        staging = self.path(f"{self.prefix}/tmp")
+        os.makedirs(staging, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=staging, delete=False) as out:
+            if hasattr(content, "seek"):
+                content.seek(0)
+            for piece in content.chunks(READ_SIZE):
+                if isinstance(piece, str):
+                    piece = piece.encode()
+                sha.update(piece)
+                size += len(piece)
+                out.write(piece)
+        return sha.hexdigest(), size, out.name, True
+
+    def _save(self, name, content):
+        # Imported here because post.models points its fields at this module
+        from post.models import Blob
+
+        digest, size, staged, owned = self._stage(content)
+        name = self.blob_name(digest, os.path.splitext(name)[1].lower())
+        path = self.path(name)
+        try:
+            with transaction.atomic():
+                blob, created = Blob.objects.select_for_update().get_or_create(
+                    name=name, defaults={"size": size}
+                )
+                if not created:
+                    Blob.objects.filter(pk=blob.pk).update(
+                        refcount=F("refcount") + 1
+                    )
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    file_move_safe(staged, path, allow_overwrite=True)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+                elif created:
+                    # Left by a save that rolled back; look new again so
+                    # purge_orphan_blobs does not take it
+                    os.utime(path)
+        finally:
+            if owned and os.path.exists(staged):
+                os.remove(staged)
+        return name
+
+    def delete(self, name):
+        from post.models import Blob
+
+        if not name.startswith(f"{self.prefix}/"):
+            return super().delete(name)
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(name=name).first()
+            if blob is None or blob.refcount <= 1:
+                if blob is not None:
+                    blob.delete()
+                super().delete(name)
+            else:
+                Blob.objects.filter(pk=blob.pk).update(refcount=F("refcount") - 1)
+
+
+class BlobFileMixin:
+    """Re-saving a field with the content it already holds keeps one reference.
+
+    ``_save`` takes a reference for every save, and the old name is only
+    released when the name changes, so an identical re-save would otherwise
+    leave the blob with a reference nothing points at.
+    """
+
+    def save(self, name, content, save=True):
+        current = self.name if self._committed else None
+        super().save(name, content, save=False)
+        if current and self.name == current:
+            self.storage.delete(current)
+        if save:
+            self.instance.save()
+
+
+class BlobImageFieldFile(BlobFileMixin, ImageFieldFile):
+    pass
+
+
+class BlobImageField(models.ImageField):
+    """An ``ImageField`` for content-addressed storage."""
+
+    attr_class = BlobImageFieldFile
+
+
+def release(storage, name: str):
+    """Drop a reference to a stored file once the current transaction commits."""
+    if name:
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+_content_addressed_storage = ContentAddressedStorage()
+
+
+def content_addressed_storage() -> ContentAddressedStorage:
+    """Storage for uploaded media; a callable so migrations stay portable."""
+    return _content_addressed_storage
@@ -1,3 +1,1006 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import re
+import shutil
+import tempfile
+from unittest import mock
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from momento.core.benchmark import count_rows
+from momento.core.cache import invalidate
+from post.engagement import EngagementBuffer, engagement_buffer
+from post.feed import fan_out_post
+from post.hashtags import prune_buckets, record_post, trending
+from post.serializers import CommentCreateSerializer
+from post.storage import content_addressed_storage
+from post.models import (
+    Post,
+    Media,
+    PostLike,
+    Comment,
+    Upload,
+    Blob,
+    FeedEntry,
+    Hashtag,
+    HashtagBucket,
+)
+from user.graph import follow_graph
+from user.models import User, Profile, Follow
+
+
+@override_settings(ENGAGEMENT_FLUSH_INTERVAL=0)
+class PostListQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create(
+            email="viewer@momento.com", username="viewer", name="Viewer"
+        )
+        cls.authors = []
+        for i in range(3):
+            author = User.objects.create(
+                email=f"author{i}@momento.com", username=f"author{i}", name="Author"
+            )
+            Profile.objects.create(user=author, bio="bio")
+            Follow.objects.create(
+                follower=cls.viewer, followed=author, status=Follow.Status.ACCEPTED
+            )
+            cls.authors.append(author)
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+
+    def create_posts(self, engagement: int):
+        fans = User.objects.bulk_create(
+            User(
+                email=f"fan{engagement}-{i}@momento.com",
+                username=f"fan{engagement}-{i}",
+                name="Fan",
+            )
+            for i in range(engagement)
+        )
+        for author in self.authors:
+            for _ in range(4):
+                post = Post.objects.create(user=author, caption="caption")
+                Media.objects.create(post=post, file=f"{post.id}/photo.jpg")
+                PostLike.objects.bulk_create(PostLike(user=f, post=post) for f in fans)
+                Comment.objects.bulk_create(
+                    Comment(user=f, post=post, content="nice") for f in fans
+                )
+                fan_out_post(post)
+
+    def get_feed(self, url="/api/post/"):
+        client = APIClient()
+        client.force_authenticate(self.viewer)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), context.captured_queries
+
+    def assert_feed_cost(self):
+        data, queries = self.get_feed()
+        self.assertEqual(len(data["results"]), 10)
+        # timeline keys, posts, media prefetch, and the pull author list,
+        # which is cached after the first request
+        self.assertEqual(len(queries), 4)
+        for query in queries:
+            self.assertNotIn("post_postlike", query["sql"])
+            self.assertNotIn("post_comment", query["sql"])
+        data, queries = self.get_feed(data["next"])
+        self.assertEqual(len(data["results"]), 2)
+        self.assertEqual(len(queries), 3)
+
+    def test_feed_query_count_without_engagement(self):
+        self.create_posts(engagement=0)
+        self.assert_feed_cost()
+
+    def test_feed_query_count_with_heavy_engagement(self):
+        self.create_posts(engagement=50)
+        self.assert_feed_cost()
+
+    def test_large_timeline_is_read_in_index_order(self):
+        posts = Post.objects.bulk_create(
+            Post(user=self.authors[0], caption="caption") for _ in range(2000)
+        )
+        moment = timezone.now()
+        FeedEntry.objects.bulk_create(
+            FeedEntry(
+                user=self.viewer,
+                post=post,
+                author=self.authors[0],
+                # Pairs share a timestamp, so pages must break ties by id
+                posted_at=moment + timedelta(seconds=i // 2),
+            )
+            for i, post in enumerate(posts)
+        )
+        seen, url = [], "/api/post/?page_size=7"
+        for _ in range(3):
+            data, queries = self.get_feed(url)
+            seen += [post["id"] for post in data["results"]]
+            url = data["next"]
+        self.assertEqual(seen, sorted((p.id for p in posts), reverse=True)[:21])
+        self.assertEqual(len(queries), 3)
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + queries[0]["sql"])
+            plan = " ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("feed_user_posted_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_cursor_pages_break_timestamp_ties_by_id(self):
+        author = self.authors[0]
+        post = Post.objects.create(user=author, caption="tied")
+        mine = Post.objects.bulk_create(
+            Post(user=self.viewer, caption=f"mine {i}") for i in range(5)
+        )
+        Comment.objects.bulk_create(
+            Comment(user=author, post=post, content=f"comment {i}") for i in range(5)
+        )
+        fans = User.objects.bulk_create(
+            User(email=f"tied{i}@momento.com", username=f"tied{i}", name="Fan")
+            for i in range(5)
+        )
+        PostLike.objects.bulk_create(PostLike(user=fan, post=post) for fan in fans)
+        moment = timezone.now()
+        for model in (Post, Comment, PostLike):
+            model.objects.update(created_at=moment)
+
+        def page_through(url, field):
+            seen = []
+            while url:
+                data, queries = self.get_feed(url)
+                # SQLite happens to return ties by id; other databases need
+                # the tiebreak spelled out
+                self.assertTrue(
+                    any(
+                        re.search(
+                            r'ORDER BY \S+"created_at" \w+, \S+"id" \w+', q["sql"]
+                        )
+                        for q in queries
+                    ),
+                    url,
+                )
+                seen += [field(row) for row in data["results"]]
+                url = data["next"]
+            return seen
+
+        self.assertEqual(
+            page_through("/api/post/?me=1&page_size=2", lambda row: row["id"]),
+            [p.id for p in reversed(mine)],
+        )
+        self.assertEqual(
+            page_through(
+                f"/api/post/{post.id}/comments/?page_size=2",
+                lambda row: row["content"],
+            ),
+            [f"comment {i}" for i in range(5)],
+        )
+        self.assertEqual(
+            page_through(
+                f"/api/post/{post.id}/likes/?page_size=2",
+                lambda row: row["user"]["id"],
+            ),
+            [fan.id for fan in reversed(fans)],
+        )
+
+    @override_settings(FEED_FANOUT_MAX_AUDIENCE=0)
+    def test_pull_author_posts_are_merged_in_order(self):
+        celebrity = User.objects.create(
+            email="celebrity@momento.com", username="celebrity", name="Celebrity"
+        )
+        Follow.objects.create(
+            follower=self.viewer, followed=celebrity, status=Follow.Status.ACCEPTED
+        )
+        posted = []
+        for author in (self.authors[0], celebrity, self.authors[1], celebrity):
+            post = Post.objects.create(user=author, caption="caption")
+            if author is celebrity:
+                fan_out_post(post)
+            else:
+                with self.settings(FEED_FANOUT_MAX_AUDIENCE=5000):
+                    fan_out_post(post)
+            posted.append(post.id)
+        self.assertFalse(Post.objects.get(id=posted[1]).fanned_out)
+        seen, url = [], "/api/post/?page_size=3"
+        while url:
+            data, _ = self.get_feed(url)
+            seen += [post["id"] for post in data["results"]]
+            url = data["next"]
+        self.assertEqual(seen, posted[::-1])
+
+
+@override_settings(ENGAGEMENT_FLUSH_INTERVAL=0)
+class EngagementTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="liker@momento.com", username="liker", name="Liker"
+        )
+        cls.post = Post.objects.create(user=cls.user, caption="liked")
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def likes_count(self) -> int:
+        self.post.refresh_from_db()
+        return self.post.likes_count
+
+    def test_cached_post_is_per_viewer_and_expires_on_commit(self):
+        url = f"/api/post/{self.post.id}/"
+        fan = User.objects.create(email="fan@momento.com", username="fan", name="Fan")
+        Follow.objects.create(
+            follower=fan, followed=self.user, status=Follow.Status.ACCEPTED
+        )
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json()["caption"], "liked")
+        other = APIClient()
+        other.force_authenticate(fan)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(other.get(url).status_code, 200)
+        self.assertTrue(context.captured_queries)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            invalidate("post", self.post.id)
+            # A read racing the write caches the old row under the new version
+            self.client.get(url)
+            Post.objects.filter(pk=self.post.pk).update(caption="edited")
+            self.assertEqual(self.client.get(url).json()["caption"], "liked")
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(url).json()["caption"], "edited")
+        self.assertEqual(other.get(url).json()["caption"], "edited")
+
+    def test_reconcile_counters_corrects_drift(self):
+        comment = Comment.objects.create(user=self.user, post=self.post, content="c")
+        Comment.objects.create(
+            user=self.user, post=self.post, content="r", parent=comment
+        )
+        PostLike.objects.create(user=self.user, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(likes_count=7, comments_count=0)
+        Comment.objects.filter(pk=comment.pk).update(replies_count=3)
+
+        out = io.StringIO()
+        call_command("reconcile_counters", batch_size=1, stdout=out)
+        self.assertIn("Posts fixed: 1", out.getvalue())
+        self.assertIn("Comments fixed: 1", out.getvalue())
+        self.post.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (1, 2))
+        self.assertEqual(comment.replies_count, 1)
+
+        out = io.StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertIn("Posts fixed: 0", out.getvalue())
+
+    def test_liking_does_not_read_likes_in_the_request(self):
+        with mock.patch.object(engagement_buffer, "_after_add"):
+            with CaptureQueriesContext(connection) as context:
+                self.client.post(f"/api/post/{self.post.id}/like/")
+            self.assertFalse(
+                any(PostLike._meta.db_table in q["sql"] for q in context), context
+            )
+            # The viewer sees their own like before it is written
+            response = self.client.get(f"/api/post/{self.post.id}/")
+            self.assertEqual(response.json()["likes"], 1)
+        engagement_buffer.flush()
+        self.assertEqual(self.likes_count(), 1)
+
+    def test_rows_written_by_another_process_are_not_counted_again(self):
+        # Another process flushed the same like after this one looked
+        like = PostLike.objects.create(user=self.user, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(likes_count=1)
+        with mock.patch.object(EngagementBuffer, "_existing", return_value={}):
+            engagement_buffer.like(self.user.id, self.post.id)
+        self.assertEqual(self.likes_count(), 1)
+
+        # ...and then the unlike
+        key = (self.user.id, self.post.id)
+        like.delete()
+        Post.objects.filter(pk=self.post.pk).update(likes_count=0)
+        with mock.patch.object(
+            EngagementBuffer, "_existing", return_value={key: like.id}
+        ):
+            engagement_buffer.unlike(*key)
+        self.assertEqual(self.likes_count(), 0)
+
+    def test_like_stays_visible_while_its_flush_commits(self):
+        seen, write = [], EngagementBuffer._write
+
+        def observed(buffer, *args, **kwargs):
+            seen.append(buffer.pending_like_delta(self.user.id, self.post.id))
+            result = write(buffer, *args, **kwargs)
+            seen.append(buffer.pending_like_delta(self.user.id, self.post.id))
+            return result
+
+        with mock.patch.object(EngagementBuffer, "_write", observed):
+            with self.captureOnCommitCallbacks(execute=True):
+                engagement_buffer.like(self.user.id, self.post.id)
+        seen.append(engagement_buffer.pending_like_delta(self.user.id, self.post.id))
+        self.assertEqual(seen, [1, 1, 0])
+        self.assertEqual(self.likes_count(), 1)
+
+    def test_only_the_buffered_pairs_are_read(self):
+        other = User.objects.create(
+            email="other@momento.com", username="other", name="Other"
+        )
+        other_post = Post.objects.create(user=other, caption="other")
+        PostLike.objects.bulk_create(
+            PostLike(user=user, post=post)
+            for user in (self.user, other)
+            for post in (self.post, other_post)
+        )
+        keys = [(self.user.id, self.post.id), (other.id, other_post.id)]
+        with CaptureQueriesContext(connection) as context:
+            existing = EngagementBuffer._existing(PostLike, keys)
+        self.assertEqual(set(existing), set(keys))
+        self.assertEqual(count_rows(context.captured_queries), 2)
+
+
+class FeedConnectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create(
+            email="viewer@momento.com", username="viewer", name="Viewer"
+        )
+        cls.author = User.objects.create(
+            email="author@momento.com", username="author", name="Author"
+        )
+        cls.post = Post.objects.create(user=cls.author, caption="caption")
+        fan_out_post(cls.post)
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+
+    def client_for(self, user) -> APIClient:
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def feed_ids(self):
+        response = self.client_for(self.viewer).get("/api/post/")
+        return [post["id"] for post in response.json()["results"]]
+
+    def follow_then_remove(self):
+        self.client_for(self.viewer).post(
+            "/api/user/follow-request/", {"followed_id": self.author.id}
+        )
+        self.assertEqual(self.feed_ids(), [self.post.id])
+        follow = Follow.objects.get(follower=self.viewer, followed=self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.author).post(
+                f"/api/user/follow-request-action/{follow.id}/", {"action": "reject"}
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_removed_follower_loses_the_posts(self):
+        self.follow_then_remove()
+        self.assertEqual(self.feed_ids(), [])
+
+    def test_posts_stay_while_followed_back(self):
+        Follow.objects.create(
+            follower=self.author, followed=self.viewer, status=Follow.Status.ACCEPTED
+        )
+        self.follow_then_remove()
+        self.assertEqual(self.feed_ids(), [self.post.id])
+
+
+@override_settings(MEDIA_PROCESSING_EAGER=True, MEDIA_RENDITION_WIDTHS=[320, 640])
+class MediaProcessingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="uploader@momento.com", username="uploader", name="Uploader"
+        )
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, file: SimpleUploadedFile) -> Media:
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(
+                "/api/post/", {"caption": "hi", "media": [file]}, format="multipart"
+            )
+        self.assertEqual(response.status_code, 201)
+        return Media.objects.filter(post__user=self.user).latest("id")
+
+    @staticmethod
+    def png(width: int, height: int) -> SimpleUploadedFile:
+        buffer = io.BytesIO()
+        Image.new("RGB", (width, height), "red").save(buffer, format="PNG")
+        return SimpleUploadedFile("photo.png", buffer.getvalue())
+
+    def test_image_is_measured_and_resized(self):
+        media = self.upload(self.png(800, 600))
+
+        self.assertEqual(media.status, Media.Status.READY)
+        self.assertEqual(media.content_type, "image/png")
+        self.assertEqual((media.width, media.height), (800, 600))
+        self.assertEqual(set(media.renditions), {"320", "640"})
+        with media.file.storage.open(media.renditions["320"]) as rendition:
+            self.assertEqual(Image.open(rendition).size, (320, 240))
+
+    def test_unrecognised_content_fails(self):
+        with self.assertLogs("post.media_processing", "ERROR"):
+            media = self.upload(SimpleUploadedFile("photo.jpg", b"not an image"))
+
+        self.assertEqual(media.status, Media.Status.FAILED)
+        self.assertEqual(media.renditions, {})
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(f"/api/post/{media.post_id}/")
+        self.assertEqual(response.data["media"], [])
+
+    def test_unknown_extension_is_sniffed(self):
+        file = self.png(800, 600)
+        file.name = "photo.heic"
+        media = self.upload(file)
+
+        self.assertEqual((media.type, media.status), ("image", Media.Status.READY))
+
+    def test_stale_media_is_requeued(self):
+        post = Post.objects.create(user=self.user)
+        media = Media.objects.create(
+            post=post,
+            file=ContentFile(self.png(800, 600).read(), "photo.png"),
+            status=Media.Status.PROCESSING,
+        )
+        Media.objects.filter(pk=media.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+
+        call_command("requeue_media", stdout=io.StringIO())
+
+        media.refresh_from_db()
+        self.assertEqual(media.status, Media.Status.READY)
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.upload(self.png(800, 600))
+        second = self.upload(self.png(800, 600))
+
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith("blobs/"))
+        self.assertEqual(first.renditions, second.renditions)
+        self.assertEqual(Blob.objects.get(name=first.file.name).refcount, 2)
+
+        # The file outlives the first post and goes with the last one
+        with self.captureOnCommitCallbacks(execute=True):
+            first.post.delete()
+        self.assertTrue(default_storage.exists(second.file.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.post.delete()
+        self.assertFalse(default_storage.exists(second.file.name))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_replaced_profile_picture_is_released(self):
+        profile = Profile.objects.create(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.profile_picture.save("a.png", self.png(10, 10))
+        old = profile.profile_picture.name
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.profile_picture.save("b.png", self.png(20, 20))
+            profile.save()
+
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(profile.profile_picture.name))
+
+    def test_resaving_the_same_picture_keeps_one_reference(self):
+        profile = Profile.objects.create(user=self.user)
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                profile.profile_picture.save("a.png", self.png(10, 10))
+
+        self.assertEqual(Blob.objects.get().refcount, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.delete()
+        self.assertFalse(Blob.objects.exists())
+
+    def test_blobs_of_rolled_back_saves_are_purged(self):
+        storage = content_addressed_storage()
+        kept = storage.save("kept.png", self.png(10, 10))
+        try:
+            with transaction.atomic():
+                orphan = storage.save("orphan.png", self.png(20, 20))
+                raise DatabaseError
+        except DatabaseError:
+            pass
+
+        call_command("purge_orphan_blobs", hours=0, stdout=io.StringIO())
+        self.assertTrue(default_storage.exists(kept))
+        self.assertFalse(default_storage.exists(orphan))
+
+    def test_feed_exposes_srcset(self):
+        media = self.upload(self.png(800, 600))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        data = client.get(f"/api/post/{media.post_id}/").json()
+        srcset = data["media"][0]["srcset"]
+        self.assertEqual(set(srcset), {"320", "640"})
+        self.assertTrue(srcset["320"].endswith(media.renditions["320"]))
+
+    def test_profile_rendition_is_generated_on_first_request(self):
+        profile = Profile.objects.create(user=self.user)
+        profile.profile_picture.save("avatar.png", self.png(500, 500))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        url = client.get("/api/user/me/").json()["profile_picture_srcset"]["320"]
+        self.assertTrue(url.startswith("http://testserver/api/renditions/320/"))
+        for _ in range(2):
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("immutable", response["Cache-Control"])
+            image = Image.open(io.BytesIO(b"".join(response.streaming_content)))
+            self.assertEqual((image.format, image.size), ("WEBP", (320, 320)))
+
+        self.assertEqual(client.get(url.replace("/320/", "/321/")).status_code, 404)
+
+    def test_only_referenced_images_get_renditions(self):
+        profile = Profile.objects.create(user=self.user)
+        profile.profile_picture.save("avatar.png", self.png(500, 500))
+        media = self.upload(self.png(800, 600))
+        rendition = media.renditions["320"]
+        broken = default_storage.save("blobs/broken.png", ContentFile(b"\x89PNG\r\n"))
+        Profile.objects.filter(pk=profile.pk).update(cover_picture=broken)
+
+        client = APIClient()
+        self.assertEqual(
+            client.get(
+                f"/api/renditions/320/{profile.profile_picture.name}"
+            ).status_code,
+            200,
+        )
+        for name in (rendition, "blobs/unknown.png", broken):
+            response = client.get(f"/api/renditions/320/{name}")
+            self.assertEqual(response.status_code, 404, name)
+
+    def test_released_images_stop_getting_renditions(self):
+        profile = Profile.objects.create(user=self.user)
+        profile.profile_picture.save("avatar.png", self.png(500, 500))
+        media = self.upload(self.png(800, 600))
+        names = [profile.profile_picture.name, media.file.name]
+        client = APIClient()
+        for name in names:
+            response = client.get(f"/api/renditions/320/{name}")
+            self.assertEqual(response.status_code, 200, name)
+
+        # The files outlive the rows until commit, so only the cache decides
+        profile.profile_picture.save("other.png", self.png(400, 400))
+        media.delete()
+        for name in names:
+            response = client.get(f"/api/renditions/320/{name}")
+            self.assertEqual(response.status_code, 404, name)
+
+
+@override_settings(MEDIA_PROCESSING_EAGER=True, UPLOAD_CHUNK_SIZE=4)
+class ChunkedUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="reeler@momento.com", username="reeler", name="Reeler"
+        )
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=f"{root}/media", UPLOAD_ROOT=f"{root}/uploads"
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start(self, content: bytes, filename="reel.webm") -> str:
+        response = self.client.post(
+            "/api/post/uploads/",
+            {
+                "filename": filename,
+                "size": len(content),
+                "checksum": hashlib.sha256(content).hexdigest(),
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["chunk_size"], 4)
+        return response.json()["id"]
+
+    def send(self, upload_id: str, index: int, chunk: bytes, checksum=None):
+        return self.client.put(
+            f"/api/post/uploads/{upload_id}/chunks/{index}/",
+            chunk,
+            content_type="application/octet-stream",
+            HTTP_X_CHUNK_CHECKSUM=checksum or hashlib.sha256(chunk).hexdigest(),
+        )
+
+    def test_resumed_upload_becomes_post_media(self):
+        content = b"\x1a\x45\xdf\xa3" + b"reel-bytes"
+        upload_id = self.start(content)
+        chunks = [content[i : i + 4] for i in range(0, len(content), 4)]
+
+        # Chunks may arrive in any order; the status shows what is missing
+        self.assertEqual(self.send(upload_id, 2, chunks[2]).status_code, 200)
+        self.assertEqual(self.send(upload_id, 0, chunks[0]).status_code, 200)
+        status = self.client.get(f"/api/post/uploads/{upload_id}/").json()
+        self.assertEqual(status["received"], [0, 2])
+        response = self.client.post(f"/api/post/uploads/{upload_id}/complete/")
+        self.assertEqual(response.status_code, 400)
+
+        for index in (1, 3):
+            self.assertEqual(
+                self.send(upload_id, index, chunks[index]).status_code, 200
+            )
+        response = self.client.post(f"/api/post/uploads/{upload_id}/complete/")
+        self.assertEqual(response.json()["status"], Upload.Status.COMPLETE)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/post/", {"type": "reel", "upload_ids": [upload_id]}
+            )
+        self.assertEqual(response.status_code, 201)
+        media = Media.objects.get(post__user=self.user)
+        self.assertEqual((media.type, media.status), ("video", Media.Status.READY))
+        with media.file.open("rb") as file:
+            self.assertEqual(file.read(), content)
+        self.assertFalse(Upload.objects.exists())
+
+        # An upload can only be attached once
+        response = self.client.post("/api/post/", {"upload_ids": [upload_id]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_media_type_comes_from_the_content(self):
+        content = b"\x1a\x45\xdf\xa3" + b"reel-bytes"
+        upload_id = self.start(content, filename="reel.jpg")
+        for index in range(0, len(content), 4):
+            self.send(upload_id, index // 4, content[index : index + 4])
+        self.client.post(f"/api/post/uploads/{upload_id}/complete/")
+
+        # Before processing has run
+        response = self.client.post("/api/post/", {"upload_ids": [upload_id]})
+        self.assertEqual(response.status_code, 201)
+        media = Media.objects.get(post__user=self.user)
+        self.assertEqual((media.type, media.status), ("video", Media.Status.PENDING))
+
+    def test_corrupt_chunk_is_rejected(self):
+        upload_id = self.start(b"abcdefgh")
+
+        response = self.send(upload_id, 0, b"abcd", checksum="0" * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.send(upload_id, 1, b"efghi").status_code, 400)
+        status = self.client.get(f"/api/post/uploads/{upload_id}/").json()
+        self.assertEqual(status["received"], [])
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.name = default_storage.save("1/clip.mp4", ContentFile(b"0123456789"))
+        user = User.objects.create(
+            email="viewer@momento.com", username="viewer", name="Viewer"
+        )
+        post = Post.objects.create(user=user, caption="clip")
+        Media.objects.create(post=post, type=Media.Type.VIDEO, file=self.name)
+
+    def get(self, path=None, **headers):
+        return self.client.get(f"/media/{path or self.name}", headers=headers)
+
+    def test_whole_file_with_validators(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        self.assertEqual(response["Content-Type"], "video/mp4")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertNotIn("immutable", response["Cache-Control"])
+
+        self.assertEqual(
+            self.get(**{"If-None-Match": response["ETag"]}).status_code, 304
+        )
+        since = {"If-Modified-Since": response["Last-Modified"]}
+        self.assertEqual(self.get(**since).status_code, 304)
+
+    def test_byte_ranges(self):
+        cases = {"bytes=2-5": b"2345", "bytes=7-": b"789", "bytes=-3": b"789"}
+        for header, body in cases.items():
+            response = self.get(Range=header)
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b"".join(response.streaming_content), body)
+            self.assertEqual(response["Content-Length"], str(len(body)))
+        self.assertEqual(self.get(Range="bytes=2-5")["Content-Range"], "bytes 2-5/10")
+
+        response = self.get(Range="bytes=20-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+        # A stale If-Range gets the whole file instead of a mismatched slice
+        stale = self.get(Range="bytes=2-5", **{"If-Range": '"stale"'})
+        self.assertEqual(stale.status_code, 200)
+
+    @override_settings(MEDIA_SERVE_OFFLOAD="x-accel-redirect")
+    def test_offload_to_front_end_server(self):
+        response = self.get()
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.name}")
+        self.assertEqual(response.content, b"")
+
+    def test_content_addressed_names_are_immutable(self):
+        digest = "ab" * 32
+        Blob.objects.create(name=f"blobs/ab/ab/{digest}.png", size=1)
+        name = default_storage.save(
+            f"renditions/ab/{digest}/320.webp", ContentFile(b"x")
+        )
+        self.assertIn("immutable", self.get(name)["Cache-Control"])
+        self.assertEqual(self.get("../settings.py").status_code, 404)
+        self.assertEqual(self.get("1/missing.mp4").status_code, 404)
+
+    def test_only_files_rows_account_for_are_served(self):
+        stray = default_storage.save("1/stray.mp4", ContentFile(b"x"))
+        staged = default_storage.save("blobs/tmp/upload", ContentFile(b"x"))
+        Blob.objects.create(name="blobs/tmp/upload", size=1)
+        orphan = default_storage.save(
+            f"renditions/cd/{'cd' * 32}/320.webp", ContentFile(b"x")
+        )
+        for name in (stray, staged, orphan, "blobs/cd/cd/missing.png"):
+            self.assertEqual(self.get(name).status_code, 404, name)
+
+        Media.objects.filter(file=self.name).delete()
+        self.assertEqual(self.get().status_code, 404)
+
+
+@override_settings(STREAM_CHUNK_SIZE=4)
+class StreamedListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="streamer@momento.com", username="streamer", name="Streamer"
+        )
+        cls.post = Post.objects.create(user=cls.user, caption="busy")
+        Comment.objects.bulk_create(
+            Comment(user=cls.user, post=cls.post, content=f"comment {i}")
+            for i in range(10)
+        )
+        PostLike.objects.create(user=cls.user, post=cls.post)
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def stream(self, path: str):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f"/api/post/{self.post.id}/{path}/?stream=1")
+            body = b"".join(response.streaming_content)
+        self.assertEqual(response["Content-Type"], "application/json")
+        return json.loads(body)["results"], context.captured_queries
+
+    def test_comments_stream_every_row_in_order(self):
+        results, queries = self.stream("comments")
+        self.assertEqual(
+            [c["content"] for c in results], [f"comment {i}" for i in range(10)]
+        )
+        # The post lookup with its media, then one chunked query for any number
+        # of rows
+        self.assertEqual(len(queries), 3)
+
+    def test_likes_stream(self):
+        results, _ = self.stream("likes")
+        self.assertEqual([like["user"]["id"] for like in results], [self.user.id])
+
+    def test_false_stream_values_are_paginated(self):
+        for value in ("0", "false"):
+            response = self.client.get(
+                f"/api/post/{self.post.id}/comments/?stream={value}"
+            )
+            self.assertFalse(response.streaming, value)
+            self.assertIn("next", response.json())
+
+
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="threader@momento.com", username="threader", name="Threader"
+        )
+        cls.post = Post.objects.create(user=cls.user, caption="thread")
+        serializer_context = {"user": cls.user, "post": cls.post}
+
+        def reply(content, parent=None):
+            serializer = CommentCreateSerializer(
+                data={"content": content, "reply_to": parent and parent.id},
+                context=serializer_context,
+            )
+            serializer.is_valid(raise_exception=True)
+            return serializer.save()
+
+        cls.root = reply("root")
+        cls.children = [reply(f"child {i}", cls.root) for i in range(5)]
+        cls.grandchild = reply("grandchild", cls.children[0])
+        cls.great = reply("great-grandchild", cls.grandchild)
+        reply("second root")
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_tree_loads_in_bounded_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                f"/api/post/{self.post.id}/thread/?depth=3&replies=2"
+            )
+        # post, its media, top-level page, then every nested level at once
+        self.assertEqual(len(context.captured_queries), 4)
+
+        root, second = response.json()["results"]
+        self.assertEqual(second["children"], [])
+        self.assertIsNone(second["next_replies"])
+        self.assertEqual(
+            [child["content"] for child in root["children"]], ["child 0", "child 1"]
+        )
+        grandchild = root["children"][0]["children"][0]
+        self.assertEqual(grandchild["content"], "grandchild")
+        # Past the depth limit the branch is only linked
+        self.assertEqual(grandchild["children"], [])
+        self.assertTrue(
+            grandchild["next_replies"].endswith(
+                f"/api/post/comments/{self.grandchild.id}/thread/"
+            )
+        )
+
+        more = self.client.get(root["next_replies"]).json()
+        self.assertEqual(
+            [child["content"] for child in more["results"]],
+            ["child 2", "child 3", "child 4"],
+        )
+
+    def test_deeper_trees_cost_no_extra_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                f"/api/post/{self.post.id}/thread/?depth=10&replies=1"
+            )
+        self.assertEqual(len(context.captured_queries), 4)
+        root = response.json()["results"][0]
+        child = root["children"][0]
+        self.assertEqual(child["content"], "child 0")
+        grandchild = child["children"][0]
+        self.assertEqual(grandchild["content"], "grandchild")
+        self.assertEqual(grandchild["children"][0]["content"], "great-grandchild")
+        self.assertIsNotNone(root["next_replies"])
+
+    def test_branch_loads_only_its_own_subtree(self):
+        self.assertEqual(
+            self.great.path,
+            f"{self.root.id}/{self.children[0].id}/{self.grandchild.id}/",
+        )
+        self.assertEqual(self.great.depth, 3)
+        response = self.client.get(
+            f"/api/post/comments/{self.children[1].id}/thread/?depth=3"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [])
+
+        response = self.client.get(
+            f"/api/post/comments/{self.children[0].id}/thread/?depth=3"
+        ).json()["results"]
+        self.assertEqual([reply["content"] for reply in response], ["grandchild"])
+        self.assertEqual(response[0]["children"][0]["content"], "great-grandchild")
+
+    def test_replies_stop_where_the_path_would_overflow(self):
+        url = f"/api/post/{self.post.id}/comment/"
+        response = self.client.post(
+            url, {"content": "deeper", "reply_to": self.great.id}
+        )
+        self.assertEqual(response.status_code, 200)
+        Comment.objects.filter(pk=self.great.pk).update(path="1/" * 320)
+        response = self.client.post(
+            url, {"content": "deeper", "reply_to": self.great.id}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_load_more_survives_identical_timestamps(self):
+        Comment.objects.filter(parent=self.root).update(
+            created_at=self.children[0].created_at
+        )
+        root = self.client.get(f"/api/post/{self.post.id}/thread/?replies=2").json()[
+            "results"
+        ][0]
+        shown = [child["id"] for child in root["children"]]
+        more = self.client.get(root["next_replies"]).json()["results"]
+        self.assertEqual(
+            sorted(shown + [child["id"] for child in more]),
+            [child.id for child in self.children],
+        )
+
+
+class HashtagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create(
+            email="tagger@momento.com", username="tagger", name="Tagger"
+        )
+        cls.friend = User.objects.create(
+            email="friend@momento.com", username="friend", name="Friend"
+        )
+        cls.stranger = User.objects.create(
+            email="stranger@momento.com", username="stranger", name="Stranger"
+        )
+        Follow.objects.create(
+            follower=cls.viewer, followed=cls.friend, status=Follow.Status.ACCEPTED
+        )
+        cls.sunset, cls.beach = Hashtag.objects.bulk_create(
+            [Hashtag(name="sunset"), Hashtag(name="beach")]
+        )
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def tag(self, user, *hashtags) -> Post:
+        post = Post.objects.create(user=user, caption="tagged")
+        record_post(post, hashtags)
+        return post
+
+    def test_feed_lists_visible_posts_newest_first(self):
+        old = self.tag(self.friend, self.sunset)
+        self.tag(self.stranger, self.sunset)
+        new = self.tag(self.viewer, self.sunset, self.beach)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/api/post/hashtags/sunset/posts/?page_size=1")
+        # hashtag, page of visible links with posts, media
+        self.assertEqual(len(context.captured_queries), 3)
+        self.assertEqual([p["id"] for p in response.json()["results"]], [new.id])
+
+        rest = self.client.get(response.json()["next"]).json()
+        self.assertEqual([p["id"] for p in rest["results"]], [old.id])
+        self.assertIsNone(rest["next"])
+
+    def test_trending_counts_posts_inside_the_window(self):
+        self.tag(self.friend, self.sunset, self.beach)
+        self.tag(self.viewer, self.sunset)
+        HashtagBucket.objects.create(
+            hashtag=self.beach,
+            starts_at=timezone.now() - timedelta(days=3),
+            count=50,
+        )
+
+        self.assertEqual(
+            self.client.get("/api/post/hashtags/trending/").json()["results"],
+            [{"name": "sunset", "posts": 2}, {"name": "beach", "posts": 1}],
+        )
+        with self.assertNumQueries(0):
+            trending()
+
+        self.assertEqual(prune_buckets(), 1)
+        self.assertEqual(HashtagBucket.objects.count(), 2)
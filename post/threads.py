@@ -0,0 +1,103 @@
+from typing import Dict, List, Sequence, Set, Tuple
+
+from django.conf import settings
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.urls import reverse
+from rest_framework.pagination import Cursor
+
+from momento.core.pagination import OldestFirstCursorPagination
+from post.models import Comment
+
+
+def thread_options(query_params) -> Tuple[int, int]:
+    """``(depth, per_branch)`` from the ``depth`` and ``replies`` parameters."""
+
+    def bounded(name: str, default: int, maximum: int) -> int:
+        try:
+            value = int(query_params.get(name, default))
+        except ValueError:
+            value = default
+        return min(max(value, 1), maximum)
+
+    return (
+        bounded(
+            "depth", settings.COMMENT_THREAD_DEPTH, settings.COMMENT_THREAD_MAX_DEPTH
+        ),
+        bounded("replies", settings.COMMENT_THREAD_REPLIES, 50),
+    )
+
+
+def load_replies(
+    parents: Sequence[Comment], depth: int, per_branch: int
+) -> Tuple[Dict[int, List[Comment]], Set[int]]:
+    """Load up to ``depth`` levels of replies below ``parents``.
+
+    The replies of all the parents, at every level, are read in one query
+    over their ``path`` ranges, with a ``ROW_NUMBER()`` window keeping the
+    first ``per_branch`` replies of each comment. The rows it reads grow
+    with the size of the threads shown, so ``depth`` stays capped by
+    ``COMMENT_THREAD_MAX_DEPTH``. Replies under a comment that was cut from
+    its branch are dropped.
+
+    Returns the loaded replies keyed by parent id, and the ids of the
+    comments whose replies were loaded.
+    """
+    subtrees = Q()
+    for parent in parents:
+        if parent.replies_count and depth:
+            subtrees |= parent.subtree() & Q(depth__lte=parent.depth + depth)
+    children: Dict[int, List[Comment]] = {}
+    if subtrees:
+        for comment in (
+            Comment.objects.filter(subtrees)
+            .select_related("user__profile")
+            .annotate(
+                rank=Window(
+                    RowNumber(),
+                    partition_by=[F("parent_id")],
+                    order_by=[F("created_at").asc(), F("id").asc()],
+                )
+            )
+            .filter(rank__lte=per_branch)
+            .order_by("parent_id", "created_at", "id")
+        ):
+            children.setdefault(comment.parent_id, []).append(comment)
+
+    replies: Dict[int, List[Comment]] = {}
+    expanded: Set[int] = set()
+    level = list(parents)
+    for _ in range(depth):
+        expanded.update(comment.id for comment in level)
+        below = []
+        for comment in level:
+            if comment.id in children:
+                replies[comment.id] = children[comment.id]
+                below.extend(children[comment.id])
+        if not below:
+            break
+        level = below
+    return replies, expanded
+
+
+def more_replies_url(request, comment: Comment, shown: Sequence[Comment]) -> str:
+    """Link to the replies of ``comment`` that follow the ``shown`` ones.
+
+    The cursor is built the way ``CursorPagination`` builds its own next
+    links, so the thread endpoint continues exactly after the last reply.
+    """
+    paginator = OldestFirstCursorPagination()
+    paginator.base_url = request.build_absolute_uri(
+        reverse("comment-thread", kwargs={"pk": comment.pk})
+    )
+    if not shown:
+        return paginator.base_url
+
+    # Replies sharing the last timestamp are skipped by offset, not position
+    last = shown[-1].created_at
+    tied = [reply for reply in shown if reply.created_at == last]
+    earlier = shown[: len(shown) - len(tied)]
+    position = str(earlier[-1].created_at) if earlier else None
+    return paginator.encode_cursor(
+        Cursor(offset=len(tied), reverse=False, position=position)
+    )
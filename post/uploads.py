@@ -0,0 +1,147 @@
+import hashlib
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import BinaryIO, List
+
+from django.conf import settings
+from django.core.files import File
+from django.utils.text import get_valid_filename
+
+from post.models import Upload
+
+READ_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    pass
+
+
+class AssembledFile(File):
+    """A finished upload on local disk.
+
+    Exposing ``temporary_file_path`` lets ``FileSystemStorage`` move the file
+    into place instead of copying it.
+    """
+
+    def temporary_file_path(self) -> str:
+        return self.file.name
+
+
+def upload_dir(upload: Upload) -> Path:
+    return Path(settings.UPLOAD_ROOT) / str(upload.id)
+
+
+def chunk_path(upload: Upload, index: int) -> Path:
+    return upload_dir(upload) / f"{index}.part"
+
+
+def assembled_path(upload: Upload) -> Path:
+    return upload_dir(upload) / "assembled"
+
+
+def received_chunks(upload: Upload) -> List[int]:
+    directory = upload_dir(upload)
+    if not directory.exists():
+        return []
+    return sorted(
+        int(path.stem) for path in directory.glob("*.part") if path.stem.isdigit()
+    )
+
+
+def write_chunk(upload: Upload, index: int, stream: BinaryIO, checksum: str):
+    """Stream one chunk to disk and keep it only if its SHA-256 matches.
+
+    The body is read in small pieces so worker memory stays bounded whatever
+    the chunk size. Re-sending a chunk replaces the earlier copy.
+    """
+    if not 0 <= index < upload.chunk_count:
+        raise ChunkError(f"Chunk index must be between 0 and {upload.chunk_count - 1}")
+    expected = upload.chunk_length(index)
+    target = chunk_path(upload, index)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_suffix(f".{uuid.uuid4().hex}.tmp")
+
+    sha = hashlib.sha256()
+    written = 0
+    try:
+        with open(partial, "wb") as out:
+            for piece in iter(lambda: stream.read(READ_SIZE), b""):
+                written += len(piece)
+                if written > expected:
+                    raise ChunkError(f"Chunk {index} must be {expected} bytes")
+                sha.update(piece)
+                out.write(piece)
+        if written != expected:
+            raise ChunkError(f"Chunk {index} must be {expected} bytes")
+        if sha.hexdigest() != checksum.lower():
+            raise ChunkError(f"Checksum mismatch for chunk {index}")
+        os.replace(partial, target)
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+def _copy(source: BinaryIO, target: BinaryIO, length: int):
+    """Append ``length`` bytes of ``source`` to ``target`` inside the kernel.
+
+    Uses ``copy_file_range`` (which can share extents on CoW filesystems),
+    then ``sendfile``, and only falls back to a userspace copy without either.
+    """
+    source_fd, target_fd = source.fileno(), target.fileno()
+    offset = 0
+    try:
+        while offset < length:
+            copied = os.copy_file_range(source_fd, target_fd, length - offset)
+            if not copied:
+                break
+            offset += copied
+        return
+    except (AttributeError, OSError):
+        if offset:
+            raise
+    try:
+        while offset < length:
+            copied = os.sendfile(target_fd, source_fd, offset, length - offset)
+            if not copied:
+                break
+            offset += copied
+        return
+    except (AttributeError, OSError):
+        if offset:
+            raise
+    shutil.copyfileobj(source, target, READ_SIZE)
+
+
+def assemble(upload: Upload):
+    """Join every chunk into one file and verify the whole-file checksum."""
+    missing = set(range(upload.chunk_count)) - set(received_chunks(upload))
+    if missing:
+        raise ChunkError(f"Missing chunks: {sorted(missing)[:20]}")
+
+    target = assembled_path(upload)
+    with open(target, "wb") as out:
+        for index in range(upload.chunk_count):
+            with open(chunk_path(upload, index), "rb") as chunk:
+                _copy(chunk, out, upload.chunk_length(index))
+
+    if upload.checksum:
+        sha = hashlib.sha256()
+        with open(target, "rb") as file:
+            for piece in iter(lambda: file.read(READ_SIZE), b""):
+                sha.update(piece)
+        if sha.hexdigest() != upload.checksum.lower():
+            target.unlink()
+            raise ChunkError("Checksum mismatch for the assembled file")
+    for index in range(upload.chunk_count):
+        chunk_path(upload, index).unlink()
+
+
+def open_assembled(upload: Upload) -> AssembledFile:
+    return AssembledFile(
+        open(assembled_path(upload), "rb"), name=get_valid_filename(upload.filename)
+    )
+
+
+def discard(upload: Upload):
+    shutil.rmtree(upload_dir(upload), ignore_errors=True)
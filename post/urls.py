@@ -1,10 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from post.views import PostViewSet, CommentViewSet
+from post.views import PostViewSet, CommentViewSet, HashtagViewSet, UploadViewSet
 
 router = DefaultRouter()
 
+# Registered ahead of posts so these prefixes are not taken for a post id
+router.register("uploads", UploadViewSet, basename="upload")
+router.register("hashtags", HashtagViewSet, basename="hashtag")
 router.register("", PostViewSet, basename="post")
 router.register("comments", CommentViewSet, basename="comment")
 
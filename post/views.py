@@ -1,19 +1,48 @@
-from django.db.models import Q
-from django.db.models.aggregates import Count
+import io
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
+from rest_framework import mixins
+from rest_framework.viewsets import GenericViewSet, ModelViewSet
 from drf_spectacular.utils import extend_schema_view, extend_schema
 
-from post.models import Post, Comment, PostLike, CommentLike
+from momento.core.cache import by_pk, cache_response, invalidate_viewer
+from momento.core.pagination import (
+    CreatedAtCursorPagination,
+    KeysetPagination,
+    OldestFirstCursorPagination,
+    PostedAtCursorPagination,
+)
+from momento.core.streaming import stream_json, wants_stream
+from post.engagement import engagement_buffer
+from post.feed import home_feed
+from post.hashtags import hashtag_feed, trending
+from post import uploads
+from post.models import Post, Comment, CommentLike, Hashtag, Upload
 from post.serializers import (
     PostListSerializer,
     PostCreateSerializer,
     CommentListSerializer,
     CommentCreateSerializer,
     PostLikeListSerializer,
+    ThreadCommentSerializer,
+    UploadSerializer,
 )
-from user.models import Follow
+from post.threads import load_replies, thread_options
+from user import stats
+from user.graph import follow_graph
+
+
+def thread_data(request, comments, depth: int, per_branch: int):
+    """Serialize ``comments`` with ``depth`` levels of replies nested below."""
+    replies, expanded = load_replies(comments, depth, per_branch)
+    context = {"request": request, "replies": replies, "expanded": expanded}
+    return ThreadCommentSerializer(comments, many=True, context=context).data
 
 
 @extend_schema_view(
@@ -21,41 +50,53 @@ from user.models import Follow
     retrieve=extend_schema(tags=["posts"], description="Retrieve a single post"),
     create=extend_schema(tags=["posts"], description="Create a new post"),
     like=extend_schema(tags=["posts"], description="Like a post"),
+    unlike=extend_schema(tags=["posts"], description="Remove a like from a post"),
+    view=extend_schema(tags=["posts"], description="Record a view of a post"),
     comment=extend_schema(tags=["posts"], description="Comment on a post"),
-    comments=extend_schema(tags=["posts"], description="List all comments on a post"),
-    likes=extend_schema(tags=["posts"], description="List all likes on a post"),
+    comments=extend_schema(
+        tags=["posts"],
+        description="List all comments on a post. Pass ?stream=1 to receive "
+        "every comment in one streamed response instead of pages",
+    ),
+    thread=extend_schema(
+        tags=["posts"],
+        description="Top-level comments with their replies nested up to ?depth= "
+        "levels, at most ?replies= per comment, and a next_replies link for "
+        "each branch with more",
+    ),
+    likes=extend_schema(
+        tags=["posts"],
+        description="List all likes on a post. Pass ?stream=1 to receive every "
+        "like in one streamed response instead of pages",
+    ),
     destroy=extend_schema(tags=["posts"], description="Delete a post"),
     partial_update=extend_schema(tags=["posts"], description="Update a post"),
 )
 class PostViewSet(ModelViewSet):
     queryset = Post.objects.all()
     http_method_names = ["get", "post", "patch", "delete"]
+    # Set per action below
+    throttle_scope = None
 
     def get_queryset(self):
         me = self.request.query_params.get("me", False)
         if me:
-            user_ids = {self.request.user.id}
+            queryset = self.queryset.filter(user_id=self.request.user.id)
         else:
-            # Get all follow relationships involving the current user (accepted only)
-            relations = Follow.objects.filter(
-                Q(follower=self.request.user) | Q(followed=self.request.user),
-                status=Follow.Status.ACCEPTED
-            ).values_list("followed_id", "follower_id")
+            # Visibility of a single post is checked in get_object
+            queryset = self.queryset
 
-            # Build a set of user IDs (you follow OR who follow you)
-            user_ids = {uid for pair in relations for uid in pair}
-
-        # Return posts of those users
         return (
-            self.queryset.select_related("user")
-            .prefetch_related("media", "likes", "comments")
-            .filter(user_id__in=user_ids)
-            .annotate(
-                likes_count=Count("likes", distinct=True),
-                comments_count=Count("comments", distinct=True),
-            )
+            queryset.select_related("user__profile").prefetch_related("media")
         )
 
+    def get_object(self):
+        post = super().get_object()
+        # Only posts by users you follow OR who follow you are visible
+        if not follow_graph.can_see(self.request.user.id, post.user_id):
+            raise NotFound()
+        return post
+
     def get_serializer_class(self):
         action_mapping = {
             "list": PostListSerializer,
@@ -64,13 +105,59 @@ class PostViewSet(ModelViewSet):
         }
         return action_mapping.get(self.action, self.serializer_class)
 
-    @action(detail=True, methods=["post"])
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get("me", False):
+            return super().list(request, *args, **kwargs)
+        # Home feed is paged over the precomputed timeline, then its posts
+        # are loaded by id
+        paginator = KeysetPagination()
+        keys = paginator.paginate_keys(
+            lambda before, limit: home_feed(request.user.id, before, limit), request
+        )
+        posts = self.get_queryset().in_bulk([post_id for _, post_id in keys])
+        page = [posts[post_id] for _, post_id in keys if post_id in posts]
+        return paginator.get_paginated_response(
+            self.get_serializer(page, many=True).data
+        )
+
+    @cache_response("post", scope=by_pk)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        stats.invalidate(self.request.user.id)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        stats.invalidate(instance.user_id)
+
+    @action(detail=True, methods=["post"], throttle_scope="like")
     def like(self, request, pk=None):
         post = self.get_object()
-        PostLike.objects.get_or_create(user=request.user, post=post)
+        engagement_buffer.like(request.user.id, post.id)
+        invalidate_viewer(request.user.id)
         return Response({"message": "Post liked successfully"})
 
-    @action(detail=True, methods=["post"], serializer_class=CommentCreateSerializer)
+    @action(detail=True, methods=["post"], throttle_scope="like")
+    def unlike(self, request, pk=None):
+        post = self.get_object()
+        engagement_buffer.unlike(request.user.id, post.id)
+        invalidate_viewer(request.user.id)
+        return Response({"message": "Post unliked successfully"})
+
+    @action(detail=True, methods=["post"])
+    def view(self, request, pk=None):
+        post = self.get_object()
+        engagement_buffer.view(request.user.id, post.id)
+        return Response({"message": "Post view recorded"})
+
+    @action(
+        detail=True,
+        methods=["post"],
+        serializer_class=CommentCreateSerializer,
+        throttle_scope="comment",
+    )
     def comment(self, request, pk=None):
         post = self.get_object()
         serializer = CommentCreateSerializer(
@@ -81,24 +168,57 @@ class PostViewSet(ModelViewSet):
         return Response({"message": "Comment posted successfully"})
 
     @action(detail=True, methods=["get"])
+    @cache_response("post-comments", scope=by_pk)
     def comments(self, request, pk=None):
         post = self.get_object()
-        comments = (
-            post.comments.select_related("user")
-            .prefetch_related("replies", "comment_likes")
-            .all().annotate(replies_count=Count("replies"), comment_likes_count=Count("comment_likes"))
+        comments = post.comments.select_related("user__profile").all()
+        if wants_stream(request):
+            return stream_json(
+                comments.order_by("created_at", "id"),
+                CommentListSerializer,
+                {"request": request},
+            )
+        paginator = OldestFirstCursorPagination()
+        page = paginator.paginate_queryset(comments, request, view=self)
+        return paginator.get_paginated_response(
+            CommentListSerializer(page, many=True, context={"request": request}).data
+        )
+
+    @action(detail=True, methods=["get"])
+    @cache_response("post-comments", scope=by_pk)
+    def thread(self, request, pk=None):
+        post = self.get_object()
+        depth, per_branch = thread_options(request.query_params)
+        roots = post.comments.filter(parent__isnull=True).select_related(
+            "user__profile"
+        )
+        paginator = OldestFirstCursorPagination()
+        page = paginator.paginate_queryset(roots, request, view=self)
+        return paginator.get_paginated_response(
+            thread_data(request, page, depth - 1, per_branch)
         )
-        return Response(CommentListSerializer(comments, many=True).data)
 
     @action(detail=True, methods=["get"])
+    @cache_response("post-likes", scope=by_pk)
     def likes(self, request, pk=None):
         post = self.get_object()
-        likes = post.post_likes.select_related("user").all()
-        return Response(PostLikeListSerializer(likes, many=True).data)
+        likes = post.likes.select_related("user__profile").all()
+        if wants_stream(request):
+            return stream_json(
+                likes.order_by("-created_at", "-id"),
+                PostLikeListSerializer,
+                {"request": request},
+            )
+        paginator = CreatedAtCursorPagination()
+        page = paginator.paginate_queryset(likes, request, view=self)
+        return paginator.get_paginated_response(
+            PostLikeListSerializer(page, many=True, context={"request": request}).data
+        )
 
 
 class CommentViewSet(ModelViewSet):
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related("user__profile")
+    pagination_class = OldestFirstCursorPagination
     http_method_names = ["get", "post"]
 
     def get_serializer_class(self):
@@ -111,17 +231,145 @@ class CommentViewSet(ModelViewSet):
     @action(detail=True, methods=["post"])
     def replies(self, request, pk=None):
         comment = self.get_object()
-        replies = comment.replies.all()
-        return Response(CommentListSerializer(replies, many=True).data)
+        replies = comment.replies.select_related("user__profile")
+        return Response(
+            CommentListSerializer(replies, many=True, context={"request": request}).data
+        )
+
+    @action(detail=True, methods=["get"])
+    def thread(self, request, pk=None):
+        comment = self.get_object()
+        author_id = Post.objects.values_list("user_id", flat=True).get(
+            pk=comment.post_id
+        )
+        if not follow_graph.can_see(request.user.id, author_id):
+            raise NotFound()
+        depth, per_branch = thread_options(request.query_params)
+        replies = comment.replies.select_related("user__profile")
+        paginator = OldestFirstCursorPagination()
+        page = paginator.paginate_queryset(replies, request, view=self)
+        return paginator.get_paginated_response(
+            thread_data(request, page, depth - 1, per_branch)
+        )
 
     @action(detail=True, methods=["post"])
     def likes(self, request, pk=None):
         comment = self.get_object()
         likes = comment.comment_likes.all()
-        return Response(CommentListSerializer(likes, many=True).data)
+        return Response(
+            CommentListSerializer(likes, many=True, context={"request": request}).data
+        )
 
     @action(detail=True, methods=["post"])
     def like(self, request, pk=None):
         comment = self.get_object()
-        CommentLike.objects.get_or_create(user=request.user, comment=comment)
+        with transaction.atomic():
+            _, created = CommentLike.objects.get_or_create(
+                user=request.user, comment=comment
+            )
+            if created:
+                Comment.objects.filter(pk=comment.pk).update(
+                    likes_count=F("likes_count") + 1
+                )
         return Response({"message": "Comment liked successfully"})
+
+
+@extend_schema_view(
+    create=extend_schema(tags=["uploads"], description="Start a chunked upload"),
+    retrieve=extend_schema(
+        tags=["uploads"], description="Show which chunks have been received"
+    ),
+    destroy=extend_schema(tags=["uploads"], description="Abort an upload"),
+    chunk=extend_schema(
+        tags=["uploads"],
+        description="Send one chunk as the raw request body, with its SHA-256 "
+        "in the X-Chunk-Checksum header",
+    ),
+    complete=extend_schema(tags=["uploads"], description="Assemble a finished upload"),
+)
+class UploadViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    GenericViewSet,
+):
+    serializer_class = UploadSerializer
+    http_method_names = ["get", "post", "put", "delete"]
+
+    def get_queryset(self):
+        return Upload.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user, chunk_size=settings.UPLOAD_CHUNK_SIZE)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        uploads.discard(instance)
+
+    @action(detail=True, methods=["put"], url_path=r"chunks/(?P<index>\d+)")
+    def chunk(self, request, pk=None, index=None):
+        upload = self.get_object()
+        if upload.status != Upload.Status.UPLOADING:
+            return Response({"message": "Upload is already complete"}, status=400)
+        checksum = request.headers.get("X-Chunk-Checksum")
+        if not checksum:
+            return Response({"message": "X-Chunk-Checksum is required"}, status=400)
+        try:
+            # Read the raw body in pieces instead of letting a parser buffer it
+            stream = request.stream or io.BytesIO()
+            uploads.write_chunk(upload, int(index), stream, checksum)
+        except uploads.ChunkError as e:
+            return Response({"message": str(e)}, status=400)
+        # Keeps active uploads clear of purge_uploads
+        Upload.objects.filter(pk=upload.pk).update(updated_at=timezone.now())
+        return Response({"received": int(index)})
+
+    @action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        upload = self.get_object()
+        if upload.status == Upload.Status.UPLOADING:
+            try:
+                uploads.assemble(upload)
+            except uploads.ChunkError as e:
+                return Response({"message": str(e)}, status=400)
+            upload.status = Upload.Status.COMPLETE
+            upload.save(update_fields=["status", "updated_at"])
+        return Response(UploadSerializer(upload).data)
+
+
+@extend_schema_view(
+    posts=extend_schema(
+        tags=["hashtags"], description="Visible posts with a hashtag, newest first"
+    ),
+    trending=extend_schema(
+        tags=["hashtags"],
+        description="Hashtags with the most posts in the trending window",
+    ),
+)
+class HashtagViewSet(GenericViewSet):
+    queryset = Hashtag.objects.all()
+    lookup_field = "name"
+    http_method_names = ["get"]
+
+    @action(detail=True, methods=["get"])
+    def posts(self, request, name=None):
+        hashtag = self.get_object()
+        paginator = PostedAtCursorPagination()
+        page = paginator.paginate_queryset(
+            hashtag_feed(hashtag, request.user.id), request, view=self
+        )
+        return paginator.get_paginated_response(
+            PostListSerializer(
+                [link.post for link in page],
+                many=True,
+                context=self.get_serializer_context(),
+            ).data
+        )
+
+    @action(detail=False, methods=["get"])
+    def trending(self, request):
+        try:
+            limit = int(request.query_params.get("limit", settings.TRENDING_LIMIT))
+        except ValueError:
+            limit = settings.TRENDING_LIMIT
+        return Response({"results": trending(min(max(limit, 1), 100))})
@@ -0,0 +1,42 @@
+import abc
+from typing import Collection, List, Optional, Sequence
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from search.documents import Document, Row
+
+
+class SearchBackend(abc.ABC):
+    """Full-text index used by search.
+
+    Every method takes the :class:`~search.documents.Document` it applies
+    to. ``search`` matches each term as a prefix, requires all of them and
+    returns object ids best match first.
+    """
+
+    @abc.abstractmethod
+    def index(self, document: Document, rows: Sequence[Row]):
+        """Add ``rows`` to the index, replacing earlier copies of them."""
+
+    @abc.abstractmethod
+    def remove(self, document: Document, ids: Collection[int]):
+        """Drop the rows with these object ids from the index."""
+
+    @abc.abstractmethod
+    def clear(self, document: Document):
+        """Drop every row of ``document`` from the index."""
+
+    @abc.abstractmethod
+    def search(
+        self,
+        document: Document,
+        terms: Sequence[str],
+        limit: int,
+        owner_ids: Optional[Collection[int]] = None,
+    ) -> List[int]:
+        """Ids matching every term, best first; ``owner_ids`` limits owners."""
+
+
+def get_backend() -> SearchBackend:
+    return import_string(settings.SEARCH_BACKEND)()
@@ -0,0 +1,103 @@
+from collections import defaultdict
+from typing import Collection, Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, When
+
+from search.backends import SearchBackend
+from search.documents import Document, Row, tokenize
+from search.models import SearchTerm
+
+BATCH_SIZE = 1000
+
+
+def prefix(term: str) -> Q:
+    # A range rather than LIKE so every database can walk the term index
+    return Q(term__gte=term, term__lt=term + "\uffff")
+
+
+class InvertedIndexBackend(SearchBackend):
+    """Inverted index kept in the ``SearchTerm`` table, for any database.
+
+    Each object has one row per distinct term, weighted by the fields it
+    occurs in. Prefix lookups are range scans on ``(document, term,
+    object_id)``, and the newest ``SEARCH_CANDIDATES`` matches are ranked by
+    the summed weight of the matching terms.
+    """
+
+    def index(self, document: Document, rows: Sequence[Row]):
+        if not rows:
+            return
+        postings = []
+        for object_id, owner_id, texts in rows:
+            weights: Dict[str, float] = defaultdict(float)
+            for text, weight in zip(texts, document.weights):
+                for term in tokenize(text):
+                    weights[term] += weight
+            postings.extend(
+                SearchTerm(
+                    document=document.name,
+                    term=term,
+                    object_id=object_id,
+                    owner_id=owner_id,
+                    weight=weight,
+                )
+                for term, weight in weights.items()
+            )
+        with transaction.atomic():
+            self.remove(document, [object_id for object_id, _, _ in rows])
+            SearchTerm.objects.bulk_create(postings, batch_size=BATCH_SIZE)
+
+    def remove(self, document: Document, ids: Collection[int]):
+        if ids:
+            SearchTerm.objects.filter(
+                document=document.name, object_id__in=list(ids)
+            ).delete()
+
+    def clear(self, document: Document):
+        SearchTerm.objects.filter(document=document.name).delete()
+
+    def search(
+        self,
+        document: Document,
+        terms: Sequence[str],
+        limit: int,
+        owner_ids: Optional[Collection[int]] = None,
+    ) -> List[int]:
+        if not terms:
+            return []
+        # The longest prefix is usually the most selective; only its newest
+        # matches are ranked, so common terms cost a bounded index range
+        anchor = SearchTerm.objects.filter(
+            prefix(max(terms, key=len)), document=document.name
+        )
+        if owner_ids is not None:
+            anchor = anchor.filter(owner_id__in=list(owner_ids))
+        candidates = list(
+            anchor.order_by("-object_id")
+            .values_list("object_id", flat=True)
+            .distinct()[: settings.SEARCH_CANDIDATES]
+        )
+        if not candidates:
+            return []
+
+        any_term = Q()
+        for term in terms:
+            any_term |= prefix(term)
+        matched = {
+            f"matched_{i}": Max(
+                Case(When(prefix(term), then=1), default=0, output_field=IntegerField())
+            )
+            for i, term in enumerate(terms)
+        }
+        return list(
+            SearchTerm.objects.filter(
+                any_term, document=document.name, object_id__in=candidates
+            )
+            .values("object_id")
+            .annotate(score=Sum("weight"), **matched)
+            .filter(**{name: 1 for name in matched})
+            .order_by("-score", "-object_id")
+            .values_list("object_id", flat=True)[:limit]
+        )
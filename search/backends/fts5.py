@@ -0,0 +1,80 @@
+import json
+from typing import Collection, List, Optional, Sequence
+
+from django.conf import settings
+from django.db import connection
+
+from search.backends import SearchBackend
+from search.documents import Document, Row
+
+
+def table_name(document: Document) -> str:
+    return f"search_{document.name}_fts"
+
+
+class FTS5Backend(SearchBackend):
+    """SQLite FTS5 tables, one per document, keyed by the object id as rowid.
+
+    The newest ``SEARCH_CANDIDATES`` matches are ranked with BM25 using the
+    document's field weights. The tables are created by the search app's
+    migration.
+    """
+
+    def index(self, document: Document, rows: Sequence[Row]):
+        if not rows:
+            return
+        columns = ", ".join(document.fields)
+        placeholders = ", ".join(["%s"] * (len(document.fields) + 2))
+        with connection.cursor() as cursor:
+            # FTS5 drops the old tokens of a replaced rowid
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {table_name(document)} "
+                f"(rowid, owner_id, {columns}) VALUES ({placeholders})",
+                [(object_id, owner_id, *texts) for object_id, owner_id, texts in rows],
+            )
+
+    def remove(self, document: Document, ids: Collection[int]):
+        if not ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table_name(document)} "
+                "WHERE rowid IN (SELECT value FROM json_each(%s))",
+                [json.dumps(list(ids))],
+            )
+
+    def clear(self, document: Document):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table_name(document)}")
+
+    def search(
+        self,
+        document: Document,
+        terms: Sequence[str],
+        limit: int,
+        owner_ids: Optional[Collection[int]] = None,
+    ) -> List[int]:
+        if not terms:
+            return []
+        table = table_name(document)
+        weights = ", ".join(str(weight) for weight in document.weights)
+        # Terms only hold word characters, so quoting them is enough
+        sql = (
+            f"SELECT rowid, bm25({table}, {weights}) AS score "
+            f"FROM {table} WHERE {table} MATCH %s"
+        )
+        params: list = [" ".join(f'"{term}"*' for term in terms)]
+        if owner_ids is not None:
+            # One JSON parameter instead of a placeholder per id
+            sql += " AND owner_id IN (SELECT value FROM json_each(%s))"
+            params.append(json.dumps(list(owner_ids)))
+        # FTS5 walks matches in rowid order and stops at the LIMIT, so only the
+        # newest candidates are scored however common the terms are
+        sql = (
+            f"SELECT rowid FROM ({sql} ORDER BY rowid DESC LIMIT %s) "
+            "ORDER BY score LIMIT %s"
+        )
+        params += [settings.SEARCH_CANDIDATES, limit]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [object_id for (object_id,) in cursor.fetchall()]
@@ -0,0 +1,69 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import models
+
+from post.models import Hashtag, Post
+from user.models import User
+
+TOKEN_RE = re.compile(r"\w+")
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+
+# (object id, owner id, text of each field)
+Row = Tuple[int, Optional[int], Tuple[str, ...]]
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase words of ``text`` with diacritics removed.
+
+    Matches what FTS5's ``unicode61 remove_diacritics 2`` tokenizer indexes,
+    so queries tokenized here find the same words in every backend.
+    """
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    plain = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(plain.lower())
+        if token.strip("_")
+    ]
+
+
+def query_terms(query: str) -> List[str]:
+    """Distinct terms of a search query; each is matched as a prefix."""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+@dataclass(frozen=True)
+class Document:
+    """A searchable model: which fields are indexed and how they are weighted."""
+
+    name: str
+    model: type
+    fields: Tuple[str, ...]
+    weights: Tuple[float, ...]
+    owner_field: Optional[str] = None
+
+    def row(self, instance: models.Model) -> Row:
+        owner_id = getattr(instance, self.owner_field) if self.owner_field else None
+        return (
+            instance.pk,
+            owner_id,
+            tuple(getattr(instance, field) or "" for field in self.fields),
+        )
+
+    def rows(self, instances: Iterable[models.Model]) -> List[Row]:
+        return [self.row(instance) for instance in instances]
+
+    def watches(self, update_fields: Optional[Iterable[str]]) -> bool:
+        """Whether a save of ``update_fields`` can change the indexed text."""
+        return update_fields is None or bool(set(update_fields) & set(self.fields))
+
+
+DOCUMENTS: Dict[str, Document] = {
+    "users": Document("users", User, ("username", "name"), (2.0, 1.0)),
+    "posts": Document("posts", Post, ("caption",), (1.0,), owner_field="user_id"),
+    "hashtags": Document("hashtags", Hashtag, ("name",), (1.0,)),
+}
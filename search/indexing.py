@@ -0,0 +1,56 @@
+from typing import Collection, Iterable, Optional
+
+from django.db import models, transaction
+
+from search.backends import get_backend
+from search.documents import DOCUMENTS
+
+BATCH_SIZE = 1000
+
+
+def index_later(
+    name: str,
+    instances: Iterable[models.Model],
+    update_fields: Optional[Iterable[str]] = None,
+):
+    """Index ``instances`` of document ``name`` once the transaction commits.
+
+    Saves that only touch fields outside the document (counters, flags,
+    ``last_login``) are ignored.
+    """
+    document = DOCUMENTS[name]
+    if not document.watches(update_fields):
+        return
+    rows = document.rows(instances)
+    if rows:
+        transaction.on_commit(lambda: get_backend().index(document, rows))
+
+
+def remove_later(name: str, ids: Collection[int]):
+    document = DOCUMENTS[name]
+    ids = list(ids)
+    transaction.on_commit(lambda: get_backend().remove(document, ids))
+
+
+def rebuild(name: str) -> int:
+    """Reindex every object of document ``name`` from the database."""
+    document = DOCUMENTS[name]
+    backend = get_backend()
+    fields = ["pk", *document.fields]
+    if document.owner_field:
+        fields.append(document.owner_field)
+    count = 0
+    with transaction.atomic():
+        backend.clear(document)
+        batch = []
+        for instance in document.model.objects.only(*fields).iterator(
+            chunk_size=BATCH_SIZE
+        ):
+            batch.append(document.row(instance))
+            if len(batch) == BATCH_SIZE:
+                backend.index(document, batch)
+                count += len(batch)
+                batch = []
+        backend.index(document, batch)
+        count += len(batch)
+    return count
@@ -0,0 +1,91 @@
+import random
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from momento.core.benchmark import measure, write_results
+from search.backends.database import InvertedIndexBackend
+from search.backends.fts5 import FTS5Backend
+from search.documents import DOCUMENTS
+
+BATCH_SIZE = 5000
+WORDS = (
+    "sunset beach golden morning coffee city night lights street food travel "
+    "mountain river forest summer winter friends family weekend party music "
+    "concert art museum garden flowers rain snow road trip dog cat sunrise"
+).split()
+QUERIES = {
+    "typeahead": ["su"],
+    "word": ["sunset"],
+    "words": ["golden", "sun"],
+    "rare": ["zq"],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time caption searches against each search backend for a range of "
+        "index sizes, with and without a visibility filter."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="*", type=int, default=[10000, 100000])
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Also write the results to this file")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.run(sorted(options["sizes"]), options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<40} p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms"
+            )
+        if options["output"]:
+            write_results(Path(options["output"]), {"searches": results})
+
+    def run(self, sizes, options):
+        rng = random.Random(options["seed"])
+        document = DOCUMENTS["posts"]
+        backends = {"fts5": FTS5Backend(), "inverted": InvertedIndexBackend()}
+        # A viewer sees the posts of a few hundred of 100k authors
+        visible = rng.sample(range(100000), 300)
+
+        results, indexed = {}, 0
+        for size in sizes:
+            while indexed < size:
+                batch = [
+                    (
+                        object_id,
+                        rng.randrange(100000),
+                        (" ".join(rng.choices(WORDS, k=6)) + f" z{object_id}",),
+                    )
+                    for object_id in range(
+                        indexed + 1, min(indexed + BATCH_SIZE, size) + 1
+                    )
+                ]
+                with transaction.atomic():
+                    for backend in backends.values():
+                        backend.index(document, batch)
+                indexed += len(batch)
+
+            for backend_name, backend in backends.items():
+                for query_name, terms in QUERIES.items():
+                    for owner_ids, scope in ((None, "all"), (visible, "visible")):
+                        results[f"{backend_name}/{size}/{query_name}/{scope}"] = (
+                            measure(
+                                lambda i: backend.search(
+                                    document, terms, 20, owner_ids
+                                ),
+                                options["iterations"],
+                            )
+                        )
+        return results
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from search.documents import DOCUMENTS
+from search.indexing import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search index from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "documents",
+            nargs="*",
+            help=f"Any of {', '.join(DOCUMENTS)}; defaults to all",
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["documents"]) - set(DOCUMENTS)
+        if unknown:
+            raise CommandError(f"Unknown documents: {', '.join(sorted(unknown))}")
+        for name in options["documents"] or DOCUMENTS:
+            self.stdout.write(f"{name} indexed: {rebuild(name)}")
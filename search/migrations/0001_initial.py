@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:07
+
+from django.db import migrations, models
+
+FTS_TABLES = {
+    # table: (indexed columns, source query)
+    "search_users_fts": (
+        "username, name",
+        "SELECT id, NULL, username, name FROM user_user",
+    ),
+    "search_posts_fts": (
+        "caption",
+        "SELECT id, user_id, COALESCE(caption, '') FROM post_post",
+    ),
+    "search_hashtags_fts": ("name", "SELECT id, NULL, name FROM post_hashtag"),
+}
+
+
+def create_fts_tables(apps, schema_editor):
+    # Other databases use the SearchTerm table through InvertedIndexBackend
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table, (columns, source) in FTS_TABLES.items():
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {table} USING fts5({columns}, owner_id UNINDEXED, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {table} (rowid, owner_id, {columns}) {source}"
+        )
+
+
+def drop_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table in FTS_TABLES:
+        schema_editor.execute(f"DROP TABLE {table}")
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("post", "0010_hashtag_index"),
+        ("user", "0005_content_addressed_pictures"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchTerm",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("document", models.CharField(max_length=16)),
+                ("term", models.CharField(max_length=64)),
+                ("object_id", models.BigIntegerField()),
+                ("owner_id", models.BigIntegerField(null=True)),
+                ("weight", models.FloatField(default=1.0)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["document", "term", "object_id"],
+                        name="searchterm_lookup_idx",
+                    ),
+                    models.Index(
+                        fields=["document", "object_id"], name="searchterm_object_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(create_fts_tables, drop_fts_tables),
+    ]
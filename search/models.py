@@ -0,0 +1,29 @@
+from django.db import models
+
+
+class SearchTerm(models.Model):
+    """One posting of the portable inverted index: ``term`` occurs in a document.
+
+    Only used by ``InvertedIndexBackend``; SQLite keeps its index in FTS5
+    tables instead.
+    """
+
+    document = models.CharField(max_length=16)
+    term = models.CharField(max_length=64)
+    object_id = models.BigIntegerField()
+    # Author of the object, so results can be limited to what a viewer sees
+    owner_id = models.BigIntegerField(null=True)
+    weight = models.FloatField(default=1.0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["document", "term", "object_id"], name="searchterm_lookup_idx"
+            ),
+            models.Index(
+                fields=["document", "object_id"], name="searchterm_object_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.document}:{self.term} -> {self.object_id}"
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from post.models import Hashtag, Post
+from search.indexing import index_later, remove_later
+from user.models import User
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    index_later("users", [instance], update_fields)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, update_fields=None, **kwargs):
+    index_later("posts", [instance], update_fields)
+
+
+@receiver(post_save, sender=Hashtag)
+def hashtag_saved(sender, instance, update_fields=None, **kwargs):
+    index_later("hashtags", [instance], update_fields)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    remove_later("users", [instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    remove_later("posts", [instance.pk])
+
+
+@receiver(post_delete, sender=Hashtag)
+def hashtag_deleted(sender, instance, **kwargs):
+    remove_later("hashtags", [instance.pk])
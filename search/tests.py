@@ -0,0 +1,108 @@
+import io
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from post.models import Post
+from search.indexing import rebuild
+from user.graph import follow_graph
+from user.models import User, Follow
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.viewer = User.objects.create(
+                email="seeker@momento.com", username="seeker", name="Seeker"
+            )
+            self.friend = User.objects.create(
+                email="friend@momento.com", username="friend", name="José Müller"
+            )
+            self.stranger = User.objects.create(
+                email="stranger@momento.com", username="mueller", name="Stranger"
+            )
+            Follow.objects.create(
+                follower=self.viewer,
+                followed=self.friend,
+                status=Follow.Status.ACCEPTED,
+            )
+            self.sunset = Post.objects.create(
+                user=self.friend, caption="Golden sunset over the bay"
+            )
+            Post.objects.create(user=self.stranger, caption="Sunset from a stranger")
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def search(self, query, kind):
+        response = self.client.get("/api/search/", {"q": query, "type": kind})
+        self.assertEqual(response.status_code, 200)
+        return response.json()[kind]
+
+    def test_prefixes_match_without_diacritics(self):
+        self.assertEqual(
+            [user["username"] for user in self.search("jose mull", "users")],
+            ["friend"],
+        )
+        # A username match outranks the same word in a name
+        self.assertEqual(
+            [user["username"] for user in self.search("mu", "users")],
+            ["mueller", "friend"],
+        )
+
+    def test_posts_are_limited_to_visible_authors(self):
+        self.assertEqual(
+            [post["id"] for post in self.search("suns", "posts")], [self.sunset.id]
+        )
+
+    def test_index_follows_saves_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sunset.caption = "Foggy morning"
+            self.sunset.save()
+        self.assertEqual(self.search("sunset", "posts"), [])
+        self.assertEqual(len(self.search("fog", "posts")), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sunset.delete()
+        self.assertEqual(self.search("fog", "posts"), [])
+
+    @override_settings(MEDIA_PROCESSING_EAGER=True)
+    def test_new_hashtags_are_indexed(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        buffer = io.BytesIO()
+        Image.new("RGB", (8, 8), "red").save(buffer, format="PNG")
+        with self.settings(MEDIA_ROOT=media_root):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    "/api/post/",
+                    {
+                        "caption": "tagged",
+                        "hashtags": "beachday,beachlife",
+                        "media": [SimpleUploadedFile("a.png", buffer.getvalue())],
+                    },
+                    format="multipart",
+                )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(tag["name"] for tag in self.search("beach", "hashtags")),
+            ["beachday", "beachlife"],
+        )
+
+    def test_rebuild_restores_the_index(self):
+        for name in ("users", "posts", "hashtags"):
+            rebuild(name)
+        self.assertEqual(
+            [user["username"] for user in self.search("seek", "users")], ["seeker"]
+        )
+
+
+@override_settings(SEARCH_BACKEND="search.backends.database.InvertedIndexBackend")
+class InvertedIndexSearchTests(SearchTests):
+    pass
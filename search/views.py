@@ -0,0 +1,76 @@
+from typing import Dict, List
+
+from django.conf import settings
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from post.models import Hashtag, Post
+from post.serializers import PostListSerializer
+from search.backends import get_backend
+from search.documents import DOCUMENTS, query_terms
+from user.graph import follow_graph
+from user.models import User
+from user.serializers import UserSerializer
+
+
+def in_order(objects, ids: List[int]) -> list:
+    by_id = {obj.pk: obj for obj in objects}
+    return [by_id[object_id] for object_id in ids if object_id in by_id]
+
+
+class SearchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    http_method_names = ["get"]
+
+    @extend_schema(
+        tags=["search"],
+        description="Search users, post captions and hashtags. Every word of "
+        "``q`` is matched as a prefix; ``type`` restricts the search to one of "
+        "users, posts or hashtags.",
+    )
+    def get(self, request):
+        terms = query_terms(request.query_params.get("q", ""))
+        kind = request.query_params.get("type")
+        if kind and kind not in DOCUMENTS:
+            return Response({"message": f"Unknown search type {kind}"}, status=400)
+        try:
+            limit = int(request.query_params.get("limit", settings.SEARCH_LIMIT))
+        except ValueError:
+            limit = settings.SEARCH_LIMIT
+        limit = min(max(limit, 1), settings.SEARCH_MAX_LIMIT)
+
+        backend = get_backend()
+        results: Dict[str, list] = {}
+        for name in [kind] if kind else DOCUMENTS:
+            owner_ids = None
+            if name == "posts":
+                # Only posts by users you follow OR who follow you are visible
+                owner_ids = follow_graph.visible_user_ids(request.user.id)
+            ids = backend.search(DOCUMENTS[name], terms, limit, owner_ids)
+            results[name] = getattr(self, f"{name}_data")(ids) if ids else []
+        return Response(results)
+
+    def users_data(self, ids: List[int]) -> list:
+        users = User.objects.select_related("profile").filter(
+            id__in=ids, is_active=True, is_staff=False
+        )
+        return UserSerializer(
+            in_order(users, ids), many=True, context={"request": self.request}
+        ).data
+
+    def posts_data(self, ids: List[int]) -> list:
+        posts = (
+            Post.objects.select_related("user__profile")
+            .prefetch_related("media")
+            .filter(id__in=ids)
+        )
+        return PostListSerializer(
+            in_order(posts, ids), many=True, context={"request": self.request}
+        ).data
+
+    @staticmethod
+    def hashtags_data(ids: List[int]) -> list:
+        hashtags = Hashtag.objects.filter(id__in=ids)
+        return [{"name": hashtag.name} for hashtag in in_order(hashtags, ids)]
@@ -26,7 +26,7 @@ class ProfileAdmin(admin.ModelAdmin):
 
 @admin.register(OTP)
 class OTPAdmin(admin.ModelAdmin):
-    list_display = ["user", "code", "is_expired"]
+    list_display = ["user", "code", "expires_at", "is_expired"]
     search_fields = ["code"]
 
 
@@ -0,0 +1,157 @@
+import threading
+import uuid
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from user.models import Follow
+
+
+def _contains(values: array, value: int) -> bool:
+    index = bisect_left(values, value)
+    return index < len(values) and values[index] == value
+
+
+@dataclass
+class Adjacency:
+    """A user's accepted followers and followings as sorted int64 arrays."""
+
+    followers: array
+    following: array
+
+    def __len__(self) -> int:
+        return len(self.followers) + len(self.following)
+
+    def is_connected(self, user_id: int) -> bool:
+        return _contains(self.followers, user_id) or _contains(self.following, user_id)
+
+    def user_ids(self) -> Set[int]:
+        return set(self.followers) | set(self.following)
+
+    def dumps(self) -> Tuple[bytes, bytes]:
+        return self.followers.tobytes(), self.following.tobytes()
+
+    @classmethod
+    def loads(cls, data: Tuple[bytes, bytes]) -> "Adjacency":
+        followers, following = array("q"), array("q")
+        followers.frombytes(data[0])
+        following.frombytes(data[1])
+        return cls(followers, following)
+
+
+class FollowGraph:
+    """Accepted follow edges per user, cached in-process and in the shared cache.
+
+    Each user's edges carry a version in the shared cache. A process reuses
+    its local copy only while that version is unchanged, so every check
+    costs one small cache read and the edges themselves are only fetched
+    from the shared cache, or loaded from ``Follow``, when they changed.
+    Edge changes drop both users' versions and shared copies, now and again
+    once the change commits, so a read that raced the change cannot keep
+    stale edges; shared copies also expire after ``FOLLOW_GRAPH_CACHE_TTL``
+    seconds.
+
+    Versions only reach other processes through a shared cache backend such
+    as Redis or Memcached. With the per-process local-memory default, an
+    unfollow reaches other processes only once their versions expire, after
+    ``FOLLOW_GRAPH_CACHE_TTL`` seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # user id -> (version the copy was read at, edges)
+        self._local: Dict[int, Tuple[str, Adjacency]] = {}
+
+    @staticmethod
+    def cache_key(user_id: int) -> str:
+        return f"follow-graph:{user_id}"
+
+    @staticmethod
+    def version_key(user_id: int) -> str:
+        return f"follow-graph-version:{user_id}"
+
+    def _version(self, user_id: int) -> Optional[str]:
+        key = self.version_key(user_id)
+        version = cache.get(key)
+        if version is None:
+            # A fresh value never matches a copy read before the change
+            cache.add(key, uuid.uuid4().hex, settings.FOLLOW_GRAPH_CACHE_TTL)
+            version = cache.get(key)
+        return version
+
+    def adjacency(self, user_id: int) -> Adjacency:
+        version = self._version(user_id)
+        entry = self._local.get(user_id)
+        if entry and version is not None and entry[0] == version:
+            return entry[1]
+
+        data = cache.get(self.cache_key(user_id))
+        if data is not None:
+            adjacency = Adjacency.loads(data)
+        else:
+            adjacency = self._load(user_id)
+            cache.set(
+                self.cache_key(user_id),
+                adjacency.dumps(),
+                settings.FOLLOW_GRAPH_CACHE_TTL,
+            )
+        if version is not None:
+            with self._lock:
+                self._local[user_id] = (version, adjacency)
+                if len(self._local) > settings.FOLLOW_GRAPH_LOCAL_MAX_USERS:
+                    self._local.pop(next(iter(self._local)))
+        return adjacency
+
+    @staticmethod
+    def _load(user_id: int) -> Adjacency:
+        followers, following = array("q"), array("q")
+        for followed_id, follower_id in Follow.objects.filter(
+            Q(follower_id=user_id) | Q(followed_id=user_id),
+            status=Follow.Status.ACCEPTED,
+        ).values_list("followed_id", "follower_id"):
+            if followed_id == user_id:
+                followers.append(follower_id)
+            else:
+                following.append(followed_id)
+        return Adjacency(
+            array("q", sorted(followers)), array("q", sorted(following))
+        )
+
+    def visible_user_ids(self, user_id: int) -> Set[int]:
+        """Users whose posts ``user_id`` can see (you follow OR who follow you)."""
+        return self.adjacency(user_id).user_ids() | {user_id}
+
+    def can_see(self, viewer_id: int, author_id: int) -> bool:
+        return viewer_id == author_id or self.adjacency(viewer_id).is_connected(
+            author_id
+        )
+
+    def audience_size(self, user_id: int) -> int:
+        return len(self.adjacency(user_id))
+
+    def edge_changed(self, follower_id: int, followed_id: int):
+        """Forget both users' edges after a follow is accepted or removed."""
+        self._forget(follower_id, followed_id)
+        transaction.on_commit(lambda: self._forget(follower_id, followed_id))
+
+    def _forget(self, *user_ids: int):
+        with self._lock:
+            for user_id in user_ids:
+                self._local.pop(user_id, None)
+        cache.delete_many(
+            [self.cache_key(user_id) for user_id in user_ids]
+            + [self.version_key(user_id) for user_id in user_ids]
+        )
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+
+follow_graph = FollowGraph()
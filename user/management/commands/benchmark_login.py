@@ -0,0 +1,82 @@
+from pathlib import Path
+
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from rest_framework.test import APIClient
+
+from momento.core.benchmark import measure, write_results
+from user.models import User
+
+PASSWORD = "benchmark-password"
+HASHERS = {
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "argon2": "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "bcrypt": "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "scrypt": "django.contrib.auth.hashers.ScryptPasswordHasher",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time POST /api/user/token/ with each password hasher and report "
+        "logins per second on one core. Hashers whose library is not "
+        "installed are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--output", help="Also write the results to this file")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.run(options["iterations"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<20} queries={result['queries']:<3} "
+                f"p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms "
+                f"logins/s/core={result['logins_per_second']:.1f}"
+            )
+        if options["output"]:
+            write_results(Path(options["output"]), {"logins": results})
+
+    def run(self, iterations):
+        client = APIClient()
+        results = {}
+        for name, hasher in HASHERS.items():
+            with override_settings(PASSWORD_HASHER=hasher, PASSWORD_HASHERS=[hasher]):
+                if get_hasher().library:
+                    try:
+                        get_hasher()._load_library()
+                    except ValueError as e:
+                        self.stderr.write(f"Skipping {name}: {e}")
+                        continue
+                user = User.objects.create(
+                    email=f"{name}@momento.com", username=name, name=name
+                )
+                user.set_password(PASSWORD)
+                user.save()
+                for scenario, email in (
+                    ("login", user.email),
+                    ("unknown", "nobody@momento.com"),
+                ):
+                    result = measure(
+                        lambda i: client.post(
+                            "/api/user/token/", {"email": email, "password": PASSWORD}
+                        ),
+                        iterations,
+                    )
+                    result["logins_per_second"] = round(1000 / result["p50_ms"], 1)
+                    results[f"{name}/{scenario}"] = result
+        return results
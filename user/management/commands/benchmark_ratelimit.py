@@ -0,0 +1,87 @@
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from momento.core.benchmark import write_results
+from momento.core.throttling import ScopedBucketThrottle, get_store
+
+STORES = {
+    "local": "momento.core.throttling.LocalTokenBucketStore",
+    "cache": "momento.core.throttling.CacheSlidingWindowStore",
+}
+
+
+class LoginView:
+    throttle_scope = "login"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a rate-limit check with each store, for clients under and "
+        "over their limit, and report microseconds per check."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=100000)
+        parser.add_argument("--clients", type=int, default=10000)
+        parser.add_argument("--output", help="Also write the results to this file")
+
+    def handle(self, *args, **options):
+        results = {}
+        for name, store in STORES.items():
+            rates = {"login": "1000000000/min", "over": "1/day"}
+            with override_settings(THROTTLE_STORE=store, THROTTLE_RATES=rates):
+                get_store().clear()
+                results.update(self.run(name, options))
+
+        for name, result in results.items():
+            self.stdout.write(f"{name:<24} {result['us_per_check']:.2f}us/check")
+        if options["output"]:
+            write_results(Path(options["output"]), {"checks": results})
+
+    def run(self, name, options):
+        iterations, clients = options["iterations"], options["clients"]
+        store = get_store()
+        keys = [f"login:ip:10.0.{i // 256}.{i % 256}" for i in range(clients)]
+
+        def under(i):
+            store.consume(keys[i % clients], 1000000000, 60)
+
+        def over(i):
+            store.consume("over:ip:10.1.0.1", 1, 86400)
+
+        factory = APIRequestFactory()
+        requests = []
+        for i in range(clients):
+            request = Request(
+                factory.post(
+                    "/api/user/token/", REMOTE_ADDR=f"10.2.{i // 256}.{i % 256}"
+                )
+            )
+            request.user = AnonymousUser()
+            requests.append(request)
+        throttle, view = ScopedBucketThrottle(), LoginView()
+
+        def throttled(i):
+            throttle.allow_request(requests[i % clients], view)
+
+        return {
+            f"{name}/under_limit": self.time(under, iterations),
+            f"{name}/over_limit": self.time(over, iterations),
+            f"{name}/throttle": self.time(throttled, iterations),
+        }
+
+    @staticmethod
+    def time(check, iterations):
+        for i in range(min(iterations, 1000)):
+            check(i)
+        started = time.perf_counter()
+        for i in range(iterations):
+            check(i)
+        elapsed = time.perf_counter() - started
+        return {"us_per_check": round(elapsed / iterations * 1e6, 3)}
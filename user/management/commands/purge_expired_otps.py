@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from user.otp import get_otp_store
+
+
+class Command(BaseCommand):
+    help = "Delete expired one-time passwords. Run periodically, e.g. from cron."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Expired OTPs purged: {get_otp_store().purge()}")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from user import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute suggested users. By default only users whose graph or "
+        "engagement changed since the previous run started, or who lost a "
+        "follow, are refreshed; schedule it periodically and run with --full "
+        "occasionally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true")
+        parser.add_argument("--limit", type=int, help="Suggestions kept per user")
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        computed = suggestions.run(options["full"], options["limit"])
+        elapsed = (timezone.now() - started).total_seconds()
+        self.stdout.write(f"Refreshed suggestions for {computed} users in {elapsed:.2f}s")
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:43
+
+import post.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0004_suggestion"),
+        ("post", "0008_blob"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="profile",
+            name="cover_picture",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=post.storage.content_addressed_storage,
+                upload_to="cover_pictures/",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="profile",
+            name="profile_picture",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=post.storage.content_addressed_storage,
+                upload_to="profile_pictures/",
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:40
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_expires_at(apps, schema_editor):
+    # Existing codes keep the five minutes they were issued with
+    OTP = apps.get_model("user", "OTP")
+    OTP.objects.update(expires_at=F("created_at") + timedelta(minutes=5))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0005_content_addressed_pictures"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="otp",
+            name="expires_at",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(fill_expires_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="otp",
+            name="expires_at",
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name="otp",
+            index=models.Index(
+                fields=["user", "code", "expires_at"], name="otp_lookup_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="otp",
+            index=models.Index(fields=["expires_at"], name="otp_expires_idx"),
+        ),
+    ]
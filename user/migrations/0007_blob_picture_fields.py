@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:14
+
+import post.storage
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0006_otp_expiry"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="profile",
+            name="cover_picture",
+            field=post.storage.BlobImageField(
+                blank=True,
+                null=True,
+                storage=post.storage.content_addressed_storage,
+                upload_to="cover_pictures/",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="profile",
+            name="profile_picture",
+            field=post.storage.BlobImageField(
+                blank=True,
+                null=True,
+                storage=post.storage.content_addressed_storage,
+                upload_to="profile_pictures/",
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0007_blob_picture_fields"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StaleSuggestions",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="+",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("marked_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SuggestionRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("started_at", models.DateTimeField(db_index=True)),
+                ("full", models.BooleanField(default=False)),
+                ("users", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
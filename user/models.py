@@ -1,5 +1,7 @@
-import random
+import secrets
+from datetime import timedelta
 
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -9,6 +11,7 @@ from django.contrib.auth.models import (
 from django.utils import timezone
 
 from momento.core.models import BaseModel
+from post.storage import BlobImageField, content_addressed_storage
 
 
 class UserManager(BaseUserManager):
@@ -44,6 +47,11 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
 
     objects = UserManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="user_created_idx"),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -56,11 +64,17 @@ class Profile(BaseModel):
 
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     bio = models.TextField()
-    profile_picture = models.ImageField(
-        upload_to="profile_pictures/", blank=True, null=True
+    profile_picture = BlobImageField(
+        upload_to="profile_pictures/",
+        storage=content_addressed_storage,
+        blank=True,
+        null=True,
     )
-    cover_picture = models.ImageField(
-        upload_to="cover_pictures/", blank=True, null=True
+    cover_picture = BlobImageField(
+        upload_to="cover_pictures/",
+        storage=content_addressed_storage,
+        blank=True,
+        null=True,
     )
     website = models.URLField(blank=True, null=True)
     gender = models.CharField(
@@ -71,9 +85,21 @@ class Profile(BaseModel):
         return self.user.email
 
 
+def generate_otp_code() -> str:
+    return f"{secrets.randbelow(900000) + 100000}"
+
+
 class OTP(BaseModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     code = models.CharField(max_length=6)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Verification matches all three in one index probe
+            models.Index(fields=["user", "code", "expires_at"], name="otp_lookup_idx"),
+            models.Index(fields=["expires_at"], name="otp_expires_idx"),
+        ]
 
     def __str__(self):
         if self.is_expired():
@@ -81,11 +107,13 @@ class OTP(BaseModel):
         return f"{self.user} - {self.code}"
 
     def is_expired(self):
-        return self.created_at + timezone.timedelta(minutes=5) < timezone.now()
+        return self.expires_at <= timezone.now()
 
     def save(self, *args, **kwargs):
         if not self.code:
-            self.code = random.randint(100000, 999999)
+            self.code = generate_otp_code()
+        if not self.expires_at:
+            self.expires_at = timezone.now() + timedelta(seconds=settings.OTP_TTL)
         super().save(*args, **kwargs)
 
 
@@ -116,3 +144,55 @@ class Follow(BaseModel):
                 fields=["followed", "follower"], name="unique_follow"
             )
         ]
+
+
+class Suggestion(BaseModel):
+    """A precomputed "people you may know" candidate for a user."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="suggestions"
+    )
+    candidate = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="suggested_to"
+    )
+    score = models.FloatField()
+    mutual_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "candidate"], name="unique_suggestion"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["user", "-score"], name="suggestion_user_score_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.candidate} ({self.score})"
+
+
+class SuggestionRun(models.Model):
+    """A ``refresh_suggestions`` run; the latest start is the next watermark."""
+
+    started_at = models.DateTimeField(db_index=True)
+    full = models.BooleanField(default=False)
+    users = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.started_at} ({self.users} users)"
+
+
+class StaleSuggestions(models.Model):
+    """A user whose suggestions the next incremental run must recompute.
+
+    For changes that leave no timestamped row behind, such as removed follows.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    marked_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user_id} ({self.marked_at})"
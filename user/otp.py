@@ -0,0 +1,78 @@
+import abc
+from hmac import compare_digest
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from user.models import OTP, generate_otp_code
+
+
+class OTPStore(abc.ABC):
+    """Where one-time passwords live between registration and verification.
+
+    ``verify`` consumes the code: a code is accepted at most once, and only
+    until ``OTP_TTL`` seconds after it was issued.
+    """
+
+    @abc.abstractmethod
+    def issue(self, user_id: int) -> str:
+        """Create a new code for the user."""
+
+    @abc.abstractmethod
+    def verify(self, user_id: int, code: str) -> bool:
+        """Whether ``code`` is the user's live code, consuming it if so."""
+
+    def purge(self) -> int:
+        """Remove expired codes; returns how many were removed."""
+        return 0
+
+
+class DatabaseOTPStore(OTPStore):
+    """Codes in the ``OTP`` table, matched and expired by the index."""
+
+    def issue(self, user_id: int) -> str:
+        # Earlier codes stay valid until they expire and are purged
+        return OTP.objects.create(user_id=user_id).code
+
+    def verify(self, user_id: int, code: str) -> bool:
+        deleted, _ = OTP.objects.filter(
+            user_id=user_id, code=code, expires_at__gt=timezone.now()
+        ).delete()
+        return deleted > 0
+
+    def purge(self) -> int:
+        # Bounded batches keep each delete short under signup traffic
+        expired = OTP.objects.filter(expires_at__lte=timezone.now())
+        purged = 0
+        while True:
+            ids = list(
+                expired.values_list("id", flat=True)[: settings.OTP_PURGE_BATCH_SIZE]
+            )
+            if not ids:
+                return purged
+            purged += OTP.objects.filter(id__in=ids).delete()[0]
+
+
+class CacheOTPStore(OTPStore):
+    """Codes in the cache, expired by its TTL; nothing to purge."""
+
+    def key(self, user_id: int) -> str:
+        return f"otp:{user_id}"
+
+    def issue(self, user_id: int) -> str:
+        code = generate_otp_code()
+        cache.set(self.key(user_id), code, settings.OTP_TTL)
+        return code
+
+    def verify(self, user_id: int, code: str) -> bool:
+        stored = cache.get(self.key(user_id))
+        if stored is None or not compare_digest(stored.encode(), code.encode()):
+            return False
+        cache.delete(self.key(user_id))
+        return True
+
+
+def get_otp_store() -> OTPStore:
+    return import_string(settings.OTP_STORE)()
@@ -1,6 +1,8 @@
-from typing import Optional
+from typing import Dict, Optional
 
 from rest_framework import serializers
+
+from momento.core.renditions import srcset
 from user.models import User, Profile
 
 
@@ -19,6 +21,9 @@ class RegisterSerializer(serializers.Serializer):
 
     @staticmethod
     def validate_username(value):
+        # "@" tells an email address from a username when signing in
+        if "@" in value:
+            raise serializers.ValidationError("Username cannot contain @")
         if User.objects.filter(username=value).exists():
             raise serializers.ValidationError("Username already exists")
         return value
@@ -49,6 +54,7 @@ class UserSerializer(serializers.Serializer):
     username = serializers.CharField()
     name = serializers.CharField()
     profile_picture = serializers.SerializerMethodField()
+    profile_picture_srcset = serializers.SerializerMethodField()
 
     @staticmethod
     def get_profile_picture(obj) -> Optional[str]:
@@ -59,6 +65,37 @@ class UserSerializer(serializers.Serializer):
             else None
         )
 
+    def get_profile_picture_srcset(self, obj) -> Dict[str, str]:
+        profile = getattr(obj, "profile", None)
+        if not profile or not profile.profile_picture:
+            return {}
+        return self.absolute_srcset(profile.profile_picture.name)
+
+    def absolute_srcset(self, name: str) -> Dict[str, str]:
+        request = self.context["request"]
+        return {
+            width: request.build_absolute_uri(url)
+            for width, url in srcset(name).items()
+        }
+
+
+class MeSerializer(UserSerializer):
+    cover_picture = serializers.SerializerMethodField()
+    cover_picture_srcset = serializers.SerializerMethodField()
+
+    @staticmethod
+    def get_cover_picture(obj) -> Optional[str]:
+        profile = getattr(obj, "profile", None)
+        return (
+            profile.cover_picture.url if profile and profile.cover_picture else None
+        )
+
+    def get_cover_picture_srcset(self, obj) -> Dict[str, str]:
+        profile = getattr(obj, "profile", None)
+        if not profile or not profile.cover_picture:
+            return {}
+        return self.absolute_srcset(profile.cover_picture.name)
+
 
 class FollowRequestSerializer(serializers.Serializer):
     followed_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
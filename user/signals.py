@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from momento.core import renditions
+from momento.core.authentication import forget_account_status, user_rows
+from momento.core.cache import invalidate, invalidate_viewer
+from post.storage import release
+from user import suggestions
+from user.graph import follow_graph
+from user.models import User, Profile, Follow
+from user.typeahead import username_index
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    user_id = instance.pk
+    user_rows.discard(user_id)
+    # Again after commit, in case a request cached the old status meanwhile
+    forget_account_status(user_id)
+    transaction.on_commit(lambda: forget_account_status(user_id))
+    invalidate("me", instance.pk)
+    invalidate("users", "all")
+
+
+TYPEAHEAD_FIELDS = {"username", "name", "is_active"}
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not TYPEAHEAD_FIELDS & set(update_fields):
+        return
+    # Inactive accounts are taken out of completion
+    username = instance.username if instance.is_active else None
+    name = instance.name
+    transaction.on_commit(lambda: username_index.publish(instance.pk, username, name))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: username_index.publish(user_id, None))
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    invalidate("me", instance.user_id)
+    invalidate("users", "all")
+
+
+PICTURE_FIELDS = ("profile_picture", "cover_picture")
+
+
+@receiver(pre_save, sender=Profile)
+def profile_pictures_replaced(sender, instance, update_fields=None, **kwargs):
+    fields = [f for f in PICTURE_FIELDS if not update_fields or f in update_fields]
+    if instance.pk is None or not fields:
+        return
+    old = Profile.objects.filter(pk=instance.pk).values(*fields).first() or {}
+    for field in fields:
+        new, old_name = getattr(instance, field), old.get(field)
+        # A newly assigned file takes its own reference when stored, so the
+        # old one is released even when both have the same content
+        if old_name and (not new or not new._committed or new.name != old_name):
+            release(new.storage, old_name)
+            renditions.forget_sources(old_name)
+
+
+@receiver(post_delete, sender=Profile)
+def profile_deleted(sender, instance, **kwargs):
+    for field in PICTURE_FIELDS:
+        picture = getattr(instance, field)
+        release(picture.storage, picture.name)
+        renditions.forget_sources(picture.name)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, **kwargs):
+    follow_graph.edge_changed(instance.follower_id, instance.followed_id)
+    follow_changed(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follow_graph.edge_changed(instance.follower_id, instance.followed_id)
+    follow_changed(instance)
+    # A removed follow leaves no row for the next refresh to find
+    user_ids = (instance.follower_id, instance.followed_id)
+    transaction.on_commit(lambda: suggestions.mark_stale(*user_ids))
+
+
+def follow_changed(follow: Follow):
+    # What either user may see has changed
+    invalidate_viewer(follow.follower_id)
+    invalidate_viewer(follow.followed_id)
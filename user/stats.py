@@ -0,0 +1,46 @@
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from momento.core.queries import count_of
+from post.models import Post
+from user.models import User, Follow
+
+# Bump when the cached payload changes shape so stale entries are ignored
+STATS_CACHE_VERSION = 1
+
+
+def cache_key(user_id: int) -> str:
+    return f"profile-stats:v{STATS_CACHE_VERSION}:{user_id}"
+
+
+def get_profile_stats(user_id: int) -> Optional[Dict[str, int]]:
+    """Post, follower and following counts for a profile, or None if unknown.
+
+    Served from the cache when possible, otherwise computed in a single query.
+    Only accepted follows are counted.
+    """
+    key = cache_key(user_id)
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+
+    accepted = Follow.objects.filter(status=Follow.Status.ACCEPTED)
+    row = (
+        User.objects.filter(id=user_id)
+        .values_list(
+            count_of(Post.objects, "user"),
+            count_of(accepted, "followed"),
+            count_of(accepted, "follower"),
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    stats = dict(zip(("posts", "followers", "following"), row))
+    cache.set(key, stats, settings.PROFILE_STATS_CACHE_TTL)
+    return stats
+
+
+def invalidate(*user_ids: int):
+    cache.delete_many([cache_key(user_id) for user_id in user_ids])
@@ -0,0 +1,193 @@
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from post.models import Post, PostLike, Comment
+from user.models import User, Follow, StaleSuggestions, Suggestion, SuggestionRun
+
+# Relative weight of each signal in a candidate's score
+FRIENDS_OF_FRIENDS_WEIGHT = 1.0
+SHARED_HASHTAG_WEIGHT = 0.5
+ENGAGEMENT_WEIGHT = 0.75
+
+
+def _related_ids(user_id: int) -> Set[int]:
+    """Users with any follow relationship to ``user_id``, pending included."""
+    relations = Follow.objects.filter(
+        Q(follower_id=user_id) | Q(followed_id=user_id)
+    ).values_list("followed_id", "follower_id")
+    return {uid for pair in relations for uid in pair}
+
+
+def _friends_of_friends(user_id: int) -> Counter:
+    """Candidates followed by the people ``user_id`` follows, by overlap."""
+    following = Follow.objects.filter(
+        follower_id=user_id, status=Follow.Status.ACCEPTED
+    ).values("followed_id")
+    rows = (
+        Follow.objects.filter(follower_id__in=following, status=Follow.Status.ACCEPTED)
+        .values("followed_id")
+        .annotate(overlap=Count("follower_id", distinct=True))
+        .values_list("followed_id", "overlap")
+    )
+    return Counter(dict(rows))
+
+
+def _shared_hashtags(user_id: int) -> Counter:
+    """Authors who used the same hashtags as ``user_id``, by distinct tag."""
+    through = Post.hashtags.through
+    my_tags = through.objects.filter(post__user_id=user_id).values("hashtag_id")
+    rows = (
+        through.objects.filter(hashtag_id__in=my_tags)
+        .values("post__user_id")
+        .annotate(shared=Count("hashtag_id", distinct=True))
+        .values_list("post__user_id", "shared")
+    )
+    return Counter(dict(rows))
+
+
+def _engagement(user_id: int) -> Counter:
+    """Likes and comments exchanged with ``user_id``, in either direction."""
+    scores = Counter()
+    for model in (PostLike, Comment):
+        received = (
+            model.objects.filter(post__user_id=user_id)
+            .values("user_id")
+            .annotate(total=Count("id"))
+            .values_list("user_id", "total")
+        )
+        given = (
+            model.objects.filter(user_id=user_id)
+            .values("post__user_id")
+            .annotate(total=Count("id"))
+            .values_list("post__user_id", "total")
+        )
+        scores.update(dict(received))
+        scores.update(dict(given))
+    return scores
+
+
+def compute_for_user(user_id: int, limit: Optional[int] = None) -> int:
+    """Rank candidates for ``user_id`` and replace their stored suggestions."""
+    limit = limit or settings.SUGGESTIONS_PER_USER
+    mutuals = _friends_of_friends(user_id)
+    signals = (
+        (mutuals, FRIENDS_OF_FRIENDS_WEIGHT),
+        (_shared_hashtags(user_id), SHARED_HASHTAG_WEIGHT),
+        (_engagement(user_id), ENGAGEMENT_WEIGHT),
+    )
+    scores: Dict[int, float] = Counter()
+    for counts, weight in signals:
+        for candidate_id, count in counts.items():
+            scores[candidate_id] += weight * count
+
+    excluded = _related_ids(user_id) | {user_id}
+    excluded |= set(
+        User.objects.filter(id__in=list(scores), is_staff=True).values_list(
+            "id", flat=True
+        )
+    )
+    ranked = [
+        (candidate_id, score)
+        for candidate_id, score in scores.most_common()
+        if candidate_id not in excluded
+    ][:limit]
+
+    with transaction.atomic():
+        Suggestion.objects.filter(user_id=user_id).delete()
+        Suggestion.objects.bulk_create(
+            Suggestion(
+                user_id=user_id,
+                candidate_id=candidate_id,
+                score=score,
+                mutual_count=mutuals.get(candidate_id, 0),
+            )
+            for candidate_id, score in ranked
+        )
+    return len(ranked)
+
+
+def users_changed_since(since: datetime) -> Set[int]:
+    """Users whose follows, posts or engagement changed after ``since``, or
+    who were marked stale."""
+    user_ids = set(StaleSuggestions.objects.values_list("user_id", flat=True))
+    for followed_id, follower_id in Follow.objects.filter(
+        updated_at__gt=since
+    ).values_list("followed_id", "follower_id"):
+        user_ids.update((followed_id, follower_id))
+    user_ids.update(
+        Post.objects.filter(created_at__gt=since).values_list("user_id", flat=True)
+    )
+    for model in (PostLike, Comment):
+        for liker_id, author_id in model.objects.filter(
+            created_at__gt=since
+        ).values_list("user_id", "post__user_id"):
+            user_ids.update((liker_id, author_id))
+    return user_ids
+
+
+def refresh(user_ids: Iterable[int], limit: Optional[int] = None) -> int:
+    computed = 0
+    for user_id in user_ids:
+        compute_for_user(user_id, limit)
+        computed += 1
+    return computed
+
+
+def last_run_started() -> Optional[datetime]:
+    return (
+        SuggestionRun.objects.order_by("-started_at")
+        .values_list("started_at", flat=True)
+        .first()
+    )
+
+
+def run(full: bool = False, limit: Optional[int] = None) -> int:
+    """Refresh users changed since the previous run began, or everyone.
+
+    The watermark is this run's start, taken before any change is read, so
+    changes made while it runs are picked up by the next one.
+    """
+    started = timezone.now()
+    since = last_run_started()
+    if full or since is None:
+        user_ids = (
+            User.objects.filter(is_active=True, is_staff=False)
+            .values_list("id", flat=True)
+            .iterator()
+        )
+    else:
+        user_ids = sorted(users_changed_since(since))
+    computed = refresh(user_ids, limit)
+    # Marks made after the start stay for the next run
+    StaleSuggestions.objects.filter(marked_at__lte=started).delete()
+    SuggestionRun.objects.create(started_at=started, full=full, users=computed)
+    return computed
+
+
+def mark_stale(*user_ids: int):
+    """Have the next incremental run recompute these users' suggestions.
+
+    Users deleted meanwhile are skipped.
+    """
+    now = timezone.now()
+    existing = User.objects.filter(id__in=user_ids).values_list("id", flat=True)
+    StaleSuggestions.objects.bulk_create(
+        [StaleSuggestions(user_id=user_id, marked_at=now) for user_id in existing],
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["marked_at"],
+    )
+
+
+def discard(user_id: int, other_id: int):
+    """Forget suggestions between two users once one follows the other."""
+    Suggestion.objects.filter(
+        Q(user_id=user_id, candidate_id=other_id)
+        | Q(user_id=other_id, candidate_id=user_id)
+    ).delete()
@@ -1,3 +1,492 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from momento.core.authentication import RefreshToken, user_rows
+from momento.core.cache import invalidate
+from momento.core.throttling import get_store
+from post.models import Post
+from user import suggestions
+from user.graph import FollowGraph, follow_graph
+from user.models import OTP, User, Follow, Suggestion
+from user.otp import get_otp_store
+from user.typeahead import UsernameIndex, username_index
+
+
+class TypeaheadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+        username_index.clear()
+        self.viewer = User.objects.create(
+            email="viewer@momento.com", username="viewer", name="Viewer"
+        )
+        self.users = {
+            username: User.objects.create(
+                email=f"{username}@momento.com", username=username, name=username
+            )
+            for username in ("anna", "Annabel", "annie", "ann", "bob")
+        }
+        Follow.objects.create(
+            follower=self.viewer,
+            followed=self.users["annie"],
+            status=Follow.Status.ACCEPTED,
+        )
+        Follow.objects.create(
+            follower=self.users["Annabel"],
+            followed=self.viewer,
+            status=Follow.Status.ACCEPTED,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def complete(self, prefix):
+        response = self.client.get("/api/user/typeahead/", {"q": prefix})
+        self.assertEqual(response.status_code, 200)
+        return [user["username"] for user in response.json()]
+
+    def test_connections_rank_first_without_queries(self):
+        self.assertEqual(self.complete("@AN"), ["annie", "Annabel", "ann", "anna"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.complete("annab"), ["Annabel"])
+
+    def test_creates_renames_and_deactivations_are_applied(self):
+        self.complete("a")
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create(email="ant@momento.com", username="ant", name="Ant")
+            bob = self.users["bob"]
+            bob.username = "annika"
+            bob.save()
+            ann = self.users["ann"]
+            ann.is_active = False
+            ann.save(update_fields=["is_active"])
+
+        self.assertEqual(
+            self.complete("an"), ["annie", "Annabel", "ant", "anna", "annika"]
+        )
+        self.assertEqual(self.complete("bob"), [])
+
+    def test_renamed_and_deactivated_connections_are_applied(self):
+        self.assertEqual(self.complete("an"), ["annie", "Annabel", "ann", "anna"])
+        with self.captureOnCommitCallbacks(execute=True):
+            annie = self.users["annie"]
+            annie.username = "aaron"
+            annie.save()
+            annabel = self.users["Annabel"]
+            annabel.is_active = False
+            annabel.save(update_fields=["is_active"])
+
+        self.assertEqual(self.complete("an"), ["ann", "anna"])
+        self.assertEqual(self.complete("aa"), ["aaron"])
+
+    @override_settings(TYPEAHEAD_SYNC_INTERVAL=0)
+    def test_changes_from_other_processes_are_replayed(self):
+        self.complete("a")
+        # An index that was never loaded only writes to the shared change log
+        other_process = UsernameIndex()
+        other_process.publish(self.users["bob"].id, "anton", "Anton")
+        other_process.publish(self.users["anna"].id, None)
+
+        self.assertEqual(self.complete("ant"), ["anton"])
+        self.assertEqual(self.complete("anna"), ["Annabel"])
+
+
+class SuggestedUsersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+        self.viewer = User.objects.create(
+            email="viewer@momento.com", username="viewer", name="Viewer"
+        )
+        self.others = [
+            User.objects.create(
+                email=f"other{i}@momento.com",
+                username=f"other{i}",
+                name="Other",
+                is_active=i != 1,
+            )
+            for i in range(4)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def page_through(self):
+        ids, url = [], "/api/user/suggested-users/?page_size=1"
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                data = self.client.get(url).json()
+            self.assertFalse(any("OFFSET" in q["sql"] for q in context), url)
+            ids += [user["id"] for user in data["results"]]
+            url = data["next"]
+        return ids
+
+    def test_fallback_pages_newest_first_without_offsets(self):
+        active = [user.id for user in self.others if user.is_active]
+        self.assertEqual(self.page_through(), sorted(active, reverse=True))
+
+    def test_fallback_pages_are_stable_when_timestamps_tie(self):
+        User.objects.update(created_at=timezone.now())
+        active = [user.id for user in self.others if user.is_active]
+        # Only the id tells these users apart
+        self.assertEqual(self.page_through(), sorted(active, reverse=True))
+
+    def test_inactive_candidates_are_not_suggested(self):
+        Suggestion.objects.bulk_create(
+            Suggestion(user=self.viewer, candidate=user, score=i)
+            for i, user in enumerate(self.others)
+        )
+        expected = [self.others[3].id, self.others[2].id, self.others[0].id]
+        self.assertEqual(self.page_through(), expected)
+
+
+class RefreshSuggestionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+        self.a, self.b, self.c, self.d = (
+            User.objects.create(email=f"{name}@momento.com", username=name, name=name)
+            for name in "abcd"
+        )
+        self.a_b = self.follow(self.a, self.b)
+        self.follow(self.b, self.c)
+
+    @staticmethod
+    def follow(follower, followed):
+        return Follow.objects.create(
+            follower=follower, followed=followed, status=Follow.Status.ACCEPTED
+        )
+
+    @staticmethod
+    def refresh(*args):
+        call_command("refresh_suggestions", *args, stdout=io.StringIO())
+
+    def candidates(self, user):
+        return set(
+            Suggestion.objects.filter(user=user).values_list("candidate_id", flat=True)
+        )
+
+    def test_removed_follows_are_refreshed(self):
+        self.refresh("--full")
+        self.assertEqual(self.candidates(self.a), {self.c.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a_b.delete()
+        self.refresh()
+        self.assertEqual(self.candidates(self.a), set())
+
+    def test_follows_made_during_a_run_are_picked_up_next(self):
+        self.refresh("--full")
+        refresh = suggestions.refresh
+
+        def racing(user_ids, limit=None):
+            list(user_ids)
+            self.follow(self.d, self.b)
+            # Suggestions written after the follow
+            return refresh([self.a.id], limit)
+
+        with mock.patch.object(suggestions, "refresh", racing):
+            self.refresh()
+        self.refresh()
+        self.assertEqual(self.candidates(self.d), {self.c.id})
+
+
+class FollowGraphTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        follow_graph.clear()
+        self.fan, self.star = (
+            User.objects.create(email=f"{name}@momento.com", username=name, name=name)
+            for name in ("fan", "star")
+        )
+        self.follow = Follow.objects.create(
+            follower=self.fan, followed=self.star, status=Follow.Status.ACCEPTED
+        )
+
+    def test_local_copies_are_reused_until_edges_change(self):
+        self.assertTrue(follow_graph.can_see(self.fan.id, self.star.id))
+        with self.assertNumQueries(0), mock.patch.object(
+            follow_graph, "cache_key", side_effect=AssertionError
+        ):
+            self.assertTrue(follow_graph.can_see(self.fan.id, self.star.id))
+
+    def test_other_processes_see_an_unfollow_at_once(self):
+        other_process = FollowGraph()
+        self.assertTrue(other_process.can_see(self.fan.id, self.star.id))
+        self.assertTrue(follow_graph.can_see(self.fan.id, self.star.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.follow.delete()
+        self.assertFalse(other_process.can_see(self.fan.id, self.star.id))
+        self.assertFalse(follow_graph.can_see(self.fan.id, self.star.id))
+
+
+class OTPTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            email="new@momento.com", username="new", name="New", is_active=False
+        )
+        self.client = APIClient()
+
+    def verify(self, code):
+        return self.client.post(
+            "/api/user/verify-otp/", {"email": self.user.email, "code": code}
+        )
+
+    def test_codes_are_accepted_once(self):
+        code = get_otp_store().issue(self.user.id)
+
+        self.assertEqual(self.verify(int(code) % 900000 + 100000).status_code, 400)
+        self.assertEqual(self.verify(code).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active)
+        self.assertFalse(get_otp_store().verify(self.user.id, code))
+
+    def test_expired_codes_are_rejected_and_purged(self):
+        code = get_otp_store().issue(self.user.id)
+        OTP.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        other = User.objects.create(email="other@momento.com", username="other")
+        get_otp_store().issue(other.id)
+
+        self.assertEqual(self.verify(code).status_code, 400)
+        self.assertEqual(get_otp_store().purge(), 1)
+        self.assertEqual(list(OTP.objects.values_list("user", flat=True)), [other.id])
+
+
+@override_settings(OTP_STORE="user.otp.CacheOTPStore")
+class CacheOTPTests(OTPTests):
+    def test_expired_codes_are_rejected_and_purged(self):
+        code = get_otp_store().issue(self.user.id)
+        cache.delete(f"otp:{self.user.id}")
+
+        self.assertEqual(self.verify(code).status_code, 400)
+        self.assertFalse(OTP.objects.exists())
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_store().clear()
+        self.user = User.objects.create(
+            email="member@momento.com", username="member", name="Member"
+        )
+        self.user.set_password("a-strong-password")
+        self.user.save()
+        self.client = APIClient()
+
+    def login(self, email, password="a-strong-password"):
+        return self.client.post(
+            "/api/user/token/", {"email": email, "password": password}
+        )
+
+    def test_login_looks_the_user_up_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(1):
+                response = self.login("member@momento.com")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.json())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login("nobody@momento.com").status_code, 403)
+        self.assertEqual(self.login("member@momento.com", "wrong").status_code, 403)
+
+    def test_unknown_accounts_still_check_a_password(self):
+        with mock.patch(
+            "momento.core.authentication.check_password", return_value=False
+        ) as check:
+            self.assertIsNone(authenticate(email="nobody@momento.com", password="x"))
+            self.assertIsNone(authenticate(username="nobody", password="x"))
+        self.assertEqual(check.call_count, 2)
+        self.assertEqual(
+            authenticate(username="member", password="a-strong-password"), self.user
+        )
+
+    def test_usernames_cannot_look_like_email_addresses(self):
+        response = self.client.post(
+            "/api/user/register/",
+            {
+                "email": "new@momento.com",
+                "password": "a-strong-password",
+                "name": "New",
+                "username": "member@momento.com",
+                "date_of_birth": "2000-01-01",
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.filter(email="new@momento.com").exists())
+
+    def test_last_login_is_written_at_most_once_per_interval(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.login("member@momento.com")
+        self.user.refresh_from_db()
+        first = self.user.last_login
+        self.assertIsNotNone(first)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.login("member@momento.com")
+        self.assertEqual(callbacks, [])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login, first)
+
+    def test_password_is_rehashed_with_the_configured_hasher(self):
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        with self.settings(
+            PASSWORD_HASHER="django.contrib.auth.hashers.ScryptPasswordHasher",
+            PASSWORD_HASHERS=[
+                "django.contrib.auth.hashers.ScryptPasswordHasher",
+                "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+            ],
+        ):
+            self.assertEqual(self.login("member@momento.com").status_code, 200)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith("scrypt$"))
+            self.assertEqual(self.login("member@momento.com").status_code, 200)
+
+
+class TokenAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_rows.clear()
+        self.user = User.objects.create(
+            email="member@momento.com", username="member", name="Member"
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        )
+
+    def test_user_id_is_read_from_the_token(self):
+        # The overview only needs the viewer's id; its stats are cached
+        self.client.get("/api/user/overview/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/user/overview/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_fields_load_once_and_are_reused(self):
+        with self.assertNumQueries(2):
+            # The user row, then the profile
+            response = self.client.get("/api/user/me/")
+        self.assertEqual(response.json()["name"], "Member")
+
+        invalidate("me", self.user.id)
+        with self.assertNumQueries(1):
+            self.client.get("/api/user/me/")
+
+    def test_mutable_flags_come_from_the_account_status(self):
+        self.assertNotIn("is_public", RefreshToken.for_user(self.user))
+        self.client.get("/api/user/overview/")
+        user_rows.clear()
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/cache/metrics/")
+        self.assertEqual(response.status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        user_rows.clear()
+        self.assertEqual(self.client.get("/api/cache/metrics/").status_code, 200)
+
+    def test_saving_the_user_drops_the_cached_row(self):
+        self.client.get("/api/user/me/")
+        self.user.name = "Renamed"
+        self.user.save()
+        self.assertEqual(self.client.get("/api/user/me/").json()["name"], "Renamed")
+
+    def test_deactivated_and_deleted_users_are_refused(self):
+        self.assertEqual(self.client.get("/api/user/overview/").status_code, 200)
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        self.assertEqual(self.client.get("/api/user/overview/").status_code, 401)
+
+        self.user.delete()
+        response = self.client.get("/api/user/overview/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["errors"][0]["code"], "user_not_found")
+
+
+@override_settings(
+    THROTTLE_RATES={"login": "3/min", "like": "2/min"}, ENGAGEMENT_FLUSH_INTERVAL=0
+)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_store().clear()
+        self.client = APIClient()
+
+    def login(self, address="10.0.0.1", email="nobody@momento.com", password="secret"):
+        return self.client.post(
+            "/api/user/token/",
+            {"email": email, "password": password},
+            REMOTE_ADDR=address,
+        )
+
+    def test_each_address_gets_its_own_limit(self):
+        remaining = [self.login()["X-RateLimit-Remaining"] for _ in range(3)]
+        self.assertEqual(remaining, ["2", "1", "0"])
+
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["X-RateLimit-Limit"], "3")
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertEqual(self.login("10.0.0.2", "other@momento.com").status_code, 403)
+
+    def test_each_account_gets_its_own_limit(self):
+        statuses = [self.login(f"10.0.0.{i}").status_code for i in range(4)]
+        self.assertEqual(statuses, [403, 403, 403, 429])
+        self.assertEqual(self.login("10.0.0.9", "other@momento.com").status_code, 403)
+
+    def test_denied_requests_cost_nothing_against_other_limits(self):
+        for i in range(3):
+            self.login(f"10.0.0.{i}")
+        # Refused for the account, so the address keeps its whole limit
+        for _ in range(3):
+            self.assertEqual(self.login("10.0.1.1").status_code, 429)
+        statuses = [
+            self.login("10.0.1.1", f"other{i}@momento.com").status_code
+            for i in range(4)
+        ]
+        self.assertEqual(statuses, [403, 403, 403, 429])
+
+    def test_only_failures_count_against_an_account(self):
+        user = User.objects.create(
+            email="member@momento.com", username="member", is_active=True
+        )
+        user.set_password("a-strong-password")
+        user.save()
+        statuses = [
+            self.login(f"10.0.0.{i}", user.email, "a-strong-password").status_code
+            for i in range(4)
+        ]
+        self.assertEqual(statuses, [200] * 4)
+
+    def test_authenticated_requests_are_counted_per_user(self):
+        users = [
+            User.objects.create(email=f"{name}@momento.com", username=name)
+            for name in ("first", "second")
+        ]
+        posts = [Post.objects.create(user=user, caption="Liked") for user in users]
+        statuses = []
+        for user, post in zip(users[:1] * 3 + users[1:], posts[:1] * 3 + posts[1:]):
+            self.client.force_authenticate(user)
+            statuses.append(self.client.post(f"/api/post/{post.id}/like/").status_code)
+        self.assertEqual(statuses, [200, 200, 429, 200])
+
+    def test_unscoped_views_are_not_limited(self):
+        self.client.force_authenticate(
+            User.objects.create(email="member@momento.com", username="member")
+        )
+        response = self.client.get("/api/user/overview/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-RateLimit-Limit", response)
+
+
+@override_settings(THROTTLE_STORE="momento.core.throttling.CacheSlidingWindowStore")
+class SharedRateLimitTests(RateLimitTests):
+    pass
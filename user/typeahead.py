@@ -0,0 +1,240 @@
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from user.graph import Adjacency, follow_graph
+from user.models import User
+
+GENERATION_KEY = "typeahead:generation"
+CHANGE_KEY = "typeahead:change:{generation}"
+# Changes older than this are replayed by a full reload instead
+CHANGE_LOG_SIZE = 1000
+
+# Proximity of a match to the requester, strongest first
+FOLLOWING, FOLLOWER, OTHER = 0, 1, 2
+
+# (user id, username, name)
+Match = Tuple[int, str, str]
+# (lowercased username, proximity, user id)
+Circle = Tuple[str, int, int]
+
+
+class UsernameIndex:
+    """Active users' usernames in sorted arrays, for prefix completion.
+
+    Lookups are two binary searches over the in-process arrays and never
+    touch the database. The index is loaded on first use, then kept current
+    from ``publish``: the change is applied locally and appended to a change
+    log in the shared cache, which other processes replay at most every
+    ``TYPEAHEAD_SYNC_INTERVAL`` seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # Sorted by lowercased username, with parallel ids and names
+            self._keys: List[str] = []
+            self._ids = array("q")
+            self._usernames: List[str] = []
+            self._names: List[str] = []
+            # Sorted user ids with their lowercased usernames
+            self._sorted_ids = array("q")
+            self._id_keys: List[str] = []
+            self._generation = 0
+            self._loaded_at: Optional[float] = None
+            self._checked_at = 0.0
+            # Per viewer: the adjacency a circle was built from, and the circle
+            self._circles: Dict[int, Tuple[Adjacency, List[Circle]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def load(self):
+        """(Re)build the index from every active user."""
+        generation = cache.get(GENERATION_KEY, 0)
+        rows = sorted(
+            (username.lower(), user_id, username, name)
+            for user_id, username, name in User.objects.filter(
+                is_active=True
+            ).values_list("id", "username", "name")
+        )
+        by_id = sorted((user_id, key) for key, user_id, _, _ in rows)
+        with self._lock:
+            self._keys = [row[0] for row in rows]
+            self._ids = array("q", (row[1] for row in rows))
+            self._usernames = [row[2] for row in rows]
+            self._names = [row[3] for row in rows]
+            self._sorted_ids = array("q", (user_id for user_id, _ in by_id))
+            self._id_keys = [key for _, key in by_id]
+            self._generation = generation
+            self._loaded_at = self._checked_at = time.monotonic()
+            self._circles.clear()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if (
+            self._loaded_at is None
+            or now - self._loaded_at > settings.TYPEAHEAD_REBUILD_INTERVAL
+        ):
+            self.load()
+            return
+        if now - self._checked_at < settings.TYPEAHEAD_SYNC_INTERVAL:
+            return
+        self._checked_at = now
+        generation = cache.get(GENERATION_KEY, 0)
+        if generation == self._generation:
+            return
+        if not self._generation < generation <= self._generation + CHANGE_LOG_SIZE:
+            self.load()
+            return
+        keys = [
+            CHANGE_KEY.format(generation=number)
+            for number in range(self._generation + 1, generation + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            # Expired, or published but not yet written: start over
+            self.load()
+            return
+        with self._lock:
+            for key in keys:
+                self._apply(*changes[key])
+            self._generation = generation
+
+    def publish(self, user_id: int, username: Optional[str], name: str = ""):
+        """Add, rename or (with ``username=None``) remove a user everywhere."""
+        try:
+            generation = cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.add(GENERATION_KEY, 0, None)
+            generation = cache.incr(GENERATION_KEY)
+        cache.set(
+            CHANGE_KEY.format(generation=generation),
+            (user_id, username, name),
+            settings.TYPEAHEAD_REBUILD_INTERVAL,
+        )
+        if self._loaded_at is not None:
+            with self._lock:
+                self._apply(user_id, username, name)
+
+    def _apply(self, user_id: int, username: Optional[str], name: str):
+        # Circles hold lowercased usernames, which may be about to change
+        self._circles.clear()
+        # Drop the old entry, then insert the new one in both orders
+        position = bisect_left(self._sorted_ids, user_id)
+        if position < len(self._sorted_ids) and self._sorted_ids[position] == user_id:
+            old_key = self._id_keys[position]
+            del self._sorted_ids[position]
+            del self._id_keys[position]
+            index = self._position(old_key, user_id)
+            for values in (self._keys, self._ids, self._usernames, self._names):
+                del values[index]
+        if username is None:
+            return
+        key = username.lower()
+        self._sorted_ids.insert(position, user_id)
+        self._id_keys.insert(position, key)
+        index = bisect_left(self._keys, key)
+        self._keys.insert(index, key)
+        self._ids.insert(index, user_id)
+        self._usernames.insert(index, username)
+        self._names.insert(index, name)
+
+    def _key_of(self, user_id: int) -> Optional[str]:
+        position = bisect_left(self._sorted_ids, user_id)
+        if position < len(self._sorted_ids) and self._sorted_ids[position] == user_id:
+            return self._id_keys[position]
+        return None
+
+    def _circle(self, viewer_id: int, adjacency: Adjacency) -> List[Circle]:
+        """The viewer's connections, sorted by lowercased username.
+
+        Rebuilt only when the follow graph hands out a fresh adjacency for
+        the viewer, so consecutive keystrokes reuse it.
+        """
+        entry = self._circles.get(viewer_id)
+        if entry is not None and entry[0] is adjacency:
+            return entry[1]
+        scan = settings.TYPEAHEAD_SCAN
+        proximities = dict.fromkeys(adjacency.followers[:scan], FOLLOWER)
+        proximities.update(dict.fromkeys(adjacency.following[:scan], FOLLOWING))
+        circle = []
+        for user_id, proximity in proximities.items():
+            key = self._key_of(user_id)
+            if key is not None:
+                circle.append((key, proximity, user_id))
+        circle.sort()
+        self._circles[viewer_id] = (adjacency, circle)
+        if len(self._circles) > settings.FOLLOW_GRAPH_LOCAL_MAX_USERS:
+            self._circles.pop(next(iter(self._circles)))
+        return circle
+
+    def _position(self, key: str, user_id: int) -> Optional[int]:
+        index = bisect_left(self._keys, key)
+        while index < len(self._keys) and self._keys[index] == key:
+            if self._ids[index] == user_id:
+                return index
+            index += 1
+        return None
+
+    def complete(self, prefix: str, viewer_id: int, limit: int) -> List[Match]:
+        """Users whose username starts with ``prefix``, closest to the viewer first.
+
+        People the viewer follows rank above their followers, who rank above
+        everyone else; within a group shorter usernames come first. Only the
+        first ``TYPEAHEAD_SCAN`` names in the prefix range and the viewer's
+        first ``TYPEAHEAD_SCAN`` connections on each side are examined, so
+        one-letter prefixes cost the same as long ones.
+        """
+        prefix = prefix.strip().lstrip("@").lower()
+        if not prefix:
+            return []
+        self._refresh()
+        adjacency = follow_graph.adjacency(viewer_id)
+
+        with self._lock:
+            circle = self._circle(viewer_id, adjacency)
+            connected = {}
+            for key, proximity, user_id in islice(
+                circle, bisect_left(circle, (prefix,)), None
+            ):
+                if not key.startswith(prefix):
+                    break
+                connected[user_id] = (proximity, len(key), key)
+            positions = [
+                position
+                for (_, _, key), user_id in sorted(
+                    (rank, user_id) for user_id, rank in connected.items()
+                )[:limit]
+                if (position := self._position(key, user_id)) is not None
+            ]
+
+            start = bisect_left(self._keys, prefix)
+            end = bisect_left(self._keys, prefix + "\uffff", start)
+            positions += heapq.nsmallest(
+                limit - len(positions),
+                (
+                    index
+                    for index in range(start, min(end, start + settings.TYPEAHEAD_SCAN))
+                    if self._ids[index] not in connected
+                    and self._ids[index] != viewer_id
+                ),
+                key=lambda index: (len(self._keys[index]), self._keys[index]),
+            )
+            return [
+                (self._ids[index], self._usernames[index], self._names[index])
+                for index in positions
+            ]
+
+
+username_index = UsernameIndex()
@@ -10,6 +10,7 @@ from user.views import (
     FollowRequestView,
     FollowRequestActionView,
     SuggestedUserListView,
+    TypeaheadView,
     OverviewView
 )
 
@@ -22,6 +23,7 @@ urlpatterns = [
     path("overview/", OverviewView.as_view(), name="overview"),
     path("suggested-users/", SuggestedUserListView.as_view(), name="suggested_users"),
     path("users/", UserListView.as_view(), name="users"),
+    path("typeahead/", TypeaheadView.as_view(), name="typeahead"),
     path("follow-request/", FollowRequestView.as_view(), name="follow_request"),
     path(
         "follow-request-action/<int:follow_id>/",
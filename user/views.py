@@ -2,12 +2,19 @@ from rest_framework import generics, status, permissions
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.conf import settings
 from django.contrib.auth import authenticate
-from django.db.models import Q
-from rest_framework_simplejwt.tokens import RefreshToken
-
-from post.models import Post
-from user.models import User, OTP, Follow
+from django.db.models import F, Q
+
+from momento.core.authentication import RefreshToken, record_login
+from momento.core.cache import by_viewer, cache_response
+from momento.core.pagination import SuggestionCursorPagination
+from momento.core.throttling import count_failed_attempt
+from post import feed
+from user import stats, suggestions
+from user.models import User, Follow
+from user.otp import get_otp_store
+from user.typeahead import username_index
 from user.serializers import (
     RegisterSerializer,
     LoginSerializer,
@@ -15,6 +22,7 @@ from user.serializers import (
     FollowRequestSerializer,
     FollowRequestActionSerializer,
     UserSerializer,
+    MeSerializer,
 )
 from utils.helpers import send_mail
 
@@ -23,6 +31,7 @@ class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
     authentication_classes = []
     http_method_names = ["post"]
+    throttle_scope = "register"
     serializer_class = RegisterSerializer
 
     def post(self, request):
@@ -33,8 +42,8 @@ class RegisterView(APIView):
         user.set_password(serializer.validated_data["password"])
         user.save()
 
-        otp = OTP.objects.create(user=user)
-        send_mail(user.email, "OTP", f"Your OTP is {otp.code}")
+        code = get_otp_store().issue(user.id)
+        send_mail(user.email, "OTP", f"Your OTP is {code}")
 
         return Response(
             {"message": "An OTP has been sent to your email."},
@@ -46,6 +55,8 @@ class VerifyOTPView(APIView):
     permission_classes = [permissions.AllowAny]
     authentication_classes = []
     http_method_names = ["post"]
+    throttle_scope = "verify_otp"
+    throttle_account_field = "email"
     serializer_class = VerifyOTPSerializer
 
     def post(self, request):
@@ -61,15 +72,13 @@ class VerifyOTPView(APIView):
         if user.is_active:
             return Response({"message": "Account already verified"}, status=400)
 
-        otp = OTP.objects.filter(user=user, code=code).first()
-        if not otp:
-            return Response({"message": "Invalid OTP"}, status=400)
-        if otp.is_expired():
-            return Response({"message": "OTP has expired"}, status=400)
+        # Expired codes never match, so both cases get the same answer
+        if not get_otp_store().verify(user.id, str(code)):
+            count_failed_attempt(request)
+            return Response({"message": "Invalid or expired OTP"}, status=400)
 
         user.is_active = True
-        user.save()
-        otp.delete()
+        user.save(update_fields=["is_active"])
 
         return Response({"message": "OTP verified successfully"})
 
@@ -78,6 +87,8 @@ class LoginView(APIView):
     permission_classes = [permissions.AllowAny]
     authentication_classes = []
     http_method_names = ["post"]
+    throttle_scope = "login"
+    throttle_account_field = "email"
     serializer_class = LoginSerializer
 
     def post(self, request):
@@ -86,9 +97,11 @@ class LoginView(APIView):
 
         user = authenticate(**serializer.validated_data)
         if not user:
+            count_failed_attempt(request)
             raise AuthenticationFailed(
                 detail="Invalid credentials", code="authentication_failed"
             )
+        record_login(user)
 
         refresh = RefreshToken.for_user(user)
         access = refresh.access_token
@@ -104,11 +117,12 @@ class LoginView(APIView):
 class MeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     http_method_names = ["get"]
-    serializer_class = UserSerializer
+    serializer_class = MeSerializer
 
+    @cache_response("me", scope=by_viewer)
     def get(self, request):
         user = request.user
-        return Response(UserSerializer(user).data)
+        return Response(MeSerializer(user, context={"request": request}).data)
 
 
 class OverviewView(APIView):
@@ -116,35 +130,66 @@ class OverviewView(APIView):
     http_method_names = ["get"]
 
     def get(self, request):
-        user_id = request.query_params.get("user_id")
-        user = User.objects.filter(id=user_id).first() if user_id else request.user
-        posts_count = Post.objects.filter(user=user).count()
-        followers_count = Follow.objects.filter(followed=user).count()
-        following_count = Follow.objects.filter(follower=user).count()
-        return Response(
-            {
-                "posts": posts_count,
-                "followers": followers_count,
-                "following": following_count,
-            }
-        )
+        user_id = request.query_params.get("user_id") or request.user.id
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            return Response({"message": "User not found"}, status=404)
+        profile_stats = stats.get_profile_stats(user_id)
+        if profile_stats is None:
+            return Response({"message": "User not found"}, status=404)
+        return Response(profile_stats)
 
 
 class UserListView(generics.ListAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @cache_response("users")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def get_queryset(self):
-        return User.objects.filter(
+        return User.objects.select_related("profile").filter(
             ~Q(id=self.request.user.id), ~Q(is_staff=True)
-        ).order_by("-id")
+        )
+
+
+class TypeaheadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    http_method_names = ["get"]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", settings.TYPEAHEAD_LIMIT))
+        except ValueError:
+            limit = settings.TYPEAHEAD_LIMIT
+        matches = username_index.complete(
+            request.query_params.get("q", ""), request.user.id, min(max(limit, 1), 50)
+        )
+        return Response(
+            [
+                {"id": user_id, "username": username, "name": name}
+                for user_id, username, name in matches
+            ]
+        )
 
 
 class SuggestedUserListView(generics.ListAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SuggestionCursorPagination
 
     def get_queryset(self):
+        suggested = (
+            User.objects.select_related("profile")
+            .filter(suggested_to__user=self.request.user, is_active=True)
+            .annotate(suggestion_score=F("suggested_to__score"))
+        )
+        if suggested.exists():
+            return suggested
+
+        # Nothing precomputed yet (e.g. a brand new account): newest strangers
         follower = Follow.objects.filter(
             Q(followed=self.request.user) | Q(follower=self.request.user)
         ).only("followed_id", "follower_id")
@@ -152,9 +197,12 @@ class SuggestedUserListView(generics.ListAPIView):
         for follow in follower:
             user_ids.add(follow.followed_id)
             user_ids.add(follow.follower_id)
-        return User.objects.filter(
-            ~Q(id=self.request.user.id), ~Q(is_staff=True), ~Q(id__in=user_ids)
-        ).order_by("-id")
+        return User.objects.select_related("profile").filter(
+            ~Q(id=self.request.user.id),
+            ~Q(is_staff=True),
+            ~Q(id__in=user_ids),
+            is_active=True,
+        )
 
 
 class FollowRequestView(APIView):
@@ -176,11 +224,15 @@ class FollowRequestView(APIView):
             Follow.Status.ACCEPTED if followed_user.is_public else Follow.Status.PENDING
         )
 
-        Follow.objects.create(
+        follow = Follow.objects.create(
             followed=followed_user,
             follower=request.user,
             status=status_choice,
         )
+        if follow.status == Follow.Status.ACCEPTED:
+            feed.connect(follow.follower_id, follow.followed_id)
+            stats.invalidate(follow.follower_id, follow.followed_id)
+        suggestions.discard(follow.follower_id, follow.followed_id)
 
         return Response({"message": "Followed successfully"})
 
@@ -211,7 +263,13 @@ class FollowRequestActionView(APIView):
         if action == "accept":
             follow.status = Follow.Status.ACCEPTED
             follow.save()
+            feed.connect(follow.follower_id, follow.followed_id)
+            stats.invalidate(follow.follower_id, follow.followed_id)
         else:
+            accepted = follow.status == Follow.Status.ACCEPTED
             follow.delete()
+            if accepted:
+                feed.disconnect(follow.follower_id, follow.followed_id)
+                stats.invalidate(follow.follower_id, follow.followed_id)
 
         return Response({"message": "Follow request status updated successfully"})
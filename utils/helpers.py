@@ -1,15 +1,11 @@
-from django.conf import settings
-from django.core.mail import send_mail as django_send_mail
+from PIL import Image, UnidentifiedImageError
+
+from mailer.queue import mail_queue
 
 
 def send_mail(email: str, subject: str, message: str):
-    django_send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [email],
-        fail_silently=False,
-    )
+    """Queue an email; it is sent in the background by ``mailer``."""
+    mail_queue.enqueue(email, subject, message)
 
 
 def get_media_type(file):
@@ -19,3 +15,38 @@ def get_media_type(file):
     elif extension in ["avi", "mpg", "mpeg", "mpv", "ogv", "mkv", "flv", "wmv", "webm", "mp4"]:
         return "video"
     return None
+
+
+# Leading bytes of the video containers we accept, as (offset, signature)
+VIDEO_SIGNATURES = {
+    "video/mp4": [(4, b"ftyp")],
+    "video/webm": [(0, b"\x1a\x45\xdf\xa3")],
+    "video/x-msvideo": [(8, b"AVI ")],
+    "video/x-flv": [(0, b"FLV")],
+    "video/mpeg": [(0, b"\x00\x00\x01\xba"), (0, b"\x00\x00\x01\xb3")],
+    "video/ogg": [(0, b"OggS")],
+    "video/x-ms-wmv": [(0, b"\x30\x26\xb2\x75")],
+}
+
+
+def sniff_media_type(file):
+    """Detect the real media type of ``file`` from its content.
+
+    Returns ``(media_type, content_type)`` such as ``("image", "image/png")``,
+    or ``(None, None)`` when the content is neither an image nor a known video
+    container.
+    """
+    file.seek(0)
+    head = file.read(16)
+    for content_type, signatures in VIDEO_SIGNATURES.items():
+        if any(head[offset : offset + len(sig)] == sig for offset, sig in signatures):
+            return "video", content_type
+
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            image.verify()
+            content_type = Image.MIME.get(image.format)
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+        return None, None
+    return ("image", content_type) if content_type else (None, None)